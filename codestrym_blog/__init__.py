@@ -0,0 +1,3 @@
+"""
+Support modules for the Codestrym blog generator (generate_blog_posts.py).
+"""
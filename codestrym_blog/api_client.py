@@ -0,0 +1,212 @@
+"""
+Shared HTTP client for the Gemini and Imagen APIs.
+
+All calls go through one pooled requests.Session so connections (and their TLS
+handshakes) are reused across posts. Each endpoint has its own timeout and a
+token-bucket limiter sized to the model quota, and transient failures (429/5xx,
+connection errors, timeouts) are retried with exponential backoff and jitter,
+honoring the server's Retry-After header when one is sent. With a Metrics
+object, every attempt's latency, transfer sizes, retries and failures are recorded.
+
+stream_events() reads server-sent-event endpoints such as streamGenerateContent,
+yielding each partial response as soon as it arrives.
+"""
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes worth retrying: rate limiting and transient server-side failures
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter.
+    Allows bursts of up to `capacity` requests and refills at `rate_per_minute`.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1, int(rate_per_minute // 60))
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, then consumes it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_seconds = (1 - self.tokens) / self.rate_per_second
+            time.sleep(wait_seconds)
+
+
+class Endpoint:
+    """A single API endpoint with its own timeout and rate limiter."""
+
+    def __init__(self, name, url, requests_per_minute, connect_timeout=10, read_timeout=120):
+        self.name = name
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.limiter = TokenBucket(requests_per_minute)
+
+
+def parse_retry_after(value):
+    """
+    Parses a Retry-After header (either delay-seconds or an HTTP-date).
+    Returns the number of seconds to wait, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class ApiClient:
+    """
+    Pooled, retrying JSON client shared by every API call in a run.
+    """
+
+    def __init__(self, api_key, endpoints, pool_size=10, max_retries=5, backoff_base=1.0, backoff_cap=60.0, metrics=None):
+        self.api_key = api_key
+        self.metrics = metrics
+        self.endpoints = {endpoint.name: endpoint for endpoint in endpoints}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self.session = requests.Session()
+        self.session.headers.update({'Content-Type': 'application/json'})
+        # Retries are handled below so Retry-After and the rate limiters are respected
+        adapter = HTTPAdapter(pool_connections=len(self.endpoints) or 1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """Returns how long to sleep before retry number `attempt` (0-based)."""
+        if retry_after is not None:
+            return min(self.backoff_cap, retry_after)
+        # "Full jitter" exponential backoff
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def post_json(self, endpoint_name, payload):
+        """
+        POSTs `payload` to the named endpoint and returns the decoded JSON response.
+        Raises requests.exceptions.RequestException once all retries are exhausted.
+        """
+        endpoint = self.endpoints[endpoint_name]
+        response = self.request(
+            "POST", endpoint.url, label=endpoint.name, timeout=endpoint.timeout, limiter=endpoint.limiter, json=payload
+        )
+        return response.json()
+
+    def stream_events(self, endpoint_name, url, payload):
+        """
+        POSTs `payload` to a server-sent-events `url` (e.g. ...:streamGenerateContent?alt=sse) with the named
+        endpoint's limiter and timeouts, and yields each event's decoded JSON as it arrives. The read timeout
+        applies between events rather than to the whole response. Connecting is retried like request(); a
+        stream that breaks part-way raises requests.exceptions.RequestException, as its events can't be replayed.
+        """
+        endpoint = self.endpoints[endpoint_name]
+        label = f"{endpoint.name}Stream"
+        response = self.request(
+            "POST", url, label=label, timeout=endpoint.timeout, limiter=endpoint.limiter, json=payload, stream=True
+        )
+        received = 0
+        data = []
+        try:
+            # Lines are split on raw bytes and decoded one by one, so multi-byte characters are never cut in half
+            for line in response.iter_lines():
+                received += len(line) + 1
+                line = line.decode('utf-8').rstrip("\r")
+                if line.startswith("data:"):
+                    data.append(line[5:].lstrip())
+                elif not line and data: # A blank line ends the event
+                    yield json.loads("\n".join(data))
+                    data = []
+            if data:
+                yield json.loads("\n".join(data))
+        finally:
+            response.close()
+            self._count(f"api.{label}.bytes_received", received)
+
+    def request(self, method, url, label="Google", timeout=(10, 120), limiter=None, **kwargs):
+        """
+        Sends one authenticated request with the shared retry policy and returns the response.
+        `limiter` is an optional TokenBucket acquired before every attempt. Other keyword arguments are
+        passed to requests (params are merged with the API key).
+        Raises requests.exceptions.RequestException once all retries are exhausted.
+        """
+        params = {"key": self.api_key, **kwargs.pop("params", {})}
+        attempt = 0
+        while True:
+            if limiter is not None:
+                limiter.acquire()
+            retry_after = None
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, params=params, timeout=timeout, **kwargs)
+                self._record(label, start, response, count_body=not kwargs.get("stream"))
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    if not response.ok:
+                        self._count(f"api.{label}.failures")
+                    response.raise_for_status()
+                    return response
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                response.close() # Hands a streamed connection back to the pool before retrying
+                error = requests.exceptions.HTTPError(
+                    f"{response.status_code} Error from {label} API", response=response
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self._record(label, start)
+                error = e
+
+            if attempt >= self.max_retries:
+                self._count(f"api.{label}.failures")
+                raise error
+            delay = self.backoff_delay(attempt, retry_after)
+            attempt += 1
+            self._count(f"api.{label}.retries")
+            print(f"{label} API request failed ({error}); retry {attempt}/{self.max_retries} in {delay:.1f}s.")
+            time.sleep(delay)
+
+    def _count(self, name, amount=1):
+        if self.metrics is not None:
+            self.metrics.count(name, amount)
+
+    def _record(self, label, start, response=None, count_body=True):
+        """
+        Records the latency and transfer sizes of one HTTP attempt.
+        For streamed responses (`count_body` False) the latency is the time to the response headers
+        and the body isn't read here.
+        """
+        if self.metrics is None:
+            return
+        self.metrics.observe(f"api.{label}", time.perf_counter() - start)
+        self.metrics.count(f"api.{label}.attempts")
+        if response is not None:
+            body = response.request.body
+            if isinstance(body, (bytes, str)):
+                self.metrics.count(f"api.{label}.bytes_sent", len(body))
+            if count_body:
+                self.metrics.count(f"api.{label}.bytes_received", len(response.content))
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,142 @@
+"""
+Content-addressed storage for post images.
+
+Every generated image is stored under the digest of its PNG bytes:
+images/<digest>.png, or the responsive variants images/<digest>-<width>.<format>
+when Pillow is available. An image that is already stored (e.g. a cached
+Imagen response reused for a second row with the same keyword) is recognised
+before anything is written or re-encoded, and the new post simply points at
+the existing files.
+
+The asset table lives in the post manifest next to the posts:
+
+    "assets": {"<digest>": {"path": "images/<digest>-1440.webp", "image": {...variants...},
+                            "files": ["images/<digest>-480.avif", ...], "refs": 2}}
+
+`refs` is the number of manifest posts whose `image_asset` is the digest.
+collect_garbage() deletes the files of assets nothing refers to any more, plus
+stray content-addressed files that were never recorded (e.g. after a crash).
+Images published before assets were content-addressed keep their names and are
+adopted into the table by digest, so they are counted and collected the same way.
+"""
+import base64
+import hashlib
+import os
+import re
+from collections import Counter
+
+from codestrym_blog.atomic_io import BASE64_CHUNK_CHARS
+
+DIGEST_CHARS = 16 # Hex characters of the sha256 used in file names (64 bits)
+DIGEST_BLOCK_BYTES = 1024 * 1024
+# Files created by this store: <digest>.png or <digest>-<width>.<format>
+ASSET_FILE_PATTERN = re.compile(r"^([0-9a-f]{%d})(?:-\d+)?\.(?:png|webp|avif)$" % DIGEST_CHARS)
+
+
+def base64_digest(base64_data, chunk_chars=BASE64_CHUNK_CHARS):
+    """Returns the digest of the bytes `base64_data` decodes to, decoding one chunk at a time."""
+    digest = hashlib.sha256()
+    for start in range(0, len(base64_data), chunk_chars):
+        digest.update(base64.b64decode(base64_data[start:start + chunk_chars], validate=True))
+    return digest.hexdigest()[:DIGEST_CHARS]
+
+
+def file_digest(path):
+    """Returns the digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(DIGEST_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()[:DIGEST_CHARS]
+
+
+def variant_files(image):
+    """Returns every file path in an image_pipeline.process_image() description."""
+    return [path for variants in image["sources"].values() for path, _ in variants]
+
+
+class AssetStore:
+    """
+    The asset table of the post manifest, plus the image files it describes under `directory`.
+    `assets` is the manifest's "assets" section; it is updated in place.
+    """
+
+    def __init__(self, directory, assets=None):
+        self.directory = directory
+        self.assets = {} if assets is None else assets
+
+    def get(self, digest):
+        """Returns the record of a stored asset, or None if it is unknown or any of its files is missing."""
+        record = self.assets.get(digest)
+        if record is None or not all(os.path.exists(path) for path in record["files"]):
+            return None
+        return record
+
+    def png_path(self, digest):
+        """Returns where the original PNG of a new asset is written."""
+        return f"{self.directory}/{digest}.png"
+
+    def add(self, digest, path, image=None):
+        """
+        Records an asset whose files are written. `path` is the file pages link to (the fallback
+        variant, or the PNG) and `image` the responsive variants description, if there is one.
+        Returns the record.
+        """
+        files = sorted(set(variant_files(image) if image else []) | {path})
+        previous = self.assets.get(digest) or {}
+        record = {"path": path, "image": image, "files": files, "refs": previous.get("refs", 0)}
+        self.assets[digest] = record
+        return record
+
+    def adopt(self, posts, base_url):
+        """
+        Adds the images of posts that aren't in the table to it and sets the posts' `image_asset`.
+        Those are posts published before assets were content-addressed, keyed by the digest of their
+        file, and posts whose asset was written by a run that crashed before saving the manifest.
+        Returns the number of posts adopted.
+        """
+        prefix = base_url.rstrip("/") + "/"
+        adopted = 0
+        for post in posts:
+            image_url = post.get("image_url") or ""
+            if post.get("image_asset") in self.assets or not image_url.startswith(prefix):
+                continue
+            path = image_url[len(prefix):]
+            if not os.path.isfile(path):
+                continue
+            digest = post.get("image_asset") or file_digest(path)
+            if digest not in self.assets:
+                self.add(digest, path, post.get("image"))
+            post["image_asset"] = digest
+            adopted += 1
+        return adopted
+
+    def update_refs(self, posts):
+        """Recounts how many posts refer to each asset."""
+        counts = Counter(post.get("image_asset") for post in posts)
+        for digest, record in self.assets.items():
+            record["refs"] = counts.get(digest, 0)
+
+    def collect_garbage(self, keep=()):
+        """
+        Deletes the files of assets with no references, except those whose digest is in `keep` (images of
+        posts that aren't published yet), and content-addressed files no asset records.
+        Call update_refs() first. Returns the removed file paths.
+        """
+        keep = set(keep)
+        removed = []
+        for digest in [digest for digest, record in self.assets.items() if record["refs"] == 0 and digest not in keep]:
+            for path in self.assets.pop(digest)["files"]:
+                if os.path.exists(path):
+                    os.remove(path)
+                    removed.append(path)
+
+        recorded = {path for record in self.assets.values() for path in record["files"]}
+        if os.path.isdir(self.directory):
+            for name in sorted(os.listdir(self.directory)):
+                match = ASSET_FILE_PATTERN.match(name)
+                path = f"{self.directory}/{name}"
+                if match and match.group(1) not in keep and path not in recorded:
+                    os.remove(path)
+                    removed.append(path)
+        return removed
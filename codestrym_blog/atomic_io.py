@@ -0,0 +1,80 @@
+"""
+Crash-safe file writes for everything the generator publishes.
+
+Files are written to a temporary file in the destination directory, flushed and
+fsynced, then atomically renamed over the target. A crash mid-write leaves the
+previous version (or nothing) in place, never a truncated file that the Action
+would commit.
+"""
+import base64
+import contextlib
+import os
+import tempfile
+
+# Base64 is decoded in chunks of this many characters (a multiple of 4, so chunks decode independently)
+BASE64_CHUNK_CHARS = 64 * 1024
+
+
+def _fsync_directory(directory):
+    """Persists the rename itself. Not supported on Windows, where it is skipped."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode='w', encoding='utf-8'):
+    """
+    Context manager yielding a file object whose contents replace `path` only if the block succeeds.
+    `mode` is 'w' for text or 'wb' for binary.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=None if 'b' in mode else encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates files readable only by the owner; published files should be world-readable
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+    _fsync_directory(directory)
+
+
+def write_text_atomic(path, text):
+    """Atomically replaces `path` with `text` (UTF-8)."""
+    with atomic_write(path, 'w') as f:
+        f.write(text)
+
+
+def write_bytes_atomic(path, data):
+    """Atomically replaces `path` with `data`."""
+    with atomic_write(path, 'wb') as f:
+        f.write(data)
+
+
+def write_base64_atomic(path, base64_data, chunk_chars=BASE64_CHUNK_CHARS):
+    """
+    Decodes `base64_data` straight into `path` in fixed-size chunks, so only one chunk of decoded
+    bytes is held in memory at a time, then atomically moves the file into place.
+    Returns the number of bytes written.
+    """
+    written = 0
+    with atomic_write(path, 'wb') as f:
+        for start in range(0, len(base64_data), chunk_chars):
+            chunk = base64.b64decode(base64_data[start:start + chunk_chars], validate=True)
+            f.write(chunk)
+            written += len(chunk)
+    return written
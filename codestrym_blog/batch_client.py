@@ -0,0 +1,158 @@
+"""
+Offline batch generation through the Gemini Batch API.
+
+For large backfills, the Gemini prompts of every pending post are written to a
+JSONL file ({"key": <row hash>, "request": <generateContent payload>} per line),
+uploaded through the Files API and submitted as one batchGenerateContent job.
+The job is polled until it finishes, and its results file is downloaded and
+mapped back to row hashes by key. Batch jobs are billed at the batch rate and
+don't count against the per-minute request quota.
+
+Imagen has no batch endpoint, so images are still generated interactively.
+`python -m codestrym_blog.stub_server` can stand in for the remote service.
+"""
+import json
+import os
+import time
+
+from codestrym_blog.atomic_io import atomic_write
+
+SUCCEEDED_STATES = {"BATCH_STATE_SUCCEEDED", "JOB_STATE_SUCCEEDED"}
+FAILED_STATES = {
+    "BATCH_STATE_FAILED", "BATCH_STATE_CANCELLED", "BATCH_STATE_EXPIRED",
+    "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED",
+}
+
+
+class BatchError(Exception):
+    """Raised when a batch job fails, is cancelled or expires."""
+
+
+class BatchPending(Exception):
+    """Raised when a batch job is still running after the wait timeout."""
+
+
+def write_batch_file(path, entries):
+    """
+    Writes (key, request payload) pairs as a batch input file, one JSON object per line.
+    Returns the number of requests written.
+    """
+    count = 0
+    with atomic_write(path, 'w') as f:
+        for key, payload in entries:
+            f.write(json.dumps({"key": key, "request": payload}, ensure_ascii=False, separators=(',', ':')))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def parse_results(lines):
+    """
+    Maps a batch results file back to its keys.
+    Returns {key: generateContent response}, with None for requests that failed.
+    """
+    results = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        key = record.get("key") or (record.get("metadata") or {}).get("key")
+        if key is not None:
+            results[key] = record.get("response") if not record.get("error") else None
+    return results
+
+
+def batch_state(batch):
+    """Returns the state of a batch operation, e.g. 'BATCH_STATE_RUNNING'."""
+    return (batch.get("metadata") or {}).get("state") or batch.get("state") or "BATCH_STATE_UNSPECIFIED"
+
+
+class GeminiBatchClient:
+    """
+    Submits and collects Gemini batch jobs, using an ApiClient for authentication and retries.
+    `base_url` is the API root, e.g. https://generativelanguage.googleapis.com.
+    """
+
+    def __init__(self, api_client, base_url, model):
+        self.api_client = api_client
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+
+    def _json(self, method, url, **kwargs):
+        return self.api_client.request(method, url, label="Gemini Batch", **kwargs).json()
+
+    def upload_file(self, path, display_name):
+        """Uploads a JSONL file with the resumable upload protocol and returns its name ('files/...')."""
+        size = os.path.getsize(path)
+        start = self.api_client.request(
+            "POST", f"{self.base_url}/upload/v1beta/files", label="Gemini Batch",
+            headers={
+                "X-Goog-Upload-Protocol": "resumable",
+                "X-Goog-Upload-Command": "start",
+                "X-Goog-Upload-Header-Content-Length": str(size),
+                "X-Goog-Upload-Header-Content-Type": "application/jsonl",
+            },
+            json={"file": {"display_name": display_name}},
+        )
+        upload_url = start.headers["X-Goog-Upload-URL"]
+        # Read up front rather than streamed: a retried request must send the whole body again,
+        # and a file object would already be exhausted by the first attempt
+        with open(path, 'rb') as f:
+            body = f.read()
+        uploaded = self._json(
+            "POST", upload_url, timeout=(10, 600),
+            headers={
+                "Content-Type": "application/jsonl",
+                "X-Goog-Upload-Offset": "0",
+                "X-Goog-Upload-Command": "upload, finalize",
+            },
+            data=body,
+        )
+        return uploaded["file"]["name"]
+
+    def create(self, file_name, display_name):
+        """Starts a batch job over an uploaded input file and returns the batch name ('batches/...')."""
+        operation = self._json(
+            "POST", f"{self.base_url}/v1beta/models/{self.model}:batchGenerateContent",
+            json={"batch": {"display_name": display_name, "input_config": {"file_name": file_name}}},
+        )
+        return operation["name"]
+
+    def submit(self, path, display_name):
+        """Uploads a batch input file and starts a job over it. Returns the batch name."""
+        return self.create(self.upload_file(path, display_name), display_name)
+
+    def get(self, name):
+        """Returns the current batch operation."""
+        return self._json("GET", f"{self.base_url}/v1beta/{name}")
+
+    def wait(self, name, poll_interval=30.0, timeout=24 * 3600):
+        """
+        Polls a batch until it finishes and returns the final operation.
+        Raises BatchError if it failed and BatchPending if it is still running after `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            batch = self.get(name)
+            state = batch_state(batch)
+            if state in SUCCEEDED_STATES:
+                return batch
+            if state in FAILED_STATES:
+                raise BatchError(f"batch {name} ended in state {state}: {batch.get('error') or ''}".rstrip(": "))
+            if time.monotonic() + poll_interval > deadline:
+                raise BatchPending(f"batch {name} is still {state}")
+            print(f"Batch {name} is {state}; checking again in {poll_interval:.0f}s.")
+            time.sleep(poll_interval)
+
+    def results(self, batch):
+        """Downloads the results of a finished batch. Returns {key: response or None}."""
+        response = batch.get("response") or {}
+        output = (batch.get("metadata") or {}).get("output") or {}
+        file_name = response.get("responsesFile") or output.get("responsesFile")
+        if not file_name:
+            raise BatchError(f"batch {batch.get('name')} has no results file")
+        download = self.api_client.request(
+            "GET", f"{self.base_url}/download/v1beta/{file_name}:download", label="Gemini Batch",
+            params={"alt": "media"}, timeout=(10, 600),
+        )
+        return parse_results(download.text.splitlines())
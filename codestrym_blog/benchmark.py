@@ -0,0 +1,169 @@
+"""
+Offline throughput benchmark for the generator.
+
+Starts a stub Gemini/Imagen server (see codestrym_blog.stub_server) with the
+requested latency, error rate and payload sizes, then runs generate_blog_posts.py
+in a scratch directory over synthetic CSVs of increasing size. Each run is a
+separate process, so its startup cost and peak memory are measured on their
+own. The numbers come from the run report the generator writes (see
+codestrym_blog.metrics):
+
+    python -m codestrym_blog.benchmark --sizes 10,100,1000 --text-latency 0.5 --image-latency 2 --concurrency 8
+
+For every size it reports posts/sec, end-to-end post latency (p50/p99), API
+latency, retries and peak RSS. --output writes all results as JSON so runs can
+be compared across commits.
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from codestrym_blog.stub_server import add_stub_arguments, start_stub_server, stub_options
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GENERATOR = os.path.join(REPO_ROOT, "generate_blog_posts.py")
+DEFAULT_SIZES = (10, 100, 1000)
+
+
+def write_synthetic_csv(path, rows):
+    """Writes a blog.csv with `rows` distinct posts in the repository's Text,Hyperlink,images format."""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Text", "Hyperlink", "images"])
+        for i in range(rows):
+            writer.writerow([
+                f"Product {i} makes everyday life easier. Get your #Deal using our affiliate link!",
+                f"https://www.example.com/s?k=product-{i}&tag=codestrymshop-20",
+                f"product-{i}/",
+            ])
+
+
+def run_generator(workdir, base_url, args):
+    """Runs the generator once in `workdir` against the stub server. Returns (wall seconds, run report)."""
+    report_path = os.path.join(workdir, "run_report.json")
+    env = dict(
+        os.environ,
+        GOOGLE_API_KEY="benchmark",
+        GOOGLE_API_BASE=base_url,
+        GITHUB_REPO_OWNER="benchmark",
+        GITHUB_REPO_NAME="blog",
+        GITHUB_BRANCH="main",
+        POST_SOURCES="csv:blog.csv",
+        BLOG_CONCURRENCY=str(args.concurrency),
+        GEMINI_REQUESTS_PER_MINUTE=str(args.gemini_rpm),
+        IMAGEN_REQUESTS_PER_MINUTE=str(args.imagen_rpm),
+        API_CACHE_DIR=os.path.join(workdir, ".cache", "api") if args.cache else "",
+        TEMPLATE_CACHE_DIR=os.path.join(workdir, ".cache", "templates"),
+        RUN_REPORT_FILE=report_path,
+    )
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, GENERATOR] + (["--batch"] if args.batch else []) + (["--stream"] if args.stream else []),
+        cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    wall_seconds = time.perf_counter() - start
+    if completed.returncode != 0 or not os.path.exists(report_path):
+        raise RuntimeError(f"generator failed (exit {completed.returncode}):\n{completed.stdout[-4000:]}")
+    with open(report_path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    # The synthetic rows are all distinct posts; any held back as near-duplicates would skew the numbers
+    near_duplicates = report["counters"].get("requests.near_duplicates", 0)
+    if near_duplicates:
+        raise RuntimeError(f"the near-duplicate check flagged {near_duplicates} synthetic row(s); they must all be generated")
+    return wall_seconds, report
+
+
+def summarize_run(rows, wall_seconds, report):
+    """Extracts the headline numbers from one run report."""
+    timers = report["timers"]
+    counters = report["counters"]
+    published = counters.get("posts.published", 0)
+    empty = {"p50_seconds": 0.0, "p99_seconds": 0.0}
+    return {
+        "rows": rows,
+        "published": published,
+        "failed": counters.get("posts.failed", 0),
+        "wall_seconds": round(wall_seconds, 3),
+        "posts_per_second": round(published / wall_seconds, 2) if wall_seconds else 0.0,
+        "post_latency_p50": timers.get("post.latency", empty)["p50_seconds"],
+        "post_latency_p99": timers.get("post.latency", empty)["p99_seconds"],
+        "gemini_latency_p50": timers.get("api.Gemini", empty)["p50_seconds"],
+        "gemini_latency_p99": timers.get("api.Gemini", empty)["p99_seconds"],
+        "imagen_latency_p50": timers.get("api.Imagen", empty)["p50_seconds"],
+        "imagen_latency_p99": timers.get("api.Imagen", empty)["p99_seconds"],
+        "retries": counters.get("api.Gemini.retries", 0) + counters.get("api.Imagen.retries", 0),
+        "peak_rss_mb": round(report["peak_rss_bytes"] / (1024 * 1024), 1) if report.get("peak_rss_bytes") else None,
+        "stages": {name: stats["total_seconds"] for name, stats in timers.items() if name.startswith("stage.")},
+    }
+
+
+def format_results(results):
+    """Formats benchmark results as a plain-text table."""
+    lines = [
+        f"{'rows':>6}  {'posts/s':>8}  {'wall':>8}  {'post p50':>9}  {'post p99':>9}  {'api p50':>8}  {'api p99':>8}  {'retries':>7}  {'peak RSS':>9}"
+    ]
+    for result in results:
+        api_p50 = max(result["gemini_latency_p50"], result["imagen_latency_p50"])
+        api_p99 = max(result["gemini_latency_p99"], result["imagen_latency_p99"])
+        rss = f"{result['peak_rss_mb']:.1f}MB" if result["peak_rss_mb"] is not None else "n/a"
+        lines.append(
+            f"{result['rows']:>6}  {result['posts_per_second']:>8.2f}  {result['wall_seconds']:>7.1f}s"
+            f"  {result['post_latency_p50'] * 1000:>7.0f}ms  {result['post_latency_p99'] * 1000:>7.0f}ms"
+            f"  {api_p50 * 1000:>6.0f}ms  {api_p99 * 1000:>6.0f}ms  {result['retries']:>7}  {rss:>9}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark generate_blog_posts.py against a local stub API.")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES), help="Comma-separated CSV sizes in rows (e.g. 10,100,1000,10000).")
+    parser.add_argument("--concurrency", type=int, default=4, help="BLOG_CONCURRENCY for the generator.")
+    parser.add_argument("--gemini-rpm", type=float, default=1_000_000, help="Gemini requests/minute limit (default: effectively unlimited).")
+    parser.add_argument("--imagen-rpm", type=float, default=1_000_000, help="Imagen requests/minute limit (default: effectively unlimited).")
+    parser.add_argument("--cache", action="store_true", help="Enable the on-disk API response cache (empty at the start of each run).")
+    parser.add_argument("--batch", action="store_true", help="Run the generator in --batch mode.")
+    parser.add_argument("--stream", action="store_true", help="Run the generator in --stream mode.")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directories for inspection.")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    add_stub_arguments(parser)
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    server, base_url = start_stub_server(**stub_options(args))
+    print(f"Stub API on {base_url}; benchmarking {', '.join(map(str, sizes))} row(s) at concurrency {args.concurrency}.")
+
+    results = []
+    try:
+        for rows in sizes:
+            workdir = tempfile.mkdtemp(prefix=f"blog-benchmark-{rows}-")
+            try:
+                write_synthetic_csv(os.path.join(workdir, "blog.csv"), rows)
+                wall_seconds, report = run_generator(workdir, base_url, args)
+                result = summarize_run(rows, wall_seconds, report)
+                results.append(result)
+                print(f"{rows} row(s): {result['published']} published in {result['wall_seconds']:.1f}s ({result['posts_per_second']:.2f} posts/s)")
+            finally:
+                if args.keep:
+                    print(f"Kept {workdir}")
+                else:
+                    shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        server.shutdown()
+
+    print()
+    print(format_results(results))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}.")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Writer for the paginated blog index.
+
+Page 1 is blog.html and later pages are blog/page-2.html, blog/page-3.html, ...
+Every page is rendered from the post manifest on each run, but only the pages
+whose contents actually changed are written.
+"""
+import html
+import os
+import re
+
+from codestrym_blog.atomic_io import write_text_atomic
+
+# Used to seed the post manifest from the cards of a hand-maintained blog.html
+CARD_PATTERN = re.compile(
+    r'<!-- Automated Blog Post Card - .*? -->\s*'
+    r'<div class="bg-white.*?<img src="(?P<image_url>[^"]*)".*?'
+    r'<h2[^>]*>(?P<title>.*?)</h2>\s*'
+    r'<p[^>]*>(?P<summary>.*?)</p>.*?'
+    r'<span class="mr-3">By : (?P<author>.*?)</span>\s*'
+    r'<span>(?P<date>.*?)</span>.*?'
+    r'<a href="(?P<affiliate_link>[^"]*)".*?'
+    r'<a href="(?P<post_url>[^"]*)".*?'
+    r'<!-- End Automated Blog Post Card -->',
+    re.S,
+)
+
+
+def parse_cards(page_html):
+    """Extracts post records from the cards already present in a blog index page."""
+    posts = []
+    for match in CARD_PATTERN.finditer(page_html):
+        post = {field: html.unescape(value.strip()) for field, value in match.groupdict().items()}
+        posts.append(post)
+    return posts
+
+
+def page_path(page_number, blog_index_path, pages_dir):
+    """Returns the file path for a page: blog.html for page 1, <pages_dir>/page-N.html after that."""
+    if page_number == 1:
+        return blog_index_path
+    return os.path.join(pages_dir, f"page-{page_number}.html")
+
+
+def write_if_changed(path, content):
+    """Writes `content` to `path` unless the file already holds exactly that. Returns True if written."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+    write_text_atomic(path, content)
+    return True
+
+
+def build_blog_pages(blog_index_path, pages_dir, rendered_pages):
+    """
+    Writes `rendered_pages` (the full HTML of each index page, in page order). Pages whose contents
+    are unchanged are not rewritten, and stale pages left over from a larger page count are removed.
+    Returns the list of paths that were written or removed.
+    """
+    changed = []
+    for page_number, page_html in enumerate(rendered_pages, start=1):
+        path = page_path(page_number, blog_index_path, pages_dir)
+        if write_if_changed(path, page_html):
+            changed.append(path)
+
+    stale_page = len(rendered_pages) + 1
+    while os.path.exists(page_path(stale_page, blog_index_path, pages_dir)):
+        stale_path = page_path(stale_page, blog_index_path, pages_dir)
+        os.remove(stale_path)
+        changed.append(stale_path)
+        stale_page += 1
+    return changed
@@ -0,0 +1,105 @@
+"""
+Post-processing for generated images.
+
+Imagen returns ~1 MB PNGs, far more than a 48-unit card or a 768px hero needs.
+process_image() resizes the source into a few widths, re-encodes each one in
+modern formats (WebP, plus AVIF when Pillow supports it) and builds a tiny
+blurred placeholder that is inlined as a data URI. The returned description is
+stored in the post manifest and used by the templates to emit srcset/sizes.
+
+Pillow is an optional dependency: without it, process_image() returns None and
+the caller keeps the original PNG.
+"""
+import base64
+import io
+import os
+
+from codestrym_blog.atomic_io import atomic_write
+
+try:
+    from PIL import Image, ImageFilter, features
+except ImportError: # Pillow not installed; images are published as generated
+    Image = None
+
+DEFAULT_WIDTHS = (480, 960, 1440)
+# Quality settings per format, tuned for photographic images
+FORMAT_OPTIONS = {
+    "avif": {"quality": 50, "speed": 6},
+    "webp": {"quality": 78, "method": 6},
+}
+PLACEHOLDER_WIDTH = 16
+
+
+def is_available():
+    """Returns True if Pillow is installed, i.e. images can be post-processed."""
+    return Image is not None
+
+
+def supported_formats():
+    """Returns the output formats this Pillow build can encode, best compression first."""
+    if Image is None:
+        return []
+    formats = []
+    try:
+        if features.check("avif"):
+            formats.append("avif")
+    except ValueError: # Older Pillow versions don't know the feature at all
+        pass
+    if features.check("webp"):
+        formats.append("webp")
+    return formats
+
+
+def make_placeholder(image):
+    """Returns a tiny blurred WebP (or JPEG) of `image` as a data URI, a few hundred bytes in size."""
+    height = max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))
+    small = image.resize((PLACEHOLDER_WIDTH, height), Image.LANCZOS).filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    if features.check("webp"):
+        small.save(buffer, "WEBP", quality=30)
+        mime = "image/webp"
+    else:
+        small.save(buffer, "JPEG", quality=30)
+        mime = "image/jpeg"
+    return f"data:{mime};base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}"
+
+
+def process_image(source_path, output_dir, file_stem, widths=DEFAULT_WIDTHS):
+    """
+    Writes resized, recompressed variants of `source_path` to `output_dir` as
+    <file_stem>-<width>.<format> and returns a description of them:
+
+        {"width": ..., "height": ..., "placeholder": "data:...",
+         "fallback": "images/x-1440.webp",
+         "sources": {"avif": [["images/x-480.avif", 480], ...], "webp": [...]}}
+
+    Returns None if Pillow is not installed or no modern format is available.
+    """
+    formats = supported_formats()
+    if not formats:
+        return None
+
+    with Image.open(source_path) as original:
+        image = original.convert("RGB")
+
+    # Never upscale: widths above the source size collapse into the source width
+    target_widths = sorted({min(width, image.width) for width in widths})
+    sources = {image_format: [] for image_format in formats}
+    for width in target_widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for image_format in formats:
+            path = os.path.join(output_dir, f"{file_stem}-{width}.{image_format}")
+            with atomic_write(path, 'wb') as f:
+                resized.save(f, image_format.upper(), **FORMAT_OPTIONS[image_format])
+            sources[image_format].append([path.replace(os.sep, "/"), width])
+
+    largest_width = target_widths[-1]
+    fallback_format = "webp" if "webp" in sources else formats[-1]
+    return {
+        "width": largest_width,
+        "height": max(1, round(image.height * largest_width / image.width)),
+        "placeholder": make_placeholder(image),
+        "fallback": sources[fallback_format][-1][0],
+        "sources": sources,
+    }
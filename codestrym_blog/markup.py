@@ -0,0 +1,116 @@
+"""
+Markdown-to-HTML conversion and clean-up of generated text.
+
+clean_text() strips emojis and invisible characters (zero-width spaces and
+joiners, stray control characters) from Gemini output in a single pass with one
+precompiled pattern.
+
+to_html() converts a post's Markdown with one configured markdown.Markdown
+converter per thread, reset between documents instead of rebuilt, so each
+--rebuild worker process builds its parser once. Results are memoized by the
+Markdown source: in memory for the life of the process, and on disk through an
+optional ResponseCache keyed by a hash of the source and the markdown version,
+so re-rendering an unchanged archive skips the conversion entirely.
+
+TextStream collects a streamed response: it cleans each chunk as it arrives
+and has the summary (the first paragraph) ready as soon as it is complete.
+
+The markdown package is only imported on first use.
+"""
+import functools
+import re
+import threading
+
+from codestrym_blog.response_cache import cache_key
+
+# Emoji ranges, zero-width characters and C0/DEL control characters other than tab, newline and carriage return
+CLEAN_PATTERN = re.compile(
+    "["
+    "\U0001F600-\U0001F64F"  # emoticons
+    "\U0001F300-\U0001F5FF"  # symbols & pictographs
+    "\U0001F680-\U0001F6FF"  # transport & map symbols
+    "\U0001F1E0-\U0001F1FF"  # flags (iOS)
+    "\U00002702-\U000027B0"
+    "\U000024C2-\U0001F251"
+    "\u200b-\u200d\u2060"  # zero-width space, (non-)joiner, word joiner
+    "\x00-\x08\x0b\x0c\x0e-\x1f\x7f"
+    "]+"
+)
+MEMO_SIZE = 256 # Rendered documents kept in memory per process
+
+_local = threading.local()
+
+
+def clean_text(text):
+    """Removes emojis and invisible characters from generated text."""
+    return CLEAN_PATTERN.sub('', text)
+
+
+def converter():
+    """Returns this thread's Markdown converter, creating it on first use."""
+    md = getattr(_local, "converter", None)
+    if md is None:
+        import markdown
+        md = _local.converter = markdown.Markdown()
+    return md
+
+
+@functools.lru_cache(maxsize=1)
+def converter_id():
+    """Identifies the converter's output in cache keys, so upgrading markdown invalidates cached HTML."""
+    import markdown
+    return f"markdown-{markdown.__version__}"
+
+
+@functools.lru_cache(maxsize=MEMO_SIZE)
+def _convert(text):
+    return converter().reset().convert(text)
+
+
+def to_html(text, cache=None):
+    """Converts Markdown to HTML, using the in-memory memo and then `cache` (a ResponseCache) before converting."""
+    if cache is None:
+        return _convert(text)
+    key = cache_key(converter_id(), text)
+    html = cache.get(key)
+    if html is None:
+        html = _convert(text)
+        cache.put(key, html, model=converter_id())
+    return html
+
+
+class TextStream:
+    """
+    Collects the chunks of a streamed post. The raw text is kept for the response cache and state store;
+    the summary (first paragraph) and body are cleaned as they arrive, the same way clean_text() would
+    clean the finished text.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.head = "" # Text received before the first blank line, while the summary is incomplete
+        self.summary = None
+        self.body = []
+
+    def feed(self, chunk):
+        """Adds one chunk. Returns True if it completed the summary."""
+        self.chunks.append(chunk)
+        if self.summary is not None:
+            self.body.append(clean_text(chunk))
+            return False
+        self.head += chunk
+        end = self.head.find("\n\n")
+        if end == -1:
+            return False
+        self.summary = clean_text(self.head[:end].strip())
+        self.body.append(clean_text(self.head[end:]))
+        self.head = ""
+        return True
+
+    def text(self):
+        """Returns the raw text received so far."""
+        return "".join(self.chunks)
+
+    def content(self):
+        """Returns the cleaned body (everything after the summary), or None if no summary was found."""
+        return None if self.summary is None else "".join(self.body).strip()
@@ -0,0 +1,151 @@
+"""
+Run instrumentation: stage timers, latency histograms and counters.
+
+A Metrics object collects two kinds of measurements from every thread of a run:
+
+- timers: durations in seconds, e.g. one per Gemini call or per Markdown
+  conversion, summarized as count/total/mean/percentiles plus a histogram with
+  fixed latency buckets;
+- counters: running totals such as retries, bytes transferred or tokens used.
+
+report() returns everything as a JSON-serializable dict (written to the run
+report file at the end of a run) and summary_table() formats it for the log.
+"""
+import contextlib
+import json
+import math
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from codestrym_blog.atomic_io import write_text_atomic
+
+try:
+    import resource
+except ImportError: # Not available on Windows; peak memory is then left out of the report
+    resource = None
+
+# Upper bounds (seconds) of the latency histogram buckets; slower samples land in the last, open bucket
+HISTOGRAM_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def percentile(sorted_samples, fraction):
+    """Returns the nearest-rank percentile of already sorted samples."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(0, min(len(sorted_samples) - 1, math.ceil(fraction * len(sorted_samples)) - 1))
+    return sorted_samples[rank]
+
+
+def peak_rss_bytes():
+    """Returns the peak resident set size of this process in bytes, or None where it can't be measured."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def summarize(samples):
+    """Returns count/total/mean/p50/p90/p99/max and bucket counts for a list of durations."""
+    ordered = sorted(samples)
+    total = sum(ordered)
+    histogram = {}
+    remaining = ordered
+    for bound in HISTOGRAM_BUCKETS:
+        inside = sum(1 for sample in remaining if sample <= bound)
+        histogram[f"le_{bound:g}s"] = inside
+        remaining = remaining[inside:]
+    histogram["gt_{:g}s".format(HISTOGRAM_BUCKETS[-1])] = len(remaining)
+    return {
+        "count": len(ordered),
+        "total_seconds": round(total, 6),
+        "mean_seconds": round(total / len(ordered), 6) if ordered else 0.0,
+        "p50_seconds": round(percentile(ordered, 0.50), 6),
+        "p90_seconds": round(percentile(ordered, 0.90), 6),
+        "p99_seconds": round(percentile(ordered, 0.99), 6),
+        "max_seconds": round(ordered[-1], 6) if ordered else 0.0,
+        "histogram": histogram,
+    }
+
+
+class Metrics:
+    """
+    Thread-safe collection of timers and counters for one run.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.timers = defaultdict(list)
+        self.counters = defaultdict(float)
+
+    def reset(self):
+        """Drops everything recorded so far and restarts the clock, e.g. between --watch passes."""
+        with self.lock:
+            self.started = time.time()
+            self.timers.clear()
+            self.counters.clear()
+
+    def observe(self, name, seconds):
+        """Records one duration for the timer `name`."""
+        with self.lock:
+            self.timers[name].append(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        """Context manager that records how long its block took under the timer `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def count(self, name, amount=1):
+        """Adds `amount` to the counter `name`."""
+        with self.lock:
+            self.counters[name] += amount
+
+    def report(self, extra=None):
+        """Returns the run report as a JSON-serializable dict. `extra` sections are merged in as-is."""
+        with self.lock:
+            timers = {name: summarize(samples) for name, samples in sorted(self.timers.items())}
+            counters = {name: int(value) if float(value).is_integer() else value for name, value in sorted(self.counters.items())}
+        finished = time.time()
+        report = {
+            "started": datetime.fromtimestamp(self.started, timezone.utc).isoformat(timespec="seconds"),
+            "finished": datetime.fromtimestamp(finished, timezone.utc).isoformat(timespec="seconds"),
+            "duration_seconds": round(finished - self.started, 3),
+            "timers": timers,
+            "counters": counters,
+        }
+        report.update(extra or {})
+        return report
+
+    def write_report(self, path, extra=None):
+        """Writes the run report to `path` as JSON and returns it."""
+        report = self.report(extra)
+        write_text_atomic(path, json.dumps(report, indent=2) + "\n")
+        return report
+
+
+def summary_table(report):
+    """Formats a run report's timers and counters as a plain-text table."""
+    lines = [f"Run summary ({report['duration_seconds']:.1f}s total)"]
+    if report["timers"]:
+        width = max(len(name) for name in report["timers"])
+        lines.append(f"  {'timer':<{width}}  {'count':>6}  {'total':>9}  {'mean':>8}  {'p50':>8}  {'p99':>8}  {'max':>8}")
+        for name, stats in report["timers"].items():
+            lines.append(
+                f"  {name:<{width}}  {stats['count']:>6}  {stats['total_seconds']:>8.2f}s"
+                f"  {stats['mean_seconds'] * 1000:>6.0f}ms  {stats['p50_seconds'] * 1000:>6.0f}ms"
+                f"  {stats['p99_seconds'] * 1000:>6.0f}ms  {stats['max_seconds'] * 1000:>6.0f}ms"
+            )
+    if report["counters"]:
+        width = max(len(name) for name in report["counters"])
+        lines.append(f"  {'counter':<{width}}  {'value':>12}")
+        for name, value in report["counters"].items():
+            lines.append(f"  {name:<{width}}  {value:>12,}")
+    return "\n".join(lines)
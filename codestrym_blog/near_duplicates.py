@@ -0,0 +1,226 @@
+"""
+Near-duplicate detection for post requests, checked before any API call is made.
+
+Row hashes only catch exact repeats of Platform-Text-Hyperlink: a re-worded tweet
+or a new tracking parameter on the same Amazon link is a new row, and would pay
+for another Gemini and Imagen call to publish an almost identical post. So every
+new request is fingerprinted first:
+
+- Its affiliate link is normalized (see normalize_link): scheme, "www." and
+  tracking parameters are dropped, and Amazon product links reduce to their
+  ASIN, so two links to the same page compare equal.
+- Its keyword and Text are normalized as for search and turned into a set of
+  words and word pairs, summarized by a MinHash signature of NUM_HASHES values.
+  Unlike search, numbers and one-character words are kept, since "Product 9"
+  and "Galaxy S 24" differ from their neighbours only there. The fraction of
+  equal values estimates the Jaccard similarity of two sets.
+- The signature is split into BANDS bands; requests sharing any band bucket, or
+  the same normalized link, are candidates (locality-sensitive hashing). Only
+  candidates are compared, so a lookup costs one indexed query however many
+  posts have been published.
+
+Fingerprints are kept in the state store next to the row they describe. Rows
+published before this check existed are added the first time they are read.
+A request is a near-duplicate when its similarity to a candidate is at least
+SAME_LINK_THRESHOLD if both point at the same page, TEXT_THRESHOLD if either has
+no link, and DIFFERENT_LINK_THRESHOLD if they link to different pages. Two
+different Amazon products (different ASINs) are never duplicates, however
+alike their text: "iPhone 15" and "iPhone 16" posts are both wanted.
+
+A request linked as a duplicate keeps its fingerprint, so later requests can
+still match it; they are linked to the post it points at (see
+check_near_duplicate in generate_blog_posts.py). This module only uses the
+standard library, since it runs in the scan phase.
+"""
+import collections
+import hashlib
+import re
+import struct
+import unicodedata
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from codestrym_blog.search_index import DIACRITICS_PATTERN, TERM_PATTERN
+
+NUM_HASHES = 64
+BANDS = 16 # NUM_HASHES / BANDS values per band: pairs above ~0.5 similarity almost always share a bucket
+ROWS_PER_BAND = NUM_HASHES // BANDS
+SAME_LINK_THRESHOLD = 0.5
+TEXT_THRESHOLD = 0.8
+DIFFERENT_LINK_THRESHOLD = 0.95 # Different pages can still be the same product (e.g. a search and a product link)
+MERSENNE_PRIME = (1 << 61) - 1
+
+# Query parameters that identify the click, not the page (Amazon associates, analytics and ad networks)
+TRACKING_PARAMETERS = frozenset((
+    "tag", "ref", "ref_", "linkcode", "linkid", "crid", "sprefix", "language", "psc", "th", "smid", "qid", "sr",
+    "camp", "creative", "creativeasin", "ascsubtag", "pd_rd_w", "pd_rd_r", "pd_rd_wg", "pf_rd_p", "pf_rd_r",
+    "content-id", "dib", "dib_tag", "_encoding", "fbclid", "gclid", "msclkid", "igshid", "mc_cid", "mc_eid",
+))
+AMAZON_PRODUCT_PATTERN = re.compile(r"/(?:dp|gp/product|gp/aw/d|exec/obidos/asin)/([A-Z0-9]{10})(?:[/?]|$)", re.I)
+AMAZON_REF_PATTERN = re.compile(r"/ref=[^/]*$")
+PRODUCT_LINK_PATTERN = re.compile(r"^[^/]+/dp/[A-Z0-9]{10}$") # What normalize_link reduces an Amazon product link to
+
+# (a, b) of each hash function h(x) = (a * x + b) mod MERSENNE_PRIME, derived from fixed seeds so they never change
+HASH_COEFFICIENTS = tuple(
+    (
+        int.from_bytes(hashlib.blake2b(f"minhash-a-{i}".encode(), digest_size=8).digest(), 'little') % (MERSENNE_PRIME - 1) + 1,
+        int.from_bytes(hashlib.blake2b(f"minhash-b-{i}".encode(), digest_size=8).digest(), 'little') % MERSENNE_PRIME,
+    )
+    for i in range(NUM_HASHES)
+)
+
+Fingerprint = collections.namedtuple("Fingerprint", "link signature buckets")
+# The most similar earlier request. `published` is False for one accepted earlier in the same scan.
+Match = collections.namedtuple("Match", "row_hash similarity same_link published")
+
+
+def normalize_link(url):
+    """Returns `url` reduced to what identifies the linked page, or "" for a missing or placeholder link."""
+    url = (url or "").strip()
+    if not url or url == "#":
+        return ""
+    parts = urlsplit(url if "://" in url else f"https://{url}")
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[len("www."):]
+    path = parts.path
+    if host.startswith("amazon.") or ".amazon." in host:
+        product = AMAZON_PRODUCT_PATTERN.search(path)
+        if product:
+            return f"{host}/dp/{product.group(1).upper()}"
+        path = AMAZON_REF_PATTERN.sub("", path)
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query)
+        if key.lower() not in TRACKING_PARAMETERS and not key.lower().startswith("utm_")
+    )
+    return host + path.rstrip("/") + (f"?{urlencode(query)}" if query else "")
+
+
+def terms(text):
+    """Returns every word and number in `text`, normalized like search terms but with none dropped."""
+    return TERM_PATTERN.findall(DIACRITICS_PATTERN.sub("", unicodedata.normalize("NFKD", text)).lower())
+
+
+def features(keyword, text):
+    """Returns the words and adjacent word pairs of a request's keyword and text."""
+    terms_found = terms(f"{keyword} {text}")
+    return set(terms_found) | {f"{first} {second}" for first, second in zip(terms_found, terms_found[1:])}
+
+
+def signature(feature_set):
+    """Returns the MinHash signature (NUM_HASHES 32-bit values) of a non-empty feature set."""
+    values = [int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little') for feature in feature_set]
+    return tuple(min((a * value + b) % MERSENNE_PRIME for value in values) & 0xFFFFFFFF for a, b in HASH_COEFFICIENTS)
+
+
+def buckets(values):
+    """Returns the LSH bucket of each band of a signature, as signed 64-bit integers for SQLite."""
+    return [
+        int.from_bytes(hashlib.blake2b(
+            struct.pack(f"<I{ROWS_PER_BAND}I", band, *values[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]),
+            digest_size=8,
+        ).digest(), 'little', signed=True)
+        for band in range(BANDS)
+    ]
+
+
+def similarity(first, second):
+    """Returns the estimated Jaccard similarity of the feature sets behind two signatures."""
+    return sum(a == b for a, b in zip(first, second)) / NUM_HASHES
+
+
+def pack(values):
+    return struct.pack(f"<{NUM_HASHES}I", *values)
+
+
+def unpack(data):
+    return struct.unpack(f"<{NUM_HASHES}I", data)
+
+
+def fingerprint(request):
+    """Returns the Fingerprint of a PostRequest, or None if it has no text to compare."""
+    feature_set = features(request.images.strip('/'), request.text)
+    if not feature_set:
+        return None
+    values = signature(feature_set)
+    return Fingerprint(normalize_link(request.hyperlink), values, buckets(values))
+
+
+def is_near_duplicate(score, link, other_link):
+    """Returns True if two requests with similarity `score` and these normalized links are near-duplicates."""
+    if link and other_link and link != other_link:
+        if PRODUCT_LINK_PATTERN.match(link) and PRODUCT_LINK_PATTERN.match(other_link):
+            return False # Two different products
+        return score >= DIFFERENT_LINK_THRESHOLD
+    if link and link == other_link:
+        return score >= SAME_LINK_THRESHOLD
+    return score >= TEXT_THRESHOLD
+
+
+class NearDuplicateIndex:
+    """
+    LSH lookups over the fingerprints in a StateStore, plus the requests accepted earlier in the current scan
+    (which aren't published yet, so they are kept apart).
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.scan_buckets = collections.defaultdict(set)
+        self.scan_links = collections.defaultdict(set)
+        self.scan_signatures = {}
+
+    def add_published(self, requests):
+        """Fingerprints published requests that don't have a fingerprint yet. Returns how many were added."""
+        missing = self.state.missing_fingerprints(request.row_hash for request in requests)
+        added = 0
+        for request in requests:
+            if request.row_hash in missing:
+                found = fingerprint(request)
+                if found is not None:
+                    self.state.add_fingerprint(request.row_hash, found.link, pack(found.signature), found.buckets)
+                    added += 1
+        return added
+
+    def find(self, request):
+        """
+        Returns (fingerprint, Match or None) for a new request. Published posts are preferred over requests
+        from the current scan, then the most similar one wins.
+        """
+        found = fingerprint(request)
+        if found is None:
+            return None, None
+        candidates = []
+        stored = self.state.fingerprint_candidates(found.link, found.buckets)
+        stages = self.state.get_stages(stored)
+        for row_hash, (link, data) in stored.items():
+            if row_hash != request.row_hash and stages.get(row_hash) == "indexed":
+                candidates.append((row_hash, link, unpack(data), True))
+        in_scan = set(self.scan_links[found.link]) if found.link else set()
+        for bucket in found.buckets:
+            in_scan.update(self.scan_buckets[bucket])
+        for row_hash in in_scan:
+            link, values = self.scan_signatures[row_hash]
+            candidates.append((row_hash, link, values, False))
+
+        best = None
+        for row_hash, link, values, published in candidates:
+            same_link = bool(found.link) and link == found.link
+            score = similarity(found.signature, values)
+            if is_near_duplicate(score, found.link, link) and (best is None or (published, score) > (best.published, best.similarity)):
+                best = Match(row_hash, score, same_link, published)
+        return found, best
+
+    def remember(self, request):
+        """Makes a request that is already under way (partly generated in an earlier run) a candidate for the rest of the scan."""
+        found = fingerprint(request)
+        if found is not None:
+            self.add(request.row_hash, found)
+
+    def add(self, row_hash, found, published=False):
+        """Stores the fingerprint of a request; one that will be generated in this run is also matched against directly."""
+        self.state.add_fingerprint(row_hash, found.link, pack(found.signature), found.buckets)
+        if not published:
+            self.scan_signatures[row_hash] = (found.link, found.signature)
+            if found.link:
+                self.scan_links[found.link].add(row_hash)
+            for bucket in found.buckets:
+                self.scan_buckets[bucket].add(row_hash)
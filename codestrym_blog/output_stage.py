@@ -0,0 +1,240 @@
+"""
+Output stage: how the generator writes what it publishes, and the record of what a run changed.
+
+- Pages are minified before they are written: comments are dropped and
+  whitespace is collapsed, and removed entirely next to block-level tags.
+  <pre>, <textarea>, <script> and <style> contents are kept as they are.
+- Every text file readers download (pages, the stylesheet, posts.json) gets
+  precompressed siblings: <file>.gz, and <file>.br when the optional brotli
+  package is installed. A host or CDN that serves precompressed files (e.g.
+  nginx gzip_static/brotli_static) then sends them without compressing on every
+  request. Siblings are rewritten when their file changed, or when one is
+  missing or older than its file (say, .br copies after brotli was installed),
+  and gzip output carries no timestamp, so unchanged input gives byte-identical
+  files. Files under MIN_COMPRESS_BYTES are not worth it and get no copies.
+- Images and the stylesheet are already fingerprinted: they are named after a
+  digest of their contents (see asset_store and stylesheet), so they can be
+  cached as immutable and never need revalidating.
+
+A ChangeSet collects every path a run wrote, moved or deleted and saves it as
+the deploy manifest:
+
+    {"version": 1,
+     "changed": [{"path": "posts/x.html", "immutable": false}, {"path": "css/site.<digest>.css", "immutable": true}, ...],
+     "removed": ["images/<digest>-480.webp", ...]}
+
+The commit step stages exactly those paths instead of re-scanning the tree.
+`python -m codestrym_blog.output_stage <manifest> changed|removed` prints one
+path per line for it.
+"""
+import functools
+import gzip
+import json
+import os
+import re
+import sys
+
+from codestrym_blog.asset_store import ASSET_FILE_PATTERN
+from codestrym_blog.atomic_io import write_bytes_atomic, write_text_atomic
+from codestrym_blog.blog_index import write_if_changed
+from codestrym_blog.stylesheet import STYLESHEET_NAME_PATTERN
+
+DEPLOY_MANIFEST_VERSION = 1
+COMPRESSED_SUFFIXES = (".gz", ".br")
+GZIP_LEVEL = 9
+MIN_COMPRESS_BYTES = 1024 # Smaller files fit in a packet or two anyway; serving them as they are is just as fast
+BROTLI_QUALITY = 11
+
+# Elements whose surrounding whitespace never renders, so it can be removed rather than collapsed to one space
+BLOCK_TAGS = frozenset((
+    "!doctype", "html", "head", "body", "title", "meta", "link", "address", "article", "aside", "blockquote",
+    "br", "dd", "div", "dl", "dt", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+    "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section", "table", "tbody", "td", "tfoot", "th", "thead",
+    "tr", "ul",
+))
+TOKEN_PATTERN = re.compile(
+    r"<!--.*?-->|<(pre|textarea|script|style)\b.*?</\1\s*>|<[^>]*>|[^<]+",
+    re.S | re.I,
+)
+TAG_NAME_PATTERN = re.compile(r"</?([a-zA-Z0-9!]+)")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+# The card markers blog_index.parse_cards reads back from blog.html survive minification
+KEPT_COMMENT_PATTERN = re.compile(r"<!-- (?:End )?Automated Blog Post Card")
+
+
+def _is_block_tag(token):
+    match = TAG_NAME_PATTERN.match(token)
+    return bool(match) and match.group(1).lower() in BLOCK_TAGS
+
+
+def minify_html(html):
+    """Returns `html` without comments and with its insignificant whitespace removed."""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(html):
+        token = match.group(0)
+        if token.startswith("<!--") and not KEPT_COMMENT_PATTERN.match(token):
+            continue
+        if tokens and not token.startswith("<") and not tokens[-1].startswith("<"):
+            tokens[-1] += token # Text on both sides of a dropped comment
+        else:
+            tokens.append(token)
+    output = []
+    for position, token in enumerate(tokens):
+        if token.startswith("<"):
+            output.append(token)
+            continue
+        text = WHITESPACE_PATTERN.sub(" ", token)
+        if not output or _is_block_tag(output[-1]):
+            text = text.lstrip()
+        following = tokens[position + 1] if position + 1 < len(tokens) else None
+        if following is None or _is_block_tag(following):
+            text = text.rstrip()
+        output.append(text)
+    return "".join(output) + "\n"
+
+
+@functools.lru_cache(maxsize=1)
+def _brotli():
+    """Returns the brotli module, or None if it isn't installed."""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def compressed_siblings(path):
+    """Returns the paths of the precompressed copies of `path`."""
+    return [path + suffix for suffix in COMPRESSED_SUFFIXES]
+
+
+def write_compressed(path):
+    """
+    Writes the .gz (and, with brotli installed, .br) copy of a published file. Files below
+    MIN_COMPRESS_BYTES get no copies. Copies that would now be stale (left from a larger version of
+    the file, or a .br written while brotli was installed) are deleted.
+    Returns the paths written or deleted; ChangeSet tells them apart by whether they exist.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    gzip_path, brotli_path = compressed_siblings(path)
+    brotli = _brotli()
+    compressors = {
+        gzip_path: lambda: gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0),
+        brotli_path: None if brotli is None else lambda: brotli.compress(data, quality=BROTLI_QUALITY),
+    }
+    touched = []
+    for sibling, compress in compressors.items():
+        if compress is not None and len(data) >= MIN_COMPRESS_BYTES:
+            write_bytes_atomic(sibling, compress())
+            touched.append(sibling)
+        elif os.path.exists(sibling):
+            os.remove(sibling)
+            touched.append(sibling)
+    return touched
+
+
+def refresh_compressed(path):
+    """
+    Rewrites the compressed copies of an unchanged published file if one is missing, older than the file
+    or no longer wanted (see write_compressed), e.g. after brotli was installed or a copy was deleted.
+    Up-to-date copies are only stat'ed, not read. Returns the paths written or deleted (none if up to date).
+    """
+    size = os.path.getsize(path)
+    modified = os.path.getmtime(path)
+    gzip_path, brotli_path = compressed_siblings(path)
+    for sibling, wanted in ((gzip_path, True), (brotli_path, _brotli() is not None)):
+        if wanted and size >= MIN_COMPRESS_BYTES:
+            if not os.path.exists(sibling) or os.path.getmtime(sibling) < modified:
+                return write_compressed(path)
+        elif os.path.exists(sibling):
+            return write_compressed(path)
+    return []
+
+
+def write_page(path, html):
+    """
+    Writes a minified page and its compressed copies, unless the page already holds exactly that, in which
+    case only missing or stale copies are written. Returns the paths written or deleted.
+    """
+    if not write_if_changed(path, minify_html(html)):
+        return refresh_compressed(path)
+    return [path] + write_compressed(path)
+
+
+def delete(path):
+    """Deletes a published file, if it is still there, and its compressed copies. Returns the paths removed."""
+    removed = []
+    for candidate in [path] + compressed_siblings(path):
+        if os.path.exists(candidate):
+            os.remove(candidate)
+            removed.append(candidate)
+    return removed
+
+
+def is_fingerprinted(path):
+    """Returns True if `path` is named after a digest of its contents, so it can be cached indefinitely."""
+    name = os.path.basename(path)
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return bool(ASSET_FILE_PATTERN.match(name) or STYLESHEET_NAME_PATTERN.match(name))
+
+
+class ChangeSet:
+    """The paths one run wrote or deleted. Not thread-safe: record from the thread that writes the files."""
+
+    def __init__(self):
+        self.changed = set()
+        self.removed = set()
+
+    def written(self, paths):
+        """Records files that were created or rewritten; any that no longer exist when saved are listed as removed."""
+        for path in paths:
+            path = os.path.normpath(path).replace(os.sep, "/")
+            self.changed.add(path)
+            self.removed.discard(path)
+
+    def deleted(self, paths):
+        """Records files that were deleted (or moved away)."""
+        for path in paths:
+            path = os.path.normpath(path).replace(os.sep, "/")
+            self.removed.add(path)
+            self.changed.discard(path)
+
+    def clear(self):
+        self.changed.clear()
+        self.removed.clear()
+
+    def __len__(self):
+        return len(self.changed) + len(self.removed)
+
+    def to_dict(self):
+        """Returns the deploy manifest. A file that was written and later deleted in the same run counts as removed."""
+        changed = sorted(path for path in self.changed if os.path.exists(path))
+        removed = sorted(self.removed | (self.changed - set(changed)))
+        return {
+            "version": DEPLOY_MANIFEST_VERSION,
+            "changed": [{"path": path, "immutable": is_fingerprinted(path)} for path in changed],
+            "removed": removed,
+        }
+
+    def save(self, path):
+        """Writes the deploy manifest to `path`."""
+        write_text_atomic(path, json.dumps(self.to_dict(), indent=2) + "\n")
+
+
+def manifest_paths(manifest_path, kind):
+    """Returns the 'changed' or 'removed' paths listed in a deploy manifest."""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if kind == "changed":
+        return [entry["path"] for entry in manifest["changed"]]
+    return list(manifest["removed"])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[2] not in ("changed", "removed"):
+        sys.exit("usage: python -m codestrym_blog.output_stage <deploy manifest> changed|removed")
+    for listed_path in manifest_paths(sys.argv[1], sys.argv[2]):
+        print(listed_path)
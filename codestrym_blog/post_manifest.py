@@ -0,0 +1,119 @@
+"""
+Structured record of every published post.
+
+The manifest is the source of truth for the whole site: each entry holds the
+fields a post card needs (title, summary, image_url, post_url, affiliate_link,
+author, date) plus the post's source -- its slug, output path and Markdown body
+-- so every page can be re-rendered without calling the APIs again. It is
+stored as JSON in the repository so it survives between runs.
+
+Since version 2 it also holds the table of content-addressed image assets and
+how many posts refer to each one (see codestrym_blog.asset_store).
+"""
+import json
+import os
+import re
+
+from codestrym_blog.atomic_io import write_text_atomic
+from codestrym_blog.blog_index import parse_cards, write_if_changed
+
+MANIFEST_VERSION = 2
+FEED_VERSION = 1 # posts.json has its own format version; the manifest's asset table doesn't change it
+
+# Rendered body of a post page, used to recover the source of posts published before it was recorded
+POST_CONTENT_PATTERN = re.compile(
+    r'<div class="blog-content[^"]*">\s*(.*?)\s*</div>\s*<div class="affiliate-button-container">',
+    re.S,
+)
+
+
+def load_manifest(manifest_path, blog_index_path=None):
+    """
+    Returns the list of post records from the manifest.
+    If the manifest doesn't exist yet, it is seeded from the cards already in blog.html.
+    """
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)["posts"]
+
+    if blog_index_path and os.path.exists(blog_index_path):
+        with open(blog_index_path, 'r', encoding='utf-8') as f:
+            posts = parse_cards(f.read())
+        print(f"Seeded post manifest with {len(posts)} existing post(s) from {blog_index_path}.")
+        return posts
+    return []
+
+
+def load_assets(manifest_path):
+    """Returns the manifest's image asset table ({digest: record}), empty for older manifests."""
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f).get("assets", {})
+
+
+def save_manifest(manifest_path, posts, assets=None):
+    """
+    Writes the post records and the asset table to the manifest, one entry per line so diffs stay readable.
+    With `assets` None, the asset table already in the file is kept.
+    """
+    if assets is None:
+        assets = load_assets(manifest_path)
+    asset_lines = ",\n".join(
+        f"    {json.dumps(digest)}: {json.dumps(record, ensure_ascii=False, sort_keys=True)}"
+        for digest, record in sorted(assets.items())
+    )
+    lines = ",\n".join("    " + json.dumps(post, ensure_ascii=False, sort_keys=True) for post in posts)
+    content = (
+        f'{{\n  "version": {MANIFEST_VERSION},\n'
+        f'  "assets": {{\n{asset_lines}\n  }},\n'
+        f'  "posts": [\n{lines}\n  ]\n}}\n'
+    )
+    write_text_atomic(manifest_path, content)
+
+
+def import_post_sources(posts, posts_dir):
+    """
+    Backfills `slug`, `post_path` and `html_content` for posts published before the manifest recorded
+    their source, by reading the rendered body back out of posts/<slug>.html.
+    Returns the number of posts updated.
+    """
+    updated = 0
+    for post in posts:
+        if post.get("markdown") is not None or post.get("html_content") is not None:
+            continue
+        slug = post.get("slug") or os.path.splitext(post["post_url"].rsplit("/", 1)[-1])[0]
+        post_path = post.get("post_path") or f"{posts_dir}/{slug}.html"
+        try:
+            with open(post_path, 'r', encoding='utf-8') as f:
+                match = POST_CONTENT_PATTERN.search(f.read())
+        except FileNotFoundError:
+            continue
+        if match:
+            post.update({"slug": slug, "post_path": post_path, "html_content": match.group(1)})
+            updated += 1
+    return updated
+
+
+def save_feed(feed_path, posts, page_size):
+    """
+    Writes the compact posts.json feed that client-side code (e.g. search) can load lazily.
+    Each entry carries only what a listing needs plus the index page the post appears on.
+    Returns True if the file changed.
+    """
+    feed = {
+        "version": FEED_VERSION,
+        "page_size": page_size,
+        "posts": [
+            {
+                "title": post["title"],
+                "summary": post["summary"],
+                "url": post["post_url"],
+                "image": post["image_url"],
+                "date": post["date"],
+                "page": position // page_size + 1,
+            }
+            for position, post in enumerate(posts)
+        ],
+    }
+    return write_if_changed(feed_path, json.dumps(feed, ensure_ascii=False, separators=(',', ':')))
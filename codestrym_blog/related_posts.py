@@ -0,0 +1,197 @@
+"""
+Related posts for internal linking, computed with NumPy.
+
+Every post is turned into a hashed term vector: its weighted terms (title,
+summary and body, tokenized as for search; see search_index.document_terms)
+are hashed into DIMENSIONS signed slots with a sublinear term frequency. The
+vectors of all posts are the rows of one float32 matrix, in post manifest
+order, cached on disk between runs.
+
+Similarity is the cosine of the rows after weighting every slot by its inverse
+document frequency, so slots holding terms every post shares count for little.
+The document frequencies are counted as rows are added, and the archive is
+weighted once per run; a new post then only needs its own row weighted and one
+matrix-vector product against the archive for its neighbours. Rows added later
+in a run keep the idf of the moment they were added, which drifts by at most a
+post's worth per row. nearest_all() (--rebuild) re-weights every row with the
+current idf and recomputes every post's neighbours with one matrix multiply per
+batch of rows, which takes seconds where pairwise comparisons in Python would
+take hours.
+
+The cache is checked against the manifest when it is opened: rows are matched
+by post URL, and posts without a row are vectorized and appended. If the order
+no longer matches, the whole matrix is rebuilt.
+
+NumPy is an optional dependency: without it, is_available() is False and posts
+are published without related links.
+"""
+import math
+import zlib
+
+from codestrym_blog.atomic_io import atomic_write
+from codestrym_blog.search_index import document_terms
+
+try:
+    import numpy as np
+except ImportError: # NumPy not installed; posts get no related links
+    np = None
+
+CACHE_VERSION = 1
+DIMENSIONS = 1024 # Hash slots per vector
+DEFAULT_COUNT = 3 # Related posts linked from each post
+BATCH_ROWS = 512 # Rows per matrix multiply in nearest_all(), bounding the similarity block to BATCH_ROWS x posts
+MIN_SIMILARITY = 0.05 # Posts less similar than this are never linked
+
+
+def is_available():
+    """Returns True if NumPy is installed, i.e. related posts can be computed."""
+    return np is not None
+
+
+def post_key(post):
+    """Identifies a post's row in the cache."""
+    return post.get("post_url") or post.get("post_path") or post.get("title", "")
+
+
+def vectorize(post):
+    """Returns the hashed term vector of a manifest post."""
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    terms = document_terms(post)
+    if not terms:
+        return vector
+    slots = np.empty(len(terms), dtype=np.int64)
+    values = np.empty(len(terms), dtype=np.float32)
+    for position, (term, weight) in enumerate(terms.items()):
+        digest = zlib.crc32(term.encode('utf-8')) # Stable across processes, unlike hash()
+        slots[position] = digest % DIMENSIONS
+        # The sign bit makes colliding terms cancel out on average instead of always adding up
+        values[position] = (1.0 + math.log(weight)) * (1.0 if digest & 0x80000000 else -1.0)
+    np.add.at(vector, slots, values)
+    return vector
+
+
+class RelatedPosts:
+    """
+    The term vectors of a list of posts, cached in `cache_path`. Rows are appended as posts are
+    published; call save() to keep them for the next run.
+    """
+
+    def __init__(self, cache_path, posts):
+        self.cache_path = cache_path
+        self.links = [] # {"title", "url"} of the post in each row
+        self.keys = []
+        self.matrix = np.zeros((max(16, len(posts)), DIMENSIONS), dtype=np.float32) # Grown by doubling
+        self.count = 0
+        self.changed = False
+        self.document_frequency = np.zeros(DIMENSIONS, dtype=np.int64) # Rows with a non-zero value in each slot
+        self._weighted = None # Idf-weighted unit rows, same capacity as `matrix`; see weighted()
+        self._weighted_count = 0
+        self._load(posts)
+
+    def _load(self, posts):
+        keys = [post_key(post) for post in posts]
+        cached_keys, cached = self._read_cache()
+        reused = 0
+        if cached is not None and cached_keys == keys[:len(cached_keys)]:
+            reused = len(cached_keys)
+            self.matrix[:reused] = cached
+            self.document_frequency = np.count_nonzero(cached, axis=0).astype(np.int64)
+        self.count = reused
+        self.keys = keys[:reused]
+        self.links = [self._link(post) for post in posts[:reused]]
+        for post in posts[reused:]:
+            self.append(post, vectorize(post))
+
+    def _read_cache(self):
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as data:
+                if int(data["version"]) != CACHE_VERSION or data["vectors"].shape[1] != DIMENSIONS:
+                    return [], None
+                return data["keys"].tolist(), data["vectors"].astype(np.float32)
+        except (OSError, KeyError, ValueError):
+            return [], None
+
+    @staticmethod
+    def _link(post):
+        return {"title": post.get("title", ""), "url": post.get("post_url", "")}
+
+    def append(self, post, vector):
+        """Adds a published post (with the vector from vectorize()) as the next row."""
+        if self.count == len(self.matrix):
+            self.matrix = self._grow(self.matrix)
+            if self._weighted is not None:
+                self._weighted = self._grow(self._weighted)
+        self.matrix[self.count] = vector
+        self.count += 1
+        self.document_frequency += vector != 0
+        self.keys.append(post_key(post))
+        self.links.append(self._link(post))
+        self.changed = True
+
+    def _grow(self, rows):
+        grown = np.zeros((2 * len(rows), DIMENSIONS), dtype=np.float32)
+        grown[:self.count] = rows[:self.count]
+        return grown
+
+    def _idf(self):
+        return np.log((1.0 + self.count) / (1.0 + self.document_frequency)).astype(np.float32) + 1.0
+
+    def _normalize(self, rows, idf):
+        weighted = rows * idf
+        norms = np.linalg.norm(weighted, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return weighted / norms
+
+    def weighted(self):
+        """
+        Returns the idf-weighted, unit-length rows. Every row is weighted the first time; after that only rows
+        appended since the last call are, with the idf as it is now.
+        """
+        if self._weighted is None:
+            self._weighted = np.zeros_like(self.matrix)
+            self._weighted_count = 0
+        if self._weighted_count < self.count:
+            new_rows = slice(self._weighted_count, self.count)
+            self._weighted[new_rows] = self._normalize(self.matrix[new_rows], self._idf())
+            self._weighted_count = self.count
+        return self._weighted[:self.count]
+
+    def _top(self, similarities, count):
+        """Returns the row numbers of the `count` highest similarities above MIN_SIMILARITY, best first."""
+        count = min(count, len(similarities))
+        if count <= 0:
+            return []
+        candidates = np.argpartition(-similarities, count - 1)[:count]
+        candidates = candidates[np.lexsort((candidates, -similarities[candidates]))]
+        return [int(row) for row in candidates if similarities[row] >= MIN_SIMILARITY]
+
+    def nearest(self, vector, count=DEFAULT_COUNT):
+        """Returns the links of the `count` posts most similar to a post that isn't a row (yet)."""
+        if not self.count:
+            return []
+        query = self._normalize(vector[np.newaxis, :], self._idf())[0]
+        return [self.links[row] for row in self._top(self.weighted() @ query, count)]
+
+    def nearest_all(self, count=DEFAULT_COUNT):
+        """Returns, for every row in order, the links of its `count` most similar other posts."""
+        self._weighted = None # Re-weight every row with the current idf
+        weighted = self.weighted()
+        related = []
+        for start in range(0, self.count, BATCH_ROWS):
+            block = weighted[start:start + BATCH_ROWS] @ weighted.T
+            block[np.arange(len(block)), np.arange(start, start + len(block))] = -np.inf # A post isn't related to itself
+            related.extend([self.links[row] for row in self._top(similarities, count)] for similarities in block)
+        return related
+
+    def save(self):
+        """Writes the vectors to the cache file if rows were added."""
+        if not self.changed:
+            return
+        with atomic_write(self.cache_path, 'wb') as f:
+            np.savez(
+                f,
+                version=np.array(CACHE_VERSION),
+                keys=np.array(self.keys, dtype=str),
+                vectors=self.matrix[:self.count].astype(np.float16), # Log term frequencies need no more precision
+            )
+        self.changed = False
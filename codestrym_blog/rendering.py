@@ -0,0 +1,45 @@
+"""
+Jinja2 template rendering for post pages, index pages and cards.
+
+Templates live in codestrym_blog/templates and share the layout partials
+(header, footer, CodeStrym logo, responsive image macro). They are loaded and
+compiled once per process and cached by the environment; with a bytecode cache
+directory the compiled code is also reused across runs. All variables are
+HTML-escaped unless a template explicitly marks them |safe.
+"""
+import functools
+import os
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+
+def external_link(url):
+    """Template filter: only allow http(s) links for affiliate buttons, anything else becomes '#'."""
+    return url if url and str(url).startswith('http') else '#'
+
+
+@functools.lru_cache(maxsize=None)
+def get_environment(bytecode_cache_dir=None):
+    """Returns the shared template environment (one per bytecode cache directory)."""
+    bytecode_cache = None
+    if bytecode_cache_dir:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+    environment = Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        autoescape=select_autoescape(["html"]),
+        bytecode_cache=bytecode_cache,
+        auto_reload=False, # Templates don't change during a run, so skip the per-render mtime check
+        trim_blocks=True,
+        lstrip_blocks=True,
+        keep_trailing_newline=True,
+    )
+    environment.filters["external_link"] = external_link
+    return environment
+
+
+def render(template_name, bytecode_cache_dir=None, **context):
+    """Renders the named template with `context`."""
+    return get_environment(bytecode_cache_dir).get_template(template_name).render(**context)
@@ -0,0 +1,177 @@
+"""
+Content-addressed on-disk cache for Gemini and Imagen responses.
+
+Entries are keyed by a SHA-256 of (model, request payload), so the same prompt
+with the same generation parameters is only ever paid for once. Each entry is a
+small JSON file under <cache dir>/<first two hex chars>/<key>.json. Entries older
+than `max_age_seconds` (if set) are dropped, and when the cache grows past
+`max_bytes` the least recently used entries are evicted first.
+
+Run `python -m codestrym_blog.response_cache [cache dir]` for a stats report.
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+from codestrym_blog.atomic_io import write_text_atomic
+
+
+def cache_key(model, payload):
+    """Returns the content address for a request: sha256 of the model name and canonical JSON payload."""
+    canonical = json.dumps({"model": model, "payload": payload}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Thread-safe, size- and age-bounded response cache stored on disk. With `max_age_seconds=None`, entries
+    never expire and only the size bound applies (for values that can't go stale, like rendered Markdown).
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, max_age_seconds=30 * 24 * 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.bytes_written = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None on a miss or an expired entry."""
+        path = self._path(key)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if self._expired(age):
+                self._remove(path)
+                value = None
+            else:
+                with open(path, 'r', encoding='utf-8') as f:
+                    value = json.load(f)["value"]
+                # Bump the access time so size-based eviction is least-recently-used
+                os.utime(path, (time.time(), os.path.getmtime(path)))
+        except (OSError, ValueError, KeyError):
+            value = None
+
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, key, value, model=None):
+        """Stores `value` under `key`. The write is atomic, so a crash never leaves a partial entry."""
+        path = self._path(key)
+        data = json.dumps({"model": model, "created": time.time(), "value": value})
+        try:
+            write_text_atomic(path, data)
+        except OSError as e:
+            print(f"Warning: could not write cache entry {path}: {e}")
+            return
+        with self.lock:
+            self.writes += 1
+            self.bytes_written += len(data)
+
+    def _expired(self, age):
+        return self.max_age_seconds is not None and age > self.max_age_seconds
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def entries(self):
+        """Returns a list of (path, size, last_access, modified) for every entry on disk."""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, st.st_size, st.st_atime, st.st_mtime))
+        return entries
+
+    def evict(self):
+        """
+        Removes expired entries, then least recently used entries until the cache fits in `max_bytes`.
+        Returns the number of entries removed.
+        """
+        now = time.time()
+        removed = 0
+        live = []
+        for path, size, last_access, modified in self.entries():
+            if self._expired(now - modified):
+                removed += self._remove(path)
+            else:
+                live.append((last_access, size, path))
+
+        total = sum(size for _, size, _ in live)
+        live.sort()
+        for _, size, path in live:
+            if total <= self.max_bytes:
+                break
+            if self._remove(path):
+                removed += 1
+                total -= size
+
+        with self.lock:
+            self.evictions += removed
+        return removed
+
+    def reset_stats(self):
+        """Zeroes the hit, miss, write and eviction counters, so stats() covers only what follows."""
+        with self.lock:
+            self.hits = self.misses = self.writes = self.evictions = self.bytes_written = 0
+
+    def stats(self):
+        """Returns a dict of hit/miss counters for this run plus the current on-disk footprint."""
+        entries = self.entries()
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "writes": self.writes,
+                "bytes_written": self.bytes_written,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "disk_bytes": sum(size for _, size, _, _ in entries),
+                "max_bytes": self.max_bytes,
+            }
+
+    def report(self):
+        """Returns a human-readable stats summary."""
+        s = self.stats()
+        return (
+            f"API response cache ({self.directory}): "
+            f"{s['hits']} hit(s), {s['misses']} miss(es), hit rate {s['hit_rate']:.0%}, "
+            f"{s['writes']} write(s), {s['evictions']} eviction(s), "
+            f"{s['entries']} entries using {s['disk_bytes'] / (1024 * 1024):.1f} MB of {s['max_bytes'] / (1024 * 1024):.0f} MB"
+        )
+
+
+if __name__ == "__main__":
+    cache = ResponseCache(sys.argv[1] if len(sys.argv) > 1 else os.environ.get("API_CACHE_DIR", ".cache/api"))
+    entries = cache.entries()
+    print(cache.report())
+    if entries:
+        oldest = min(modified for _, _, _, modified in entries)
+        print(f"Oldest entry written {(time.time() - oldest) / 3600:.1f} hour(s) ago.")
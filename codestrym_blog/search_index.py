@@ -0,0 +1,186 @@
+"""
+Static full-text search index for the blog, queried in the browser by search.html.
+
+Every post is a document, numbered by its position in the post manifest (which
+only ever grows at the end). Its title, summary and body (the Markdown source,
+or the stored HTML of older posts) are split into terms and weighted by field.
+The index is written as static JSON under search/:
+
+    search/index.json        {"version", "docs", "prefix_chars", "chunk_size", "shards": [...]}
+    search/terms/<ab>.json   {"terms": {"<term>": [doc delta, weight, doc delta, weight, ...]}}
+    search/docs/<n>.json     [[title, url, date, summary], ...] for docs n*chunk_size ...
+
+Terms are sharded by their first PREFIX_CHARS characters, so a query only
+downloads the shards of its own terms. Each term's postings list is one flat
+array of (doc id delta, weight) pairs in doc id order. The ids are small
+deltas that compress well, and a run's new posts are appended to the end.
+Document metadata is chunked the same way, so only the result chunks are
+fetched.
+
+update() is incremental: only posts the index hasn't seen yet are tokenized,
+and only the shards and doc chunks they touch are read and rewritten. A full
+rebuild happens when the index is missing, was built by another version, has
+lost a shard, or has more documents than the manifest has posts; unchanged
+files are not rewritten even then.
+"""
+import html
+import json
+import os
+import re
+import unicodedata
+from collections import defaultdict
+
+from codestrym_blog.blog_index import write_if_changed
+
+INDEX_VERSION = 1
+PREFIX_CHARS = 2 # Term characters that pick a shard
+CHUNK_SIZE = 256 # Documents per metadata chunk
+MIN_TERM_CHARS = 2
+MAX_TERM_CHARS = 32
+FIELD_WEIGHTS = (("title", 5), ("summary", 2), ("body", 1))
+STOPWORDS = frozenset("""
+    a about after all also an and any are as at be because been but by can could did do does for from get
+    had has have he her his how i if in into is it its just more most my no not of on or our out over she
+    so than that the their them then there these they this to up us was we were what when which who will
+    with would you your
+""".split())
+
+DIACRITICS_PATTERN = re.compile("[\u0300-\u036f]") # Combining marks left by NFKD, as in search.html
+TERM_PATTERN = re.compile(r"[a-z0-9]+")
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
+
+def tokenize(text):
+    """Returns the searchable terms of `text`. search.html tokenizes queries the same way."""
+    text = DIACRITICS_PATTERN.sub("", unicodedata.normalize("NFKD", text)).lower()
+    return [
+        term for term in TERM_PATTERN.findall(text)
+        if MIN_TERM_CHARS <= len(term) <= MAX_TERM_CHARS and term not in STOPWORDS
+    ]
+
+
+def document_text(post):
+    """Returns {field: text} for a manifest post."""
+    body = post.get("markdown")
+    if body is None:
+        body = html.unescape(TAG_PATTERN.sub(" ", post.get("html_content") or ""))
+    return {"title": post.get("title") or "", "summary": post.get("summary") or "", "body": body}
+
+
+def document_terms(post):
+    """Returns {term: weight} for a manifest post, the weight adding up each occurrence's field weight."""
+    weights = defaultdict(int)
+    text = document_text(post)
+    for field, field_weight in FIELD_WEIGHTS:
+        for term in tokenize(text[field]):
+            weights[term] += field_weight
+    return weights
+
+
+def document_record(post):
+    """Returns what a search result shows for a post."""
+    return [post.get("title", ""), post.get("post_url", ""), post.get("date", ""), post.get("summary", "")]
+
+
+def shard_key(term):
+    return term[:PREFIX_CHARS]
+
+
+class SearchIndex:
+    """The search index files under `directory`."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.meta_path = f"{directory}/index.json"
+
+    def shard_path(self, key):
+        return f"{self.directory}/terms/{key}.json"
+
+    def chunk_path(self, number):
+        return f"{self.directory}/docs/{number}.json"
+
+    def _read(self, path, default):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return default
+
+    def _write(self, path, data, written):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if write_if_changed(path, json.dumps(data, ensure_ascii=False, separators=(',', ':'))):
+            written.append(path)
+
+    def load_meta(self):
+        """Returns the index metadata if the index is complete and current, else None."""
+        meta = self._read(self.meta_path, None)
+        if not isinstance(meta, dict) or meta.get("version") != INDEX_VERSION:
+            return None
+        if meta.get("prefix_chars") != PREFIX_CHARS or meta.get("chunk_size") != CHUNK_SIZE:
+            return None
+        if not all(os.path.exists(self.shard_path(key)) for key in meta.get("shards", [])):
+            return None
+        return meta
+
+    def update(self, posts, rebuild=False):
+        """
+        Brings the index up to date with `posts` (the manifest, in order). Only posts added since the
+        last update are indexed unless a full rebuild is needed or `rebuild` is set.
+        Returns (paths written, paths removed).
+        """
+        meta = None if rebuild else self.load_meta()
+        if meta is not None and meta["docs"] > len(posts):
+            meta = None # Posts were removed from the manifest, so the doc ids have shifted
+        full = meta is None
+        start = 0 if full else meta["docs"]
+        if not full and start == len(posts):
+            return [], []
+
+        postings = defaultdict(lambda: defaultdict(list)) # shard -> term -> [(doc id, weight), ...]
+        for doc_id in range(start, len(posts)):
+            for term, weight in document_terms(posts[doc_id]).items():
+                postings[shard_key(term)][term].append((doc_id, weight))
+
+        written = []
+        shards = set() if full else set(meta["shards"])
+        for key, terms in postings.items():
+            shard = {"terms": {}} if full else self._read(self.shard_path(key), {"terms": {}})
+            for term, entries in terms.items():
+                flat = shard["terms"].setdefault(term, [])
+                last = sum(flat[0::2]) # Doc id of the term's last posting
+                for doc_id, weight in entries:
+                    flat.extend((doc_id - last, weight))
+                    last = doc_id
+            self._write(self.shard_path(key), shard, written)
+            shards.add(key)
+
+        for number in range(start // CHUNK_SIZE, (len(posts) + CHUNK_SIZE - 1) // CHUNK_SIZE):
+            first = number * CHUNK_SIZE
+            self._write(self.chunk_path(number), [document_record(post) for post in posts[first:first + CHUNK_SIZE]], written)
+
+        removed = self._remove_stale(shards, len(posts)) if full else []
+        meta = {
+            "version": INDEX_VERSION,
+            "docs": len(posts),
+            "prefix_chars": PREFIX_CHARS,
+            "chunk_size": CHUNK_SIZE,
+            "shards": sorted(shards),
+        }
+        self._write(self.meta_path, meta, written)
+        return written, removed
+
+    def _remove_stale(self, shards, docs):
+        """Deletes shard and chunk files a full rebuild didn't write. Returns their paths."""
+        keep = {self.shard_path(key) for key in shards}
+        keep.update(self.chunk_path(number) for number in range((docs + CHUNK_SIZE - 1) // CHUNK_SIZE))
+        removed = []
+        for subdirectory in ("terms", "docs"):
+            directory = f"{self.directory}/{subdirectory}"
+            if not os.path.isdir(directory):
+                continue
+            for name in sorted(os.listdir(directory)):
+                path = f"{directory}/{name}"
+                if name.endswith(".json") and path not in keep:
+                    os.remove(path)
+                    removed.append(path)
+        return removed
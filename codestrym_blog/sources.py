@@ -0,0 +1,310 @@
+"""
+Pluggable input sources for the generator.
+
+Every source yields normalized PostRequest tuples in chunks, so the rest of the
+pipeline (dedupe by row hash, generation, indexing) doesn't care where a post
+came from:
+
+- CsvSource reads a CSV with Text,Hyperlink,images columns (blog.csv). It is
+  streamed with the standard library csv module, so memory stays flat however
+  many rows the sheet grows to and pandas is not needed.
+- JsonlSource reads an append-only JSONL queue, one request object per line.
+  It remembers the byte offset it has fully processed in the state store and
+  only reads lines appended after it, so large batches never need a full-file
+  diff.
+- DropFolderSource reads every .csv and .jsonl file dropped into a directory
+  and moves each file to <directory>/processed/ once all of its posts are
+  published.
+
+Each chunk is hashed in one pass and then checked against the state store with
+a single batched lookup (see StateStore.get_stages).
+
+Every source also answers has_new(state) from file metadata and the state store
+alone: a digest of the CSV's bytes against the digest saved after its last fully
+published read, the queue's size against its saved offset, or whether any batch
+files are waiting. That lets a run with nothing new exit before anything heavy is
+imported. This module only uses the standard library for the same reason.
+"""
+import collections
+import csv
+import hashlib
+import json
+import os
+
+DEFAULT_CHUNK_ROWS = 1000
+DIGEST_BLOCK_BYTES = 1024 * 1024
+
+# One post to generate. `index` is the request's position in the order it was read (for log messages) and
+# `location` is what the source needs to track completion (a byte offset or a file path).
+PostRequest = collections.namedtuple(
+    "PostRequest", "source index text hyperlink images platform row_hash location"
+)
+
+# Accepted field names in JSONL records and CSV headers (case-insensitive), first match wins
+FIELD_ALIASES = {
+    "text": ("text",),
+    "hyperlink": ("hyperlink", "affiliate_link", "link", "url"),
+    "images": ("images", "image", "keyword"),
+    "platform": ("platform",),
+}
+
+
+def request_hash(platform, text, hyperlink):
+    """
+    Returns the unique hash of a post request, based on its platform, text and hyperlink.
+    This identifies a post across runs and sources, so it must stay stable.
+    """
+    unique_string = f"{platform}-{text}-{hyperlink}"
+    return hashlib.sha256(unique_string.encode('utf-8')).hexdigest()
+
+
+def row_hash(row):
+    """Returns the unique hash of a CSV row, based on 'Platform', 'Text' and 'Hyperlink'."""
+    return request_hash(row.get('Platform') or '', row.get('Text') or '', row.get('Hyperlink') or '')
+
+
+def normalize(record, source, index, location=None):
+    """Builds a PostRequest from a CSV row or JSON object, accepting any of FIELD_ALIASES as keys."""
+    lowered = {str(key).strip().lower(): value for key, value in record.items() if key is not None}
+    fields = {}
+    for field, aliases in FIELD_ALIASES.items():
+        value = next((lowered[alias] for alias in aliases if lowered.get(alias) not in (None, '')), '')
+        fields[field] = value if isinstance(value, str) else str(value)
+    return PostRequest(
+        source=source,
+        index=index,
+        text=fields["text"],
+        hyperlink=fields["hyperlink"],
+        images=fields["images"],
+        platform=fields["platform"],
+        row_hash=request_hash(fields["platform"], fields["text"], fields["hyperlink"]),
+        location=index if location is None else location,
+    )
+
+
+def file_digest(path):
+    """Returns the sha256 hex digest of a file's contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(DIGEST_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunked(requests, chunk_rows):
+    """Groups an iterable of requests into lists of up to `chunk_rows`."""
+    chunk = []
+    for request in requests:
+        chunk.append(request)
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def read_csv_requests(path, source, location=None):
+    """Yields a PostRequest for every data row of the CSV at `path`."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for index, row in enumerate(csv.DictReader(f)):
+            yield normalize(row, source, index, location)
+
+
+def read_jsonl_requests(path, source, start_offset=0, location=None, complete=False):
+    """
+    Yields a PostRequest for every complete line of the JSONL file at `path` from `start_offset` on.
+    A trailing line without a newline may still be being written and is left for the next run, unless
+    `complete` says the file is finished, in which case it is read as the last line. Lines that aren't JSON objects are reported and skipped. Sets source.end_offset to the offset
+    just past the last complete line read.
+    """
+    with open(path, 'rb') as f:
+        f.seek(start_offset)
+        offset = start_offset
+        index = 0
+        for line in f:
+            if not line.endswith(b'\n') and not complete:
+                break
+            line_offset = offset
+            offset += len(line)
+            source.end_offset = offset
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                print(f"Warning: skipping invalid JSON at {path} byte {line_offset}: {e}")
+                continue
+            if not isinstance(record, dict):
+                print(f"Warning: skipping non-object JSON at {path} byte {line_offset}.")
+                continue
+            yield normalize(record, source, index, line_offset if location is None else location)
+            index += 1
+
+
+def complete_lines_end(path, start_offset=0):
+    """
+    Returns the offset just past the last newline in the file at `path`, or `start_offset` if there is none
+    after it. Reads backwards from the end in blocks, so only the unread tail of a large queue is touched.
+    """
+    with open(path, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+        while position > start_offset:
+            block_start = max(start_offset, position - DIGEST_BLOCK_BYTES)
+            f.seek(block_start)
+            newline = f.read(position - block_start).rfind(b'\n')
+            if newline != -1:
+                return block_start + newline + 1
+            position = block_start
+    return start_offset
+
+
+class CsvSource:
+    """
+    A CSV file that is re-read in full whenever it changes. Already processed rows are skipped by their hash.
+    The digest of its contents is saved once every row has been published, so an unchanged file isn't read again.
+    """
+
+    required = True
+
+    def __init__(self, path):
+        self.path = path
+        self.name = path
+        self.digest_key = f"csv-digest:{path}"
+        self.digest = None
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def has_new(self, state):
+        """True unless the file is byte-for-byte the one whose rows were all published. A missing file counts as new so its error is reported."""
+        if not self.exists():
+            return True
+        return file_digest(self.path) != state.get_meta(self.digest_key)
+
+    def iter_chunks(self, state, chunk_rows=DEFAULT_CHUNK_ROWS):
+        self.digest = file_digest(self.path)
+        return chunked(read_csv_requests(self.path, self), chunk_rows)
+
+    def finish(self, state, unfinished):
+        """Saves the digest of the file that was read if all of its rows are published; unfinished rows are retried on the next read."""
+        if unfinished or self.digest is None:
+            state.delete_meta(self.digest_key)
+        else:
+            state.set_meta(self.digest_key, self.digest)
+        return []
+
+
+class JsonlSource:
+    """
+    An append-only JSONL queue. The offset up to which every request has been published is kept in
+    the state store, so each run only reads what was appended since.
+    """
+
+    required = False
+
+    def __init__(self, path):
+        self.path = path
+        self.name = path
+        self.cursor_key = f"jsonl-offset:{path}"
+        self.end_offset = 0
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def has_new(self, state):
+        """
+        True if the queue's complete lines end somewhere other than the saved offset, i.e. a request was appended
+        or is still unpublished. A trailing line without its newline yet doesn't count, as no run would read it.
+        """
+        if not self.exists():
+            return False
+        offset = int(state.get_meta(self.cursor_key) or 0)
+        if os.path.getsize(self.path) < offset:
+            return True # Truncated or replaced; iter_chunks reads it from the start
+        return complete_lines_end(self.path, offset) != offset
+
+    def iter_chunks(self, state, chunk_rows=DEFAULT_CHUNK_ROWS):
+        start_offset = int(state.get_meta(self.cursor_key) or 0)
+        if start_offset > os.path.getsize(self.path):
+            # The queue was truncated or replaced rather than appended to; start over (row hashes still dedupe)
+            print(f"{self.path} is shorter than the saved offset {start_offset}; reading it from the start.")
+            start_offset = 0
+        self.end_offset = start_offset
+        return chunked(read_jsonl_requests(self.path, self, start_offset), chunk_rows)
+
+    def finish(self, state, unfinished):
+        """Moves the saved offset up to the first request that still isn't published."""
+        offset = min(unfinished) if unfinished else self.end_offset
+        state.set_meta(self.cursor_key, str(offset))
+        return []
+
+
+class DropFolderSource:
+    """
+    A directory that .csv and .jsonl batches are dropped into. Each file is read in full and moved to
+    <directory>/processed/ once every post in it has been published; files with failures stay put
+    and are retried on the next run.
+    """
+
+    required = False
+    extensions = (".csv", ".jsonl")
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.name = directory
+        self.processed_dir = os.path.join(directory, "processed")
+        self.files_read = []
+
+    def exists(self):
+        return os.path.isdir(self.directory)
+
+    def has_new(self, state):
+        """True if any batch files are waiting in the folder."""
+        return self.exists() and bool(self.pending_files())
+
+    def pending_files(self):
+        """Returns the batch files currently waiting in the folder, oldest name first."""
+        return sorted(
+            os.path.join(self.directory, name) for name in os.listdir(self.directory)
+            if name.endswith(self.extensions) and os.path.isfile(os.path.join(self.directory, name))
+        )
+
+    def iter_chunks(self, state, chunk_rows=DEFAULT_CHUNK_ROWS):
+        self.files_read = []
+        return chunked(self._requests(), chunk_rows)
+
+    def _requests(self):
+        for path in self.pending_files():
+            if path.endswith(".csv"):
+                yield from read_csv_requests(path, self, location=path)
+            else:
+                # A dropped batch is complete, so a last line without a newline is a request too
+                yield from read_jsonl_requests(path, self, location=path, complete=True)
+            self.files_read.append(path)
+
+    def finish(self, state, unfinished):
+        """Moves fully published batch files out of the folder. Returns the (old path, new path) of each file moved."""
+        moved = []
+        for path in self.files_read:
+            if path in unfinished:
+                continue
+            os.makedirs(self.processed_dir, exist_ok=True)
+            new_path = os.path.join(self.processed_dir, os.path.basename(path))
+            os.replace(path, new_path)
+            moved.append((path, new_path))
+            print(f"Moved processed batch {path} to {self.processed_dir}/.")
+        return moved
+
+
+SOURCE_TYPES = {"csv": CsvSource, "jsonl": JsonlSource, "dir": DropFolderSource}
+
+
+def parse_source(spec):
+    """
+    Builds a source from a 'type:path' spec, e.g. 'csv:blog.csv', 'jsonl:post_queue.jsonl' or 'dir:incoming'.
+    Raises ValueError for an unknown type.
+    """
+    kind, _, path = spec.partition(":")
+    if kind not in SOURCE_TYPES or not path:
+        raise ValueError(f"invalid source '{spec}', expected one of {', '.join(t + ':<path>' for t in SOURCE_TYPES)}")
+    return SOURCE_TYPES[kind](path)
@@ -0,0 +1,283 @@
+"""
+Per-row processing state, stored in SQLite.
+
+Every CSV row is identified by its row hash (see get_row_hash in
+generate_blog_posts.py). The store records how far each row got through the
+pipeline -- text, image, html, indexed -- together with the data needed to pick
+up from there (the generated text, the image files, the finished post record),
+the output paths and how long each stage took. A row that failed part-way is
+resumed from its first incomplete stage on the next run instead of being
+generated again from scratch.
+
+The database runs in WAL mode and writes are committed in batches; close()
+checkpoints the WAL and switches the file back to a rollback journal, so the
+single .sqlite3 file can be committed to the repository and opened read-only
+(read_only=True, used by the --check pre-check) without creating any files
+next to it. On first use, hashes from the old processed_posts.txt tracking
+file are imported as fully indexed rows. A small key/value table holds other
+run state, such as how far an input queue has been read, and two more tables
+hold the near-duplicate fingerprint of each request and its LSH buckets (see
+codestrym_blog.near_duplicates).
+
+Run `python -m codestrym_blog.state_store [db path]` for a per-stage summary.
+"""
+import json
+import os
+import sqlite3
+import sys
+import time
+
+STAGES = ("text", "image", "html", "indexed")
+STAGE_RANK = {stage: rank for rank, stage in enumerate(STAGES)}
+LOOKUP_BATCH = 500 # Row hashes per IN (...) query, well under SQLite's bound-parameter limit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows (
+    row_hash TEXT PRIMARY KEY,
+    stage TEXT NOT NULL,
+    stage_rank INTEGER NOT NULL,
+    data TEXT NOT NULL DEFAULT '{}',
+    paths TEXT NOT NULL DEFAULT '{}',
+    timings TEXT NOT NULL DEFAULT '{}',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS fingerprints (
+    row_hash TEXT PRIMARY KEY,
+    link TEXT NOT NULL,
+    signature BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS fingerprints_link ON fingerprints (link) WHERE link != '';
+CREATE TABLE IF NOT EXISTS fingerprint_buckets (
+    bucket INTEGER NOT NULL,
+    row_hash TEXT NOT NULL,
+    PRIMARY KEY (bucket, row_hash)
+) WITHOUT ROWID;
+"""
+
+
+def read_legacy_hashes(path):
+    """Returns the row hashes listed in an old processed_posts.txt, in file order."""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        # Older runs wrote a literal '\\n' between hashes, so split on that too
+        content = f.read().replace('\\n', '\n')
+    return [line.strip() for line in content.splitlines() if line.strip()]
+
+
+class StateStore:
+    """
+    Row-hash keyed pipeline state. Not thread-safe: use it from the thread that writes the output files.
+    """
+
+    def __init__(self, path, commit_every=20, legacy_processed_file=None, read_only=False):
+        self.path = path
+        self.commit_every = max(1, commit_every)
+        self.pending = 0
+        self.read_only = read_only
+        if read_only:
+            # Neither creates the file nor its tables; a missing file or table raises sqlite3.OperationalError
+            self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            return
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode NORMAL is still crash-safe for the database; only the last batch can be lost on power failure
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        if legacy_processed_file:
+            self._import_legacy(legacy_processed_file)
+
+    def _import_legacy(self, legacy_processed_file):
+        if self.connection.execute("SELECT 1 FROM rows LIMIT 1").fetchone():
+            return
+        hashes = read_legacy_hashes(legacy_processed_file)
+        if hashes:
+            now = time.time()
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO rows (row_hash, stage, stage_rank, created_at, updated_at) VALUES (?, 'indexed', ?, ?, ?)",
+                [(row_hash, STAGE_RANK["indexed"], now, now) for row_hash in hashes],
+            )
+            self.connection.commit()
+            print(f"Imported {len(hashes)} processed row(s) from {legacy_processed_file} into {self.path}.")
+
+    def get(self, row_hash):
+        """
+        Returns the state of a row as a dict with row_hash, stage, data, paths, timings,
+        created_at and updated_at, or None if the row has never been seen.
+        """
+        row = self.connection.execute(
+            "SELECT row_hash, stage, data, paths, timings, created_at, updated_at FROM rows WHERE row_hash = ?",
+            (row_hash,),
+        ).fetchone()
+        return None if row is None else self._state(row)
+
+    @staticmethod
+    def _state(row):
+        return {
+            "row_hash": row[0],
+            "stage": row[1],
+            "data": json.loads(row[2]),
+            "paths": json.loads(row[3]),
+            "timings": json.loads(row[4]),
+            "created_at": row[5],
+            "updated_at": row[6],
+        }
+
+    def get_stages(self, row_hashes):
+        """
+        Returns {row_hash: stage reached} for the rows in `row_hashes` that have been seen.
+        Looks rows up in batches and doesn't decode their stored data, so it stays cheap for large CSVs.
+        """
+        stages = {}
+        row_hashes = list(row_hashes)
+        for start in range(0, len(row_hashes), LOOKUP_BATCH):
+            batch = row_hashes[start:start + LOOKUP_BATCH]
+            stages.update(self.connection.execute(
+                f"SELECT row_hash, stage FROM rows WHERE row_hash IN ({','.join('?' * len(batch))})",
+                batch,
+            ).fetchall())
+        return stages
+
+    def advance(self, row_hash, stage, data=None, paths=None, timings=None):
+        """
+        Records that `row_hash` has completed `stage`, merging `data`, `paths` and `timings`
+        (seconds per stage) into what is already stored. A row never moves back to an earlier stage.
+        The write is committed with the next batch.
+        """
+        now = time.time()
+        current = self.get(row_hash)
+        merged = {"data": {}, "paths": {}, "timings": {}} if current is None else current
+        if current is not None and STAGE_RANK[current["stage"]] > STAGE_RANK[stage]:
+            stage = current["stage"]
+        merged["data"].update(data or {})
+        merged["paths"].update(paths or {})
+        merged["timings"].update(timings or {})
+        self.connection.execute(
+            """
+            INSERT INTO rows (row_hash, stage, stage_rank, data, paths, timings, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(row_hash) DO UPDATE SET
+                stage = excluded.stage, stage_rank = excluded.stage_rank, data = excluded.data,
+                paths = excluded.paths, timings = excluded.timings, updated_at = excluded.updated_at
+            """,
+            (
+                row_hash, stage, STAGE_RANK[stage],
+                json.dumps(merged["data"], ensure_ascii=False),
+                json.dumps(merged["paths"]),
+                json.dumps(merged["timings"]),
+                now, now,
+            ),
+        )
+        self._written()
+
+    def mark_indexed(self, row_hashes, seconds=None):
+        """Moves every row in `row_hashes` to the final 'indexed' stage."""
+        for row_hash in row_hashes:
+            self.advance(row_hash, "indexed", timings=None if seconds is None else {"indexed": seconds})
+
+    def unfinished(self):
+        """Returns the state of every row that has started but not reached the 'indexed' stage."""
+        rows = self.connection.execute(
+            "SELECT row_hash, stage, data, paths, timings, created_at, updated_at FROM rows WHERE stage_rank < ?",
+            (STAGE_RANK["indexed"],),
+        ).fetchall()
+        return [self._state(row) for row in rows]
+
+    def get_meta(self, key, default=None):
+        """Returns a value from the store's key/value table (e.g. a source's read offset)."""
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, key, value):
+        """Sets a value in the store's key/value table. The write is committed with the next batch."""
+        self.connection.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+        self._written()
+
+    def delete_meta(self, key):
+        """Removes a value from the store's key/value table."""
+        self.connection.execute("DELETE FROM meta WHERE key = ?", (key,))
+        self._written()
+
+    def missing_fingerprints(self, row_hashes):
+        """Returns the row hashes in `row_hashes` that have no near-duplicate fingerprint stored."""
+        row_hashes = list(row_hashes)
+        missing = set(row_hashes)
+        for start in range(0, len(row_hashes), LOOKUP_BATCH):
+            batch = row_hashes[start:start + LOOKUP_BATCH]
+            missing.difference_update(row[0] for row in self.connection.execute(
+                f"SELECT row_hash FROM fingerprints WHERE row_hash IN ({','.join('?' * len(batch))})",
+                batch,
+            ))
+        return missing
+
+    def add_fingerprint(self, row_hash, link, signature, buckets):
+        """Stores a row's normalized link, MinHash signature (bytes) and LSH buckets, unless it already has them."""
+        self.connection.execute(
+            "INSERT OR IGNORE INTO fingerprints (row_hash, link, signature) VALUES (?, ?, ?)",
+            (row_hash, link, signature),
+        )
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO fingerprint_buckets (bucket, row_hash) VALUES (?, ?)",
+            [(bucket, row_hash) for bucket in buckets],
+        )
+        self._written()
+
+    def fingerprint_candidates(self, link, buckets):
+        """Returns {row_hash: (link, signature)} for every row sharing one of `buckets` or, if set, the same `link`."""
+        buckets = list(buckets)
+        rows = self.connection.execute(
+            f"""
+            SELECT row_hash, link, signature FROM fingerprints
+            WHERE row_hash IN (SELECT row_hash FROM fingerprint_buckets WHERE bucket IN ({','.join('?' * len(buckets))}))
+            OR (link != '' AND link = ?)
+            """,
+            buckets + [link],
+        ).fetchall()
+        return {row_hash: (row_link, signature) for row_hash, row_link, signature in rows}
+
+    def _written(self):
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        """Commits the current batch of writes."""
+        self.connection.commit()
+        self.pending = 0
+
+    def stage_counts(self):
+        """Returns {stage: number of rows currently at that stage}."""
+        return dict(self.connection.execute("SELECT stage, COUNT(*) FROM rows GROUP BY stage").fetchall())
+
+    def close(self):
+        """Commits outstanding writes and folds the WAL back into the database file, leaving it in rollback-journal mode."""
+        if not self.read_only:
+            self.commit()
+            self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.connection.execute("PRAGMA journal_mode=DELETE")
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def reached(state, stage):
+    """Returns True if `state` (from StateStore.get) has completed `stage`."""
+    return state is not None and STAGE_RANK[state["stage"]] >= STAGE_RANK[stage]
+
+
+if __name__ == "__main__":
+    with StateStore(sys.argv[1] if len(sys.argv) > 1 else "blog_state.sqlite3") as store:
+        counts = store.stage_counts()
+        print(", ".join(f"{counts.get(stage, 0)} {stage}" for stage in STAGES))
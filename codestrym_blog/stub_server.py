@@ -0,0 +1,342 @@
+"""
+Local stand-in for the Gemini and Imagen REST APIs.
+
+Serves the endpoints the generator uses -- generateContent, streamGenerateContent
+(as server-sent events), predict, resumable file uploads, batchGenerateContent,
+batch polling and result downloads -- with
+canned, deterministic responses, so the pipeline can be exercised end to end
+without an API key or network access. Latency, error rate and payload sizes are
+tunable, so it also serves as the backend for codestrym_blog.benchmark. Point
+the generator at it with GOOGLE_API_BASE:
+
+    python -m codestrym_blog.stub_server --port 8765 --text-latency 0.8 --image-latency 4 --error-rate 0.02
+    GOOGLE_API_BASE=http://127.0.0.1:8765 GOOGLE_API_KEY=stub python generate_blog_posts.py --batch
+
+start_stub_server() runs it on a background thread for use from Python.
+"""
+import argparse
+import base64
+import itertools
+import json
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+MODEL_CALL_PATTERN = re.compile(r"^/v1beta/models/(?P<model>[^/:]+):(?P<method>\w+)$")
+STREAM_CHUNK_CHARS = 48 # Characters of text per streamed event, roughly what the real API sends
+
+
+FILLER_PARAGRAPH = (
+    "It balances price, build quality and everyday convenience better than most of the alternatives, "
+    "and it holds up well after months of regular use."
+)
+
+
+def png_bytes(width=64, height=64, rgb=(90, 120, 160), noise_seed=None):
+    """
+    Returns the bytes of an RGB PNG, built without Pillow. The image is a solid color, or random noise
+    (which doesn't compress, so the file is about width * height * 3 bytes like a real photo) when
+    `noise_seed` is given.
+    """
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+    if noise_seed is None:
+        pixels = (b"\x00" + bytes(rgb) * width) * height
+    else:
+        noise = random.Random(noise_seed)
+        pixels = b"".join(b"\x00" + noise.randbytes(width * 3) for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(pixels, 1))
+        + chunk(b"IEND", b"")
+    )
+
+
+def stub_text(payload, min_chars=0):
+    """
+    Returns a canned blog post (a one-line summary, then Markdown sections) for a generateContent payload,
+    padded with filler paragraphs to at least `min_chars` characters.
+    """
+    prompt = " ".join(part.get("text", "") for content in payload.get("contents", []) for part in content.get("parts", []))
+    topic = re.search(r"about '([^']*)'", prompt)
+    topic = topic.group(1) if topic else "this product"
+    body = [
+        f"A quick look at why {topic} is worth it.",
+        f"## Why {topic}?",
+        f"This is a stub article about {topic}, generated locally for testing.",
+    ]
+    length = sum(len(part) + 2 for part in body)
+    while length < min_chars:
+        body.append(FILLER_PARAGRAPH)
+        length += len(FILLER_PARAGRAPH) + 2
+    body += ["## Conclusion", "Grab the deal while it lasts."]
+    return "\n\n".join(body)
+
+
+def generate_content_response(payload, min_chars=0):
+    """Returns a generateContent response body for `payload`."""
+    text = stub_text(payload, min_chars)
+    prompt_chars = sum(len(part.get("text", "")) for content in payload.get("contents", []) for part in content.get("parts", []))
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+        # Roughly four characters per token, like the real tokenizer on English text
+        "usageMetadata": {"promptTokenCount": prompt_chars // 4, "candidatesTokenCount": len(text) // 4},
+    }
+
+
+def stream_content_events(payload, min_chars=0, chunk_chars=STREAM_CHUNK_CHARS):
+    """
+    Splits a generateContent response into the partial responses streamGenerateContent sends:
+    a few tokens of text each, with the finish reason and usage on the last one.
+    """
+    response = generate_content_response(payload, min_chars)
+    text = response["candidates"][0]["content"]["parts"][0]["text"]
+    chunks = [text[start:start + chunk_chars] for start in range(0, len(text), chunk_chars)]
+    events = [{"candidates": [{"content": {"role": "model", "parts": [{"text": chunk}]}}]} for chunk in chunks]
+    events[-1]["candidates"][0]["finishReason"] = "STOP"
+    events[-1]["usageMetadata"] = response["usageMetadata"]
+    return events
+
+
+class StubState:
+    """
+    Uploaded files and batch jobs held by one stub server, plus its behavior:
+
+    - text_latency / image_latency: seconds each generateContent / predict call takes, varied by +/- `jitter` (a fraction);
+      a streamed call spreads text_latency evenly over its events;
+    - error_rate: fraction of generateContent and predict calls answered with a 503 (Retry-After: `retry_after`);
+    - text_chars: minimum length of generated posts; image_size: width and height of generated images (noise, so they don't compress);
+    - batch_delay: seconds before a submitted batch job completes; with fail_batches, it then fails instead.
+    """
+
+    def __init__(self, batch_delay=0.0, text_latency=0.0, image_latency=0.0, jitter=0.0, error_rate=0.0,
+                 retry_after=0, text_chars=0, image_size=64, seed=0, fail_batches=False):
+        self.batch_delay = batch_delay
+        self.fail_batches = fail_batches
+        self.text_latency = text_latency
+        self.image_latency = image_latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.text_chars = text_chars
+        self.random = random.Random(seed)
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.uploads = {} # upload id -> display name
+        self.files = {} # "files/<id>" -> bytes
+        self.batches = {} # "batches/<id>" -> {"model", "input", "created", "output"}
+        self.image_base64 = base64.b64encode(png_bytes(image_size, image_size, noise_seed=seed if image_size > 64 else None)).decode('ascii')
+        self.calls = {"generateContent": 0, "predict": 0, "errors": 0}
+
+    def new_id(self):
+        with self.lock:
+            return next(self.ids)
+
+    def draw(self, method):
+        """Counts a call and returns (latency in seconds, whether it should fail) for it."""
+        latency = {"generateContent": self.text_latency, "streamGenerateContent": self.text_latency, "predict": self.image_latency}.get(method, 0.0)
+        with self.lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            factor = 1 + self.random.uniform(-self.jitter, self.jitter)
+            fail = self.random.random() < self.error_rate
+            if fail:
+                self.calls["errors"] += 1
+        return max(0.0, latency * factor), fail
+
+    def simulate(self, method):
+        """Sleeps for the method's latency and returns True if this call should fail."""
+        latency, fail = self.draw(method)
+        if latency:
+            time.sleep(latency)
+        return fail
+
+    def batch_operation(self, name):
+        """Returns the operation for a batch, running it (all at once) once `batch_delay` has passed."""
+        batch = self.batches[name]
+        done = time.monotonic() - batch["created"] >= self.batch_delay
+        if done and self.fail_batches:
+            return {
+                "name": name,
+                "metadata": {"model": f"models/{batch['model']}", "state": "BATCH_STATE_FAILED"},
+                "done": True,
+                "error": {"code": 500, "message": "The batch job failed."},
+            }
+        if done and batch["output"] is None:
+            lines = []
+            for line in self.files[batch["input"]].decode('utf-8').splitlines():
+                if line.strip():
+                    request = json.loads(line)
+                    lines.append(json.dumps({"key": request["key"], "response": generate_content_response(request["request"], self.text_chars)}))
+            output_name = f"files/{self.new_id()}"
+            self.files[output_name] = ("\n".join(lines) + "\n").encode('utf-8')
+            batch["output"] = output_name
+        operation = {
+            "name": name,
+            "metadata": {"model": f"models/{batch['model']}", "state": "BATCH_STATE_SUCCEEDED" if done else "BATCH_STATE_RUNNING"},
+            "done": done,
+        }
+        if done:
+            operation["response"] = {"responsesFile": batch["output"]}
+        return operation
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Routes requests to the stub endpoints. The server's `stub` attribute holds the StubState."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass # Keep the generator's output readable
+
+    def send_json(self, body, status=200, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_events(self, events, interval=0.0):
+        """Streams `events` as server-sent events, `interval` seconds apart, then closes the connection."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        for event in events:
+            if interval:
+                time.sleep(interval)
+            self.wfile.write(f"data: {json.dumps(event)}\r\n\r\n".encode('utf-8'))
+            self.wfile.flush()
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def do_POST(self):
+        stub = self.server.stub
+        url = urlparse(self.path)
+        body = self.read_body()
+
+        if url.path == "/upload/v1beta/files":
+            upload_id = parse_qs(url.query).get("upload_id", [None])[0]
+            if upload_id is None: # Start of a resumable upload
+                upload_id = str(stub.new_id())
+                stub.uploads[upload_id] = json.loads(body or b"{}").get("file", {}).get("display_name", "")
+                host = self.headers.get("Host", f"127.0.0.1:{self.server.server_port}")
+                return self.send_json({}, headers={"X-Goog-Upload-URL": f"http://{host}/upload/v1beta/files?upload_id={upload_id}"})
+            name = f"files/{upload_id}"
+            stub.files[name] = body
+            return self.send_json({"file": {"name": name, "displayName": stub.uploads.pop(upload_id, ""), "sizeBytes": str(len(body))}})
+
+        match = MODEL_CALL_PATTERN.match(url.path)
+        if not match:
+            return self.send_json({"error": {"code": 404, "message": f"unknown path {url.path}"}}, status=404)
+        payload = json.loads(body or b"{}")
+        model, method = match.group("model"), match.group("method")
+        fail = False
+        if method == "streamGenerateContent":
+            latency, fail = stub.draw(method)
+            if not fail:
+                events = stream_content_events(payload, stub.text_chars)
+                return self.send_events(events, latency / len(events))
+            time.sleep(latency)
+        elif method in ("generateContent", "predict"):
+            fail = stub.simulate(method)
+        if fail:
+            return self.send_json(
+                {"error": {"code": 503, "message": "The model is overloaded. Please try again later.", "status": "UNAVAILABLE"}},
+                status=503, headers={"Retry-After": str(stub.retry_after)},
+            )
+        if method == "generateContent":
+            return self.send_json(generate_content_response(payload, stub.text_chars))
+        if method == "predict":
+            return self.send_json({"predictions": [{"bytesBase64Encoded": stub.image_base64, "mimeType": "image/png"}]})
+        if method == "batchGenerateContent":
+            input_name = payload["batch"]["input_config"]["file_name"]
+            if input_name not in stub.files:
+                return self.send_json({"error": {"code": 400, "message": f"unknown file {input_name}"}}, status=400)
+            name = f"batches/{stub.new_id()}"
+            stub.batches[name] = {"model": model, "input": input_name, "created": time.monotonic(), "output": None}
+            return self.send_json(stub.batch_operation(name))
+        return self.send_json({"error": {"code": 404, "message": f"unknown method {method}"}}, status=404)
+
+    def do_GET(self):
+        stub = self.server.stub
+        url = urlparse(self.path)
+        if url.path.startswith("/v1beta/batches/"):
+            name = url.path[len("/v1beta/"):]
+            if name in stub.batches:
+                return self.send_json(stub.batch_operation(name))
+        elif url.path.startswith("/download/v1beta/files/") and url.path.endswith(":download"):
+            name = url.path[len("/download/v1beta/"):-len(":download")]
+            if name in stub.files:
+                data = stub.files[name]
+                self.send_response(200)
+                self.send_header("Content-Type", "application/jsonl")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+        self.send_json({"error": {"code": 404, "message": f"not found: {url.path}"}}, status=404)
+
+
+def make_server(host="127.0.0.1", port=8765, **options):
+    """Creates (but doesn't start) a stub server. Port 0 picks a free port. `options` are StubState settings."""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.request_queue_size = 128
+    server.stub = StubState(**options)
+    return server
+
+
+def add_stub_arguments(parser):
+    """Adds the StubState settings as command-line options (shared with the benchmark harness)."""
+    parser.add_argument("--text-latency", type=float, default=0.0, help="Seconds per generateContent call.")
+    parser.add_argument("--image-latency", type=float, default=0.0, help="Seconds per predict (Imagen) call.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random latency variation, as a fraction (0.2 = +/-20%%).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with 503.")
+    parser.add_argument("--retry-after", type=int, default=0, help="Retry-After seconds sent with errors.")
+    parser.add_argument("--text-chars", type=int, default=0, help="Minimum characters per generated post.")
+    parser.add_argument("--image-size", type=int, default=64, help="Width/height of generated images; above 64 they are incompressible noise.")
+    parser.add_argument("--batch-delay", type=float, default=0.0, help="Seconds before a submitted batch job completes.")
+    parser.add_argument("--fail-batches", action="store_true", help="Make submitted batch jobs fail once --batch-delay has passed.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency jitter, errors and image noise.")
+
+
+def stub_options(args):
+    """Returns the StubState settings from parsed add_stub_arguments() options."""
+    return {
+        "text_latency": args.text_latency, "image_latency": args.image_latency, "jitter": args.jitter,
+        "error_rate": args.error_rate, "retry_after": args.retry_after, "text_chars": args.text_chars,
+        "image_size": args.image_size, "batch_delay": args.batch_delay, "seed": args.seed,
+        "fail_batches": args.fail_batches,
+    }
+
+
+def start_stub_server(host="127.0.0.1", port=0, **options):
+    """Starts a stub server on a daemon thread. Returns (server, base_url); call server.shutdown() to stop it."""
+    server = make_server(host, port, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve stub Gemini/Imagen endpoints for local testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    server = make_server(args.host, args.port, **stub_options(args))
+    print(f"Stub Gemini/Imagen API listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,270 @@
+"""
+The site's stylesheet, built at generation time instead of in the reader's browser.
+
+Pages used to load the Tailwind CDN script, which compiles every utility class
+in the browser on each page view, plus a copy of the page styles in an inline
+<style> block. Instead, the generator writes one static stylesheet that every
+page links to:
+
+    styles/site.css                  base and component styles (minified)
+  + the utility classes in use       generated from the small Tailwind subset below
+
+Like Tailwind's own build, the classes in use are found by scanning the content
+the pages are made from, i.e. the quoted attribute values and string literals
+of the templates: every post and index page is rendered from them, and
+converted Markdown carries no classes of its own. Only tokens that resolve to a
+utility produce a rule, so the output holds just what the pages use.
+
+The file is named after a digest of its contents (css/site.<digest>.css), so it
+can be cached indefinitely and a changed stylesheet is a new URL.
+
+Run `python -m codestrym_blog.stylesheet` to print the generated stylesheet.
+"""
+import functools
+import hashlib
+import os
+import re
+
+from codestrym_blog.atomic_io import write_text_atomic
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATES_DIR = os.path.join(PACKAGE_DIR, "templates")
+BASE_STYLES_FILE = os.path.join(PACKAGE_DIR, "styles", "site.css")
+DIGEST_CHARS = 10 # Hex characters of the sha256 in the file name
+STYLESHEET_NAME_PATTERN = re.compile(r"^site\.[0-9a-f]{%d}\.css$" % DIGEST_CHARS)
+
+# Responsive variants, in the order their media queries are emitted (min-width in px)
+BREAKPOINTS = {"sm": 640, "md": 768, "lg": 1024, "xl": 1280, "2xl": 1536}
+PSEUDO_CLASSES = ("hover", "focus", "active")
+
+COLORS = {
+    "white": "#fff",
+    "black": "#000",
+    "gray": {50: "#f9fafb", 100: "#f3f4f6", 200: "#e5e7eb", 300: "#d1d5db", 400: "#9ca3af",
+             500: "#6b7280", 600: "#4b5563", 700: "#374151", 800: "#1f2937", 900: "#111827"},
+    "red": {50: "#fef2f2", 100: "#fee2e2", 200: "#fecaca", 300: "#fca5a5", 400: "#f87171",
+            500: "#ef4444", 600: "#dc2626", 700: "#b91c1c", 800: "#991b1b", 900: "#7f1d1d"},
+    "green": {50: "#f0fdf4", 100: "#dcfce7", 200: "#bbf7d0", 300: "#86efac", 400: "#4ade80",
+              500: "#22c55e", 600: "#16a34a", 700: "#15803d", 800: "#166534", 900: "#14532d"},
+    "blue": {50: "#eff6ff", 100: "#dbeafe", 200: "#bfdbfe", 300: "#93c5fd", 400: "#60a5fa",
+             500: "#3b82f6", 600: "#2563eb", 700: "#1d4ed8", 800: "#1e40af", 900: "#1e3a8a"},
+}
+FONT_SIZES = {
+    "xs": ".75rem;line-height:1rem", "sm": ".875rem;line-height:1.25rem", "base": "1rem;line-height:1.5rem",
+    "lg": "1.125rem;line-height:1.75rem", "xl": "1.25rem;line-height:1.75rem", "2xl": "1.5rem;line-height:2rem",
+    "3xl": "1.875rem;line-height:2.25rem", "4xl": "2.25rem;line-height:2.5rem", "5xl": "3rem;line-height:1",
+}
+FONT_WEIGHTS = {"light": 300, "normal": 400, "medium": 500, "semibold": 600, "bold": 700, "extrabold": 800}
+MAX_WIDTHS = {"sm": "24rem", "md": "28rem", "lg": "32rem", "xl": "36rem", "2xl": "42rem", "3xl": "48rem",
+              "4xl": "56rem", "5xl": "64rem", "6xl": "72rem", "7xl": "80rem", "full": "100%"}
+RADII = {"": ".25rem", "-md": ".375rem", "-lg": ".5rem", "-xl": ".75rem", "-2xl": "1rem", "-full": "9999px"}
+SHADOWS = {
+    "-sm": "0 1px 2px 0 rgb(0 0 0/.05)",
+    "": "0 1px 3px 0 rgb(0 0 0/.1),0 1px 2px -1px rgb(0 0 0/.1)",
+    "-md": "0 4px 6px -1px rgb(0 0 0/.1),0 2px 4px -2px rgb(0 0 0/.1)",
+    "-lg": "0 10px 15px -3px rgb(0 0 0/.1),0 4px 6px -4px rgb(0 0 0/.1)",
+    "-xl": "0 20px 25px -5px rgb(0 0 0/.1),0 8px 10px -6px rgb(0 0 0/.1)",
+    "-none": "0 0 #0000",
+}
+TRANSITIONS = {
+    "": "color,background-color,border-color,text-decoration-color,fill,stroke,opacity,box-shadow,transform,filter,backdrop-filter",
+    "-colors": "color,background-color,border-color,text-decoration-color,fill,stroke",
+    "-shadow": "box-shadow",
+    "-transform": "transform",
+}
+SIDES = {"t": ("top",), "r": ("right",), "b": ("bottom",), "l": ("left",), "x": ("left", "right"), "y": ("top", "bottom")}
+STATIC = {
+    "block": "display:block", "inline-block": "display:inline-block", "inline": "display:inline",
+    "flex": "display:flex", "inline-flex": "display:inline-flex", "grid": "display:grid", "hidden": "display:none",
+    "w-full": "width:100%", "h-full": "height:100%", "min-h-screen": "min-height:100vh",
+    "flex-grow": "flex-grow:1", "grow": "flex-grow:1", "flex-1": "flex:1 1 0%",
+    "flex-col": "flex-direction:column", "flex-row": "flex-direction:row", "flex-wrap": "flex-wrap:wrap",
+    "items-start": "align-items:flex-start", "items-center": "align-items:center", "items-end": "align-items:flex-end",
+    "justify-start": "justify-content:flex-start", "justify-center": "justify-content:center",
+    "justify-end": "justify-content:flex-end", "justify-between": "justify-content:space-between",
+    "overflow-hidden": "overflow:hidden", "object-cover": "object-fit:cover", "object-contain": "object-fit:contain",
+    "text-left": "text-align:left", "text-center": "text-align:center", "text-right": "text-align:right",
+    "underline": "text-decoration-line:underline",
+}
+
+
+def _spacing(value):
+    """Tailwind's spacing scale: 1 unit is .25rem."""
+    if value == "px":
+        return "1px"
+    if value == "auto":
+        return "auto"
+    rem = float(value) / 4
+    return f"{rem:g}rem".lstrip("0") if rem else "0px"
+
+
+def _color(name):
+    family, _, shade = name.rpartition("-")
+    if not family:
+        return COLORS.get(name) if isinstance(COLORS.get(name), str) else None
+    shades = COLORS.get(family)
+    return shades.get(int(shade)) if isinstance(shades, dict) and shade.isdigit() else None
+
+
+def _sides(property_name, value, sides=None):
+    """margin/padding declarations for one of SIDES, or the shorthand when `sides` is None."""
+    if sides is None:
+        return f"{property_name}:{_spacing(value)}"
+    return ";".join(f"{property_name}-{side}:{_spacing(value)}" for side in SIDES[sides])
+
+
+SPACING = r"(\d+(?:\.5)?|px)"
+SPACING_OR_AUTO = r"(\d+(?:\.5)?|px|auto)"
+# (pattern, selector suffix, declarations for the match), in the order the rules are emitted, so that
+# a later, more specific utility (px-6 after p-8, md:py-12 after py-8) wins over an earlier one
+UTILITIES = [
+    (re.compile(r"^(block|inline-block|inline|flex|inline-flex|grid|hidden)$"), "", lambda m: STATIC[m.group(0)]),
+    (re.compile(r"^m-%s$" % SPACING_OR_AUTO), "", lambda m: _sides("margin", m.group(1))),
+    (re.compile(r"^m([xy])-%s$" % SPACING_OR_AUTO), "", lambda m: _sides("margin", m.group(2), m.group(1))),
+    (re.compile(r"^m([trbl])-%s$" % SPACING_OR_AUTO), "", lambda m: _sides("margin", m.group(2), m.group(1))),
+    (re.compile(r"^h-%s$" % SPACING), "", lambda m: f"height:{_spacing(m.group(1))}"),
+    (re.compile(r"^max-h-%s$" % SPACING), "", lambda m: f"max-height:{_spacing(m.group(1))}"),
+    (re.compile(r"^(w-full|h-full|min-h-screen)$"), "", lambda m: STATIC[m.group(0)]),
+    (re.compile(r"^w-%s$" % SPACING), "", lambda m: f"width:{_spacing(m.group(1))}"),
+    (re.compile(r"^max-w-(\w+)$"), "", lambda m: MAX_WIDTHS.get(m.group(1)) and f"max-width:{MAX_WIDTHS[m.group(1)]}"),
+    (re.compile(r"^(flex-1|flex-grow|grow)$"), "", lambda m: STATIC[m.group(0)]),
+    (re.compile(r"^grid-cols-(\d+)$"), "", lambda m: f"grid-template-columns:repeat({m.group(1)},minmax(0,1fr))"),
+    (re.compile(r"^(flex-col|flex-row|flex-wrap|items-\w+|justify-\w+)$"), "", lambda m: STATIC.get(m.group(0))),
+    (re.compile(r"^gap-%s$" % SPACING), "", lambda m: f"gap:{_spacing(m.group(1))}"),
+    (re.compile(r"^space-x-%s$" % SPACING), ">:not([hidden])~:not([hidden])", lambda m: f"margin-left:{_spacing(m.group(1))}"),
+    (re.compile(r"^space-y-%s$" % SPACING), ">:not([hidden])~:not([hidden])", lambda m: f"margin-top:{_spacing(m.group(1))}"),
+    (re.compile(r"^(overflow-hidden)$"), "", lambda m: STATIC[m.group(0)]),
+    (re.compile(r"^rounded(|-\w+)$"), "", lambda m: RADII.get(m.group(1)) and f"border-radius:{RADII[m.group(1)]}"),
+    (re.compile(r"^bg-([a-z]+(?:-\d+)?)$"), "", lambda m: _color(m.group(1)) and f"background-color:{_color(m.group(1))}"),
+    (re.compile(r"^(object-cover|object-contain)$"), "", lambda m: STATIC[m.group(0)]),
+    (re.compile(r"^p-%s$" % SPACING), "", lambda m: _sides("padding", m.group(1))),
+    (re.compile(r"^p([xy])-%s$" % SPACING), "", lambda m: _sides("padding", m.group(2), m.group(1))),
+    (re.compile(r"^p([trbl])-%s$" % SPACING), "", lambda m: _sides("padding", m.group(2), m.group(1))),
+    (re.compile(r"^text-(left|center|right)$"), "", lambda m: STATIC[m.group(0)]),
+    (re.compile(r"^text-(xs|sm|base|lg|\d?xl)$"), "", lambda m: FONT_SIZES.get(m.group(1)) and f"font-size:{FONT_SIZES[m.group(1)]}"),
+    (re.compile(r"^font-(\w+)$"), "", lambda m: FONT_WEIGHTS.get(m.group(1)) and f"font-weight:{FONT_WEIGHTS[m.group(1)]}"),
+    (re.compile(r"^text-([a-z]+(?:-\d+)?)$"), "", lambda m: _color(m.group(1)) and f"color:{_color(m.group(1))}"),
+    (re.compile(r"^(underline)$"), "", lambda m: STATIC[m.group(0)]),
+    (re.compile(r"^shadow(|-\w+)$"), "", lambda m: SHADOWS.get(m.group(1)) and f"box-shadow:{SHADOWS[m.group(1)]}"),
+    (re.compile(r"^transition(|-\w+)$"), "", lambda m: TRANSITIONS.get(m.group(1)) and (
+        f"transition-property:{TRANSITIONS[m.group(1)]};transition-timing-function:cubic-bezier(.4,0,.2,1);transition-duration:150ms")),
+    (re.compile(r"^duration-(\d+)$"), "", lambda m: f"transition-duration:{m.group(1)}ms"),
+]
+
+QUOTED_PATTERN = re.compile(r'"[^"\n]*"|\'[^\'\n]*\'') # Attribute values and template string literals
+CANDIDATE_PATTERN = re.compile(r"[A-Za-z0-9:._-]+") # Class-like tokens inside them
+BLOCK_TAG_PATTERN = re.compile(r"\{%-?\s*(?:end)?block\b.*?%\}") # {% block %} tags may sit inside a class attribute
+COMMENT_PATTERN = re.compile(r"/\*.*?\*/", re.DOTALL)
+SPACE_AROUND_PATTERN = re.compile(r"\s*([{};,>])\s*")
+
+
+def resolve(utility):
+    """Returns (rank, selector suffix, declarations) for a utility class without variants, or None."""
+    for rank, (pattern, suffix, declarations) in enumerate(UTILITIES):
+        match = pattern.match(utility)
+        if match:
+            css = declarations(match)
+            return (rank, suffix, css) if css else None
+    return None
+
+
+def parse_class(name):
+    """Splits e.g. 'md:hover:bg-blue-700' into (breakpoint, pseudo-class, utility); None if a variant is unknown."""
+    *variants, utility = name.split(":")
+    breakpoint = pseudo = None
+    for variant in variants:
+        if variant in BREAKPOINTS and breakpoint is None:
+            breakpoint = variant
+        elif variant in PSEUDO_CLASSES and pseudo is None:
+            pseudo = variant
+        else:
+            return None
+    return breakpoint, pseudo, utility
+
+
+def escape_class(name):
+    """Escapes a class name for use in a selector."""
+    return re.sub(r"([:./])", r"\\\1", name)
+
+
+def collect_classes(directory=TEMPLATES_DIR):
+    """Returns the utility classes used in the templates under `directory` (plus 'container' if used)."""
+    used = set()
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(".html"):
+                continue
+            with open(os.path.join(root, name), 'r', encoding='utf-8') as f:
+                quoted = " ".join(QUOTED_PATTERN.findall(BLOCK_TAG_PATTERN.sub("", f.read())))
+                for token in CANDIDATE_PATTERN.findall(quoted):
+                    parsed = parse_class(token)
+                    if parsed and (parsed[2] == "container" or resolve(parsed[2])):
+                        used.add(token)
+    return used
+
+
+def utility_rules(classes):
+    """Returns the CSS rules for `classes`, ordered as Tailwind orders them (base, then pseudo-classes, then breakpoints)."""
+    rules = []
+    for name in classes:
+        breakpoint, pseudo, utility = parse_class(name)
+        if utility == "container":
+            continue
+        rank, suffix, declarations = resolve(utility)
+        selector = "." + escape_class(name) + (f":{pseudo}" if pseudo else "") + suffix
+        order = list(BREAKPOINTS).index(breakpoint) + 1 if breakpoint else 0
+        rules.append(((order, pseudo is not None, rank, name), breakpoint, f"{selector}{{{declarations}}}"))
+    rules.sort()
+
+    css = []
+    if "container" in classes:
+        css.append(".container{width:100%}")
+        css.extend(f"@media (min-width:{width}px){{.container{{max-width:{width}px}}}}" for width in BREAKPOINTS.values())
+    for breakpoint in [None] + list(BREAKPOINTS):
+        block = "".join(rule for _, rule_breakpoint, rule in rules if rule_breakpoint == breakpoint)
+        if block and breakpoint:
+            block = f"@media (min-width:{BREAKPOINTS[breakpoint]}px){{{block}}}"
+        css.append(block)
+    return "".join(css)
+
+
+def minify(css):
+    """Strips comments and insignificant whitespace from hand-written CSS."""
+    css = COMMENT_PATTERN.sub("", css)
+    css = SPACE_AROUND_PATTERN.sub(r"\1", " ".join(css.split()))
+    return css.replace(";}", "}").replace(": ", ":").strip()
+
+
+@functools.lru_cache(maxsize=None)
+def build(templates_dir=TEMPLATES_DIR, base_styles_file=BASE_STYLES_FILE):
+    """Returns (file name, contents) of the stylesheet for the templates in `templates_dir`."""
+    with open(base_styles_file, 'r', encoding='utf-8') as f:
+        css = minify(f.read()) + utility_rules(collect_classes(templates_dir)) + "\n"
+    digest = hashlib.sha256(css.encode('utf-8')).hexdigest()[:DIGEST_CHARS]
+    return f"site.{digest}.css", css
+
+
+def write(directory):
+    """Writes the stylesheet into `directory` unless it is already there. Returns its path if written, else None."""
+    name, css = build()
+    path = f"{directory}/{name}"
+    if os.path.exists(path):
+        return None
+    write_text_atomic(path, css)
+    return path
+
+
+def remove_stale(directory):
+    """Deletes stylesheets from earlier builds in `directory`. Returns the removed paths."""
+    current, _ = build()
+    removed = []
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            if STYLESHEET_NAME_PATTERN.match(name) and name != current:
+                os.remove(f"{directory}/{name}")
+                removed.append(f"{directory}/{name}")
+    return removed
+
+
+if __name__ == "__main__":
+    print(build()[1], end="")
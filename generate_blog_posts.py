@@ -1,473 +1,1224 @@
-import os
-import json
-import base64
-import requests
-import pandas as pd
-from datetime import datetime
-import re # For sanitizing filenames
-import hashlib # For creating unique hashes of CSV rows
-import markdown # For converting Markdown to HTML
-
---- Configuration (Pulled from GitHub Actions Environment Variables) ---
-GITHUB_REPO_OWNER = os.environ.get("GITHUB_REPO_OWNER")
-GITHUB_REPO_NAME = os.environ.get("GITHUB_REPO_NAME")
-GITHUB_BRANCH = os.environ.get("GITHUB_BRANCH")
-GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
-
---- API Endpoints ---
-GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
-IMAGEN_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/imagen-3.0-generate-002:predict"
-
---- File Paths ---
-PROCESSED_POSTS_FILE = "processed_posts.txt" # File to keep track of processed CSV rows
-CSV_FILE_NAME = "blog.csv" # Specifically targets your 'blog.csv' file
-
---- Helper Functions ---
-def sanitize_filename(text):
-"""
-Converts a given text string into a URL-friendly and filename-safe format.
-Removes special characters, replaces spaces with hyphens, and limits length.
-"""
-text = text.lower()
-# Remove non-alphanumeric characters except spaces and hyphens
-text = re.sub(r'[^a-z0-9\\s-]', '', text)
-# Replace one or more spaces with a single hyphen
-text = re.sub(r'\s+', '-', text)
-# Remove leading/trailing hyphens
-text = text.strip('-')
-# Limit length to avoid excessively long filenames, adjust as needed
-return text[:60]
-
-def remove_emojis(text):
-"""Removes emojis from a string."""
-# This regex matches common emoji unicode ranges
-emoji_pattern = re.compile(
-"["
-"\U0001F600-\U0001F64F"  # emoticons
-"\U0001F300-\U0001F5FF"  # symbols & pictographs
-"\U0001F680-\U0001F6FF"  # transport & map symbols
-"\U0001F1E0-\U0001F1FF"  # flags (iOS)
-"\U00002702-\U000027B0"
-"\U000024C2-\U0001F251"
-"]+", flags=re.UNICODE
-)
-return emoji_pattern.sub(r'', text)
-
-def get_row_hash(row):
-"""
-Generates a unique hash for a CSV row based on key content (excluding 'Time').
-This helps in identifying if a row has already been processed.
-"""
-# Using 'Platform', 'Text', and 'Hyperlink' for uniqueness since 'Time' is removed
-unique_string = f"{row.get('Platform', '')}-{row.get('Text', '')}-{row.get('Hyperlink', '')}"
-return hashlib.sha256(unique_string.encode('utf-8')).hexdigest()
-
-def load_processed_posts():
-"""Loads the set of hashes for already processed posts from the tracking file."""
-if os.path.exists(PROCESSED_POSTS_FILE):
-with open(PROCESSED_POSTS_FILE, 'r', encoding='utf-8') as f:
-return set(line.strip() for line in f if line.strip())
-return set()
-
-def save_processed_post(row_hash):
-"""Adds a new post hash to the tracking file."""
-with open(PROCESSED_POSTS_FILE, 'a', encoding='utf-8') as f:
-f.write(row_hash + '\n')
-
-def call_gemini_api(prompt_text):
-"""
-Calls the Google Gemini API (gemini-2.0-flash) to generate text content.
-Returns the generated text or None if an error occurs.
-"""
-headers = {'Content-Type': 'application/json'}
-payload = {
-"contents": [{"role": "user", "parts": [{"text": prompt_text}]}],
-"generationConfig": {
-"temperature": 0.7,
-"topP": 0.95,
-"topK": 40,
-"maxOutputTokens": 1500, # Increased max output tokens for longer articles
-}
-}
-try:
-response = requests.post(f"{GEMINI_API_URL}?key={GOOGLE_API_KEY}", headers=headers, json=payload)
-response.raise_for_status()
-result = response.json()
-if result.get("candidates") and result["candidates"][0].get("content") and result["candidates"][0]["content"].get("parts"):
-return result["candidates"][0]["content"]["parts"][0]["text"]
-else:
-print(f"Gemini API response missing content: {result}")
-return None
-except requests.exceptions.RequestException as e:
-print(f"Error calling Gemini API: {e}")
-return None
-
-def call_imagen_api(prompt_text):
-"""
-Calls the Google Imagen API (imagen-3.0-generate-002) to generate an image.
-Returns the base64 encoded image data or None if an error occurs.
-"""
-headers = {'Content-Type': 'application/json'}
-payload = {
-"instances": {"prompt": prompt_text},
-"parameters": {"sampleCount": 1}
-}
-try:
-response = requests.post(f"{IMAGEN_API_URL}?key={GOOGLE_API_KEY}", headers=headers, json=payload)
-response.raise_for_status()
-result = response.json()
-if result.get("predictions") and result["predictions"][0].get("bytesBase64Encoded"):
-return result["predictions"][0]["bytesBase64Encoded"]
-else:
-print(f"Imagen API response missing image data: {result}")
-return None
-except requests.exceptions.RequestException as e:
-print(f"Error calling Imagen API: {e}")
-return None
-
-def generate_blog_post_html(title, content, image_url, affiliate_link, author="Codestrym Staff", date=None):
-"""
-Generates the complete HTML content for a single blog post page,
-including a prominent affiliate link button.
-"""
-if date is None:
-date = datetime.now().strftime("%B %d, %Y")
-
-# Corrected base_public_path for GitHub Pages project sites
-base_public_path = f"https://{GITHUB_REPO_OWNER}.github.io/{GITHUB_REPO_NAME}"
-
-display_affiliate_link = affiliate_link if affiliate_link and affiliate_link.startswith('http') else '#'
-
-# Convert Markdown content to HTML
-html_content = markdown.markdown(content)
-
-html_template = f"""
-
-<!DOCTYPE html>
-
-<html lang="en">
-<head>
-<meta charset="UTF-8">
-<meta name="viewport" content="width=device-width, initial-scale=1.0">
-<title>{title}</title>
-<!-- Tailwind CSS CDN for styling -->
-<script src="https://cdn.tailwindcss.com"></script>
-<!-- Google Fonts - Inter for consistent typography -->
-<link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap" rel="stylesheet">
-<style>
-body {{
-font-family: 'Inter', sans-serif;
-background-color: #f8fafc;
-line-height: 1.6;
-color: #333;
-}}
-.blog-content h1, .blog-content h2, .blog-content h3 {{
-margin-top: 1.5em;
-margin-bottom: 0.5em;
-font-weight: 600;
-}}
-.blog-content p {{
-margin-bottom: 1em;
-}}
-.blog-content ul, .blog-content ol {{
-margin-left: 1.5em;
-margin-bottom: 1em;
-list-style-type: disc;
-}}
-.blog-content ol {{
-list-style-type: decimal;
-}}
-.affiliate-button-container {{
-margin-top: 2.5rem; /* More space above the button /
-margin-bottom: 2.5rem; / More space below the button /
-text-align: center;
-}}
-.affiliate-button {{
-display: inline-block;
-background-color: #ef4444; / Red color for prominence /
-color: white;
-padding: 1rem 2rem; / Larger padding /
-border-radius: 0.75rem; / More rounded corners /
-font-size: 1.25rem; / Larger font size /
-font-weight: 700; / Bold text /
-text-decoration: none;
-box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1); / Subtle shadow /
-transition: background-color 0.3s ease, transform 0.2s ease;
-}}
-.affiliate-button:hover {{
-background-color: #dc2626; / Darker red on hover /
-transform: translateY(-2px); / Slight lift effect /
-}}
-.affiliate-button:active {{
-transform: translateY(0); / Press down effect */
-box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-}}
-</style>
-</head>
-<body class="flex flex-col min-h-screen">
-<!-- Header Section - Consistent with your blog.html structure -->
-<header class="bg-white shadow-md py-4 px-6 md:px-10 lg:px-16">
-<div class="container mx-auto flex justify-between items-center">
-<h1 style="font-size: 20px;">
-<span style="color: black;">C</span>
-<span style="color: black;">o</span>
-<span style="color: black;">d</span>
-<span style="color: black;">e</span>
-<span style="color: red;">S</span>
-<span style="color: green;">t</span>
-<span style="color: purple;">r</span>
-<span style="color: orange;">y</span>
-<span style="color: blue;">m</span>
-</h1>
-<nav>
-<ul class="flex space-x-4">
-<li><a href="{base_public_path}/index.html" class="text-gray-600 hover:text-blue-600 font-medium transition duration-300">Home</a></li>
-<li><a href="{base_public_path}/blog.html" class="text-blue-600 hover:text-blue-700 font-medium transition duration-300">Blog</a></li>
-<li><a href="#" class="text-gray-600 hover:text-blue-600 font-medium transition duration-300">About</a></li>
-<li><a href="#" class="text-gray-600 hover:text-blue-600 font-medium transition duration-300">Contact</a></li>
-</ul>
-</nav>
-</div>
-</header>
-
-<!-- Main Content Area for the single blog post -->
-<main class="flex-grow container mx-auto px-4 py-8 md:py-12 max-w-3xl">
-    <article class="bg-white rounded-xl shadow-lg p-8">
-        <h1 class="text-4xl font-extrabold text-gray-900 mb-4">{title}</h1>
-        <div class="text-gray-500 text-sm mb-6">
-            <span>By : {author}</span> &bull; <span>{date}</span>
-        </div>
-        <img src="{image_url}" alt="{title} image" class="w-full rounded-lg mb-8 object-cover max-h-96">
-        <div class="blog-content text-gray-700 text-lg">
-            {html_content}
-        </div>
-        
-        <div class="affiliate-button-container">
-            <a href="{display_affiliate_link}" target="_blank" rel="noopener noreferrer" class="affiliate-button">
-                Click Here for the Best Deal!
-            </a>
-        </div>
-
-        <div class="mt-8 text-center">
-            <a href="{base_public_path}/blog.html" class="inline-block bg-blue-600 text-white px-6 py-3 rounded-lg hover:bg-blue-700 transition duration-300 font-medium">Back to Blog</a>
-        </div>
-    </article>
-</main>
-
-<!-- Footer Section - Consistent with your blog.html structure -->
-<footer class="bg-gray-800 text-white py-6 px-4 md:px-10 lg:px-16 mt-8">
-    <div class="container mx-auto text-center text-sm">
-        <p>&copy; {datetime.now().year} Codestrym. All rights reserved.</p> <!-- Corrected text here -->
-        <p class="mt-2">
-            <a href="#" class="text-gray-400 hover:text-white transition duration-300">Privacy Policy</a> |
-            <a href="#" class="text-gray-400 hover:text-white transition duration-300">Terms of Service</a>
-        </p>
-    </div>
-</footer>
-
-</body>
-</html>
-"""
-return html_template
-
-def update_blog_index(new_post_info):
-"""
-Reads the main blog.html file, inserts a new blog post card,
-and updates the file locally within the GitHub Actions runner.
-This updated file will then be committed back to the repository.
-"""
-blog_index_path = "blog.html"
-
-try:
-    with open(blog_index_path, 'r', encoding='utf-8') as f:
-        blog_content = f.read()
-except FileNotFoundError:
-    print(f"Error: {blog_index_path} not found. Please ensure it exists in the repository root.")
-    return False
-
-# --- IMPORTANT CHANGES HERE: Author, and button layout ---
-new_card_html = f"""
-        <!-- Automated Blog Post Card - {new_post_info['title']} -->
-        <div class="bg-white rounded-xl shadow-lg hover:shadow-xl transition-shadow duration-300 overflow-hidden">
-            <img src="{new_post_info['image_url']}" alt="{new_post_info['title']} image" class="w-full h-48 object-cover">
-            <div class="p-6 flex flex-col"> <!-- Added flex flex-col to make content area a flex container -->
-                <h2 class="text-xl font-semibold text-gray-800 mb-2">{new_post_info['title']}</h2>
-                <p class="text-gray-600 text-sm mb-4 flex-grow">{new_post_info['summary']}</p> <!-- Added flex-grow to push content down -->
-                <div class="flex items-center text-gray-500 text-xs mb-4">
-                    <span class="mr-3">By : {new_post_info['author']}</span>
-                    <span>{new_post_info['date']}</span>
-                </div>
-                
-                <div class="flex justify-center space-x-4 mt-4">
-                    <a href="{new_post_info['affiliate_link']}" target="_blank" rel="noopener noreferrer" class="inline-block bg-red-500 hover:bg-red-600 text-white font-bold py-2 px-4 rounded-lg text-sm transition duration-300">
-                        Shop Now!
-                    </a>
-                    <a href="{new_post_info['post_url']}" class="inline-block bg-blue-600 text-white px-5 py-2 rounded-lg hover:bg-blue-700 transition duration-300 font-medium">Read More</a>
-                </div>
-            </div>
-        </div>
-        <!-- End Automated Blog Post Card -->
-"""
-
-insertion_point = '        </div>\n    </main>'
-
-if insertion_point in blog_content:
-    updated_content = blog_content.replace(insertion_point, new_card_html + insertion_point, 1)
-    with open(blog_index_path, 'w', encoding='utf-8') as f:
-        f.write(updated_content)
-    print(f"Successfully updated {blog_index_path} locally.")
-    return True
-else:
-    print(f"Could not find insertion point in {blog_index_path}. Manual update may be needed.")
-    return False
-
---- Main Script Logic ---
-def main():
-if not GOOGLE_API_KEY:
-print("Error: GOOGLE_API_KEY environment variable not set. Please add it as a GitHub Secret.")
-return
-
-if not GITHUB_REPO_OWNER or not GITHUB_REPO_NAME or not GITHUB_BRANCH:
-    print("Error: GitHub repository details not fully configured in environment variables.")
-    return
-
-csv_file_path = CSV_FILE_NAME # Use the specific CSV file name
-try:
-    df = pd.read_csv(csv_file_path)
-except FileNotFoundError:
-    print(f"Error: CSV file '{csv_file_path}' not found. Please ensure it's in the repository root.")
-    return
-except Exception as e:
-    print(f"Error reading CSV file: {e}")
-    return
-
-processed_posts_hashes = load_processed_posts()
-newly_processed_hashes = set()
-
-posts_to_process_in_this_run = []
-
-# Process all rows in blog.csv, as time-based filtering is removed
-for index, row in df.iterrows():
-    row_hash = get_row_hash(row)
-    if row_hash not in processed_posts_hashes:
-        posts_to_process_in_this_run.append((index, row, row_hash))
-    else:
-        print(f"Skipping row {index} (already processed).")
-
-if not posts_to_process_in_this_run:
-    print("No new posts found in blog.csv or all posts already processed.")
-    return
-
-print(f"Found {len(posts_to_process_in_this_run)} new post(s) to process from {CSV_FILE_NAME}.")
-
-for index, row, row_hash in posts_to_process_in_this_run:
-    post_text = row.get('Text', '')
-    image_category = row.get('images', '').strip('/')
-    affiliate_link = row.get('Hyperlink', '#') # Get the affiliate link
-
-    if not post_text:
-        print(f"Skipping row {index} due to missing 'Text' content.")
-        continue
-    
-    keyword_for_ai = image_category if image_category else post_text.split('.')[0].strip()
-
-    print(f"\nProcessing new row {index}: Social Text='{post_text}', AI Keyword='{keyword_for_ai}'")
-
-    # 1. Generate Blog Post Text
-    # Refined prompt to avoid "Summary:" prefix and encourage Markdown for structure
-    text_prompt = f"Write a comprehensive and engaging blog post about '{keyword_for_ai}' based on the idea: '{post_text}'. The post should include an introduction, 2-3 main sections with clear Markdown headings (e.g., '## Section Title'), and a conclusion. Ensure the content flows naturally with paragraphs. The tone should be informative and slightly enthusiastic. Provide a concise summary (1-2 sentences) at the very beginning of the response, *without* explicitly labeling it 'Summary:'. Do not use emojis or excessive special characters like asterisks or hashtags within the main body of the text, only for Markdown formatting."
-    generated_text_with_summary = call_gemini_api(text_prompt)
-
-    if not generated_text_with_summary:
-        print(f"Failed to generate blog post text for row {index}. Skipping.")
-        continue
-
-    # Extract summary and full content
-    summary_end_index = generated_text_with_summary.find('\n\n')
-    if summary_end_index != -1:
-        summary = generated_text_with_summary[:summary_end_index].strip()
-        full_content = generated_text_with_summary[summary_end_index:].strip()
-    else:
-        summary = generated_text_with_summary[:150].strip() + "..."
-        full_content = generated_text_with_summary.strip()
-    
-    # Post-process: Remove emojis from full content
-    full_content = remove_emojis(full_content)
-    summary = remove_emojis(summary)
-
-    # 2. Generate Image
-    image_prompt = f"A vibrant and engaging image representing '{keyword_for_ai}'. Focus on concepts related to {keyword_for_ai}."
-    generated_image_base64 = call_imagen_api(image_prompt)
-
-    if not generated_image_base64:
-        print(f"Failed to generate image for row {index}. Skipping.")
-        continue
-
-    # 3. Prepare file names and paths
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    sanitized_title = sanitize_filename(keyword_for_ai)
-    post_filename_relative = f"posts/{timestamp}-{sanitized_title}.html"
-    image_filename_relative = f"images/{timestamp}-{sanitized_title}.png"
-
-    os.makedirs(os.path.dirname(post_filename_relative), exist_ok=True)
-    os.makedirs(os.path.dirname(image_filename_relative), exist_ok=True)
-
-    # Corrected base_public_path for GitHub Pages project sites
-    base_public_path = f"https://{GITHUB_REPO_OWNER}.github.io/{GITHUB_REPO_NAME}"
-    image_public_url = f"{base_public_path}/{image_filename_relative}"
-    post_public_url = f"{base_public_path}/{post_filename_relative}"
-
-    # 4. Save the generated image locally
-    try:
-        with open(image_filename_relative, 'wb') as f:
-            f.write(base64.b64decode(generated_image_base64))
-        print(f"Image saved locally: {image_filename_relative}")
-    except Exception as e:
-        print(f"Error saving image locally {image_filename_relative}: {e}")
-        continue
-
-    # 5. Create the new blog post HTML file content
-    blog_post_html_content = generate_blog_post_html(
-        title=keyword_for_ai.replace('-', ' ').title(),
-        content=full_content, # This content will now be Markdown and converted to HTML
-        image_url=image_public_url,
-        affiliate_link=affiliate_link, # Pass the affiliate link to the full post HTML
-        author="Codestrym Staff", # Explicitly set author for full post
-        date=datetime.now().strftime("%B %d, %Y")
-    )
-
-    # 6. Save the new blog post HTML file locally
-    try:
-        with open(post_filename_relative, 'w', encoding='utf-8') as f:
-            f.write(blog_post_html_content)
-        print(f"Blog post HTML saved locally: {post_filename_relative}")
-    except Exception as e:
-        print(f"Error saving blog post HTML locally {post_filename_relative}: {e}")
-        continue
-
-    # 7. Update blog.html index locally
-    new_post_info = {
-        "title": keyword_for_ai.replace('-', ' ').title(),
-        "summary": summary,
-        "image_url": image_public_url,
-        "post_url": post_public_url,
-        "affiliate_link": affiliate_link, # Pass the affiliate link to the index update
-        "author": "Codestrym Staff", # Explicitly set author for snippet
-        "date": datetime.now().strftime("%B %d, %Y")
-    }
-    if not update_blog_index(new_post_info):
-        print(f"Warning: Failed to update blog.html for post '{keyword_for_ai}'.")
-    
-    newly_processed_hashes.add(row_hash)
-
-if newly_processed_hashes:
-    print(f"\nSaving {len(newly_processed_hashes)} newly processed post hashes to {PROCESSED_POSTS_FILE}...")
-    for h in newly_processed_hashes:
-        save_processed_post(h)
-else:
-    print("\nNo new posts were processed in this run.")
-
-print("\nBlog post generation and local updates complete. The GitHub Actions 'Commit and push changes' step will now push these files to your repository.")
-
-if name == "main":
-main()
+import os
+import sys
+import csv
+from datetime import datetime
+import re # For sanitizing filenames
+import sqlite3
+import threading
+import time
+import argparse
+import functools
+from collections import deque
+
+# Only the standard library and the stdlib-only codestrym_blog modules are imported up front, so a run with
+# nothing new to publish can exit before requests, markdown, jinja2 or Pillow are loaded. The heavy modules
+# are imported inside the functions that need them.
+from codestrym_blog import markup, output_stage, search_index, sources, stylesheet
+from codestrym_blog.asset_store import AssetStore, base64_digest
+from codestrym_blog.atomic_io import write_base64_atomic
+from codestrym_blog.batch_client import BatchError, BatchPending, GeminiBatchClient, write_batch_file
+from codestrym_blog.blog_index import build_blog_pages, page_path, write_if_changed
+from codestrym_blog.metrics import Metrics, peak_rss_bytes, summary_table
+from codestrym_blog.near_duplicates import NearDuplicateIndex
+from codestrym_blog.post_manifest import import_post_sources, load_assets, load_manifest, save_feed, save_manifest
+from codestrym_blog.response_cache import ResponseCache, cache_key
+from codestrym_blog.state_store import StateStore, reached
+
+# --- Configuration (Pulled from GitHub Actions Environment Variables) ---
+GITHUB_REPO_OWNER = os.environ.get("GITHUB_REPO_OWNER")
+GITHUB_REPO_NAME = os.environ.get("GITHUB_REPO_NAME")
+GITHUB_BRANCH = os.environ.get("GITHUB_BRANCH")
+GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
+
+# --- API Endpoints ---
+# Point GOOGLE_API_BASE (or the individual endpoint URLs) at `python -m codestrym_blog.stub_server` to run without the real APIs
+GOOGLE_API_BASE = os.environ.get("GOOGLE_API_BASE", "https://generativelanguage.googleapis.com").rstrip("/")
+GEMINI_MODEL = "gemini-2.0-flash"
+IMAGEN_MODEL = "imagen-3.0-generate-002"
+GEMINI_API_URL = os.environ.get("GEMINI_API_URL", f"{GOOGLE_API_BASE}/v1beta/models/{GEMINI_MODEL}:generateContent")
+IMAGEN_API_URL = os.environ.get("IMAGEN_API_URL", f"{GOOGLE_API_BASE}/v1beta/models/{IMAGEN_MODEL}:predict")
+# Used with --stream; alt=sse makes the API send each partial response as a server-sent event
+GEMINI_STREAM_API_URL = os.environ.get("GEMINI_STREAM_API_URL", f"{GOOGLE_API_BASE}/v1beta/models/{GEMINI_MODEL}:streamGenerateContent?alt=sse")
+
+# --- API Quotas and Retries ---
+# Requests per minute allowed by each model's quota; override to match your project's tier
+GEMINI_REQUESTS_PER_MINUTE = float(os.environ.get("GEMINI_REQUESTS_PER_MINUTE", "2000"))
+IMAGEN_REQUESTS_PER_MINUTE = float(os.environ.get("IMAGEN_REQUESTS_PER_MINUTE", "20"))
+API_MAX_RETRIES = int(os.environ.get("API_MAX_RETRIES", "5"))
+
+# --- Batch Mode (--batch) ---
+BATCH_DIR = ".cache/batches" # Batch input files written for submission
+BATCH_POLL_SECONDS = float(os.environ.get("BATCH_POLL_SECONDS", "30"))
+# How long one run waits for a batch; a batch still running after that is picked up again by the next run
+BATCH_TIMEOUT_HOURS = float(os.environ.get("BATCH_TIMEOUT_HOURS", "1"))
+BATCH_META_KEY = "gemini-batch" # State store key holding the name of a submitted, uncollected batch
+
+# --- File Paths ---
+PROCESSED_POSTS_FILE = "processed_posts.txt" # Legacy tracking file, imported into the state store on first run
+STATE_DB_FILE = "blog_state.sqlite3" # Per-row pipeline state (stage reached, outputs, timings)
+STATE_COMMIT_EVERY = 20 # State updates per SQLite commit
+CSV_FILE_NAME = "blog.csv" # Specifically targets your 'blog.csv' file
+POST_QUEUE_FILE = "post_queue.jsonl" # Append-only JSONL queue of post requests, read from where the last run stopped
+DROP_FOLDER = "incoming" # .csv/.jsonl batches dropped here are moved to incoming/processed/ once published
+# Input sources as comma-separated type:path specs; missing queue files and folders are skipped
+POST_SOURCES = os.environ.get("POST_SOURCES", f"csv:{CSV_FILE_NAME},jsonl:{POST_QUEUE_FILE},dir:{DROP_FOLDER}")
+CSV_CHUNK_ROWS = max(1, int(os.environ.get("CSV_CHUNK_ROWS", str(sources.DEFAULT_CHUNK_ROWS)))) # Rows read, hashed and looked up per batch
+# What to do with a new request that is a near-duplicate of an earlier one (see codestrym_blog.near_duplicates):
+# "link" records it against the existing post without generating it, "flag" only warns, "off" skips the check
+NEAR_DUPLICATES = os.environ.get("NEAR_DUPLICATES", "link").strip().lower()
+BLOG_INDEX_FILE = "blog.html" # First page of the blog index
+BLOG_PAGES_DIR = "blog" # Later index pages are written here as page-2.html, page-3.html, ...
+POST_MANIFEST_FILE = "post_manifest.json" # Structured record of every published post, used to render blog.html
+POSTS_FEED_FILE = "posts.json" # Compact listing of all posts for client-side code to load lazily
+BLOG_PAGE_SIZE = max(1, int(os.environ.get("BLOG_PAGE_SIZE", "12"))) # Post cards per index page
+SEARCH_PAGE_FILE = "search.html" # Client-side search over the index below
+SEARCH_DIR = "search" # Static search index: metadata, term shards and result chunks (see codestrym_blog.search_index)
+SEARCH_MAX_RESULTS = 20 # Results shown per query
+RELATED_POSTS = max(0, int(os.environ.get("RELATED_POSTS", "3"))) # Related posts linked from each post page; 0 turns them off
+RELATED_CACHE_FILE = os.environ.get("RELATED_CACHE_FILE", ".cache/related_posts.npz") # Term vectors of every post (see codestrym_blog.related_posts)
+
+# --- Templates ---
+# Compiled templates are cached here between runs; set to an empty string to disable
+TEMPLATE_CACHE_DIR = os.environ.get("TEMPLATE_CACHE_DIR", ".cache/templates")
+STYLESHEET_DIR = "css" # The site stylesheet, built from the classes the templates use: css/site.<digest>.css
+
+# --- Markdown ---
+# Rendered post bodies are cached here by a hash of their Markdown; set to an empty string to disable.
+# Entries can't go stale, so they don't expire; the least recently used go once the cache passes MARKDOWN_CACHE_MAX_MB.
+MARKDOWN_CACHE_DIR = os.environ.get("MARKDOWN_CACHE_DIR", ".cache/markdown")
+MARKDOWN_CACHE_MAX_MB = int(os.environ.get("MARKDOWN_CACHE_MAX_MB", "64"))
+
+# --- Image Processing ---
+IMAGES_DIR = "images" # Content-addressed: images/<digest>.png or images/<digest>-<width>.<format>
+# Widths (in pixels) of the responsive variants generated for each image; requires Pillow
+IMAGE_WIDTHS = tuple(int(w) for w in os.environ.get("IMAGE_WIDTHS", "480,960,1440").split(",") if w.strip())
+
+# --- API Response Cache ---
+# Set API_CACHE_DIR to an empty string to disable caching
+API_CACHE_DIR = os.environ.get("API_CACHE_DIR", ".cache/api")
+API_CACHE_MAX_MB = int(os.environ.get("API_CACHE_MAX_MB", "512"))
+API_CACHE_MAX_AGE_DAYS = float(os.environ.get("API_CACHE_MAX_AGE_DAYS", "30"))
+
+# --- Output ---
+# Every file a run writes, moves or deletes, for the commit step to stage; set to an empty string to disable
+DEPLOY_MANIFEST_FILE = os.environ.get("DEPLOY_MANIFEST_FILE", ".cache/deploy_manifest.json")
+
+# --- Instrumentation ---
+# Machine-readable timings, API and cache statistics for each run; set to an empty string to disable
+RUN_REPORT_FILE = os.environ.get("RUN_REPORT_FILE", ".cache/run_report.json")
+
+# --- Concurrency ---
+# Posts generated at once. Each post's Gemini and Imagen calls run side by side, so up to twice this many
+# requests are in flight. Set to 1 to generate posts one at a time.
+BLOG_CONCURRENCY = max(1, int(os.environ.get("BLOG_CONCURRENCY", "4")))
+
+# --- Helper Functions ---
+run_metrics = Metrics() # Stage timers, API latencies and counters for this pass, reset by run_once() and reported after it
+run_changes = output_stage.ChangeSet() # Files written or deleted by this run, saved as the deploy manifest
+
+
+FILENAME_UNSAFE_PATTERN = re.compile(r'[^a-z0-9\s-]') # Anything but letters, digits, spaces and hyphens
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def sanitize_filename(text):
+    """
+    Converts a given text string into a URL-friendly and filename-safe format.
+    Removes special characters, replaces spaces with hyphens, and limits length.
+    """
+    text = text.lower()
+    # Remove non-alphanumeric characters except spaces and hyphens
+    text = FILENAME_UNSAFE_PATTERN.sub('', text)
+    # Replace one or more spaces with a single hyphen
+    text = WHITESPACE_PATTERN.sub('-', text)
+    # Remove leading/trailing hyphens
+    text = text.strip('-')
+    # Limit length to avoid excessively long filenames, adjust as needed
+    return text[:60]
+
+def remove_emojis(text):
+    """Removes emojis and invisible characters from a string in one precompiled pass."""
+    return markup.clean_text(text)
+
+def get_row_hash(row):
+    """
+    Generates a unique hash for a CSV row based on key content (excluding 'Time').
+    This helps in identifying if a row has already been processed.
+    """
+    # Using 'Platform', 'Text', and 'Hyperlink' for uniqueness since 'Time' is removed
+    return sources.row_hash(row)
+
+def open_state_store():
+    """Opens the per-row state store, importing the legacy processed_posts.txt the first time."""
+    return StateStore(STATE_DB_FILE, commit_every=STATE_COMMIT_EVERY, legacy_processed_file=PROCESSED_POSTS_FILE)
+
+_api_client = None
+_api_client_lock = threading.Lock()
+
+def get_api_client():
+    """
+    Returns the shared API client, creating it on first use.
+    One pooled session is reused by every worker thread so connections stay alive between posts.
+    """
+    global _api_client
+    with _api_client_lock:
+        if _api_client is None:
+            from codestrym_blog.api_client import ApiClient, Endpoint
+            _api_client = ApiClient(
+                GOOGLE_API_KEY,
+                [
+                    Endpoint("Gemini", GEMINI_API_URL, GEMINI_REQUESTS_PER_MINUTE, read_timeout=120),
+                    Endpoint("Imagen", IMAGEN_API_URL, IMAGEN_REQUESTS_PER_MINUTE, read_timeout=180),
+                ],
+                pool_size=2 * BLOG_CONCURRENCY, # A text and an image call per post in flight
+                max_retries=API_MAX_RETRIES,
+                metrics=run_metrics,
+            )
+        return _api_client
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Returns the shared API response cache, or None if caching is disabled."""
+    global _response_cache
+    if not API_CACHE_DIR:
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                API_CACHE_DIR,
+                max_bytes=API_CACHE_MAX_MB * 1024 * 1024,
+                max_age_seconds=API_CACHE_MAX_AGE_DAYS * 24 * 3600,
+            )
+        return _response_cache
+
+_markdown_cache = None
+_markdown_cache_lock = threading.Lock()
+
+def get_markdown_cache():
+    """Returns this process's cache of rendered Markdown, or None if caching is disabled."""
+    global _markdown_cache
+    if not MARKDOWN_CACHE_DIR:
+        return None
+    with _markdown_cache_lock:
+        if _markdown_cache is None:
+            _markdown_cache = ResponseCache(MARKDOWN_CACHE_DIR, max_bytes=MARKDOWN_CACHE_MAX_MB * 1024 * 1024, max_age_seconds=None)
+        return _markdown_cache
+
+def cached_api_call(model, payload, call):
+    """
+    Returns the cached result for (model, payload) if there is one, otherwise runs `call()`
+    and caches a successful (non-None) result.
+    """
+    cache = get_response_cache()
+    if cache is None:
+        return call()
+    key = cache_key(model, payload)
+    result = cache.get(key)
+    if result is None:
+        result = call()
+        if result is not None:
+            cache.put(key, result, model=model)
+    return result
+
+def build_gemini_payload(prompt_text):
+    """Builds the generateContent request body for a prompt (used for both interactive and batch calls)."""
+    return {
+        "contents": [{"role": "user", "parts": [{"text": prompt_text}]}],
+        "generationConfig": {
+            "temperature": 0.7,
+            "topP": 0.95,
+            "topK": 40,
+            "maxOutputTokens": 1500, # Increased max output tokens for longer articles
+        }
+    }
+
+def count_gemini_tokens(result):
+    """Adds a response's token usage to the run metrics."""
+    usage = (result or {}).get("usageMetadata") or {}
+    run_metrics.count("gemini.prompt_tokens", usage.get("promptTokenCount", 0))
+    run_metrics.count("gemini.output_tokens", usage.get("candidatesTokenCount", 0))
+
+def extract_gemini_text(result):
+    """Returns the generated text from a generateContent response, or None if it has none."""
+    count_gemini_tokens(result)
+    if result and result.get("candidates") and result["candidates"][0].get("content") and result["candidates"][0]["content"].get("parts"):
+        return result["candidates"][0]["content"]["parts"][0]["text"]
+    print(f"Gemini API response missing content: {result}")
+    return None
+
+def call_gemini_api(prompt_text):
+    """
+    Calls the Google Gemini API (gemini-2.0-flash) to generate text content.
+    Returns the generated text or None if an error occurs.
+    """
+    import requests
+
+    payload = build_gemini_payload(prompt_text)
+    def request():
+        try:
+            return extract_gemini_text(get_api_client().post_json("Gemini", payload))
+        except requests.exceptions.RequestException as e:
+            print(f"Error calling Gemini API: {e}")
+            return None
+
+    return cached_api_call(GEMINI_MODEL, payload, request)
+
+def stream_gemini_api(prompt_text, job):
+    """
+    Streaming variant of call_gemini_api, built on streamGenerateContent. The text is cleaned as it arrives
+    and the summary is parsed as soon as the first paragraph is complete. When the stream ends, the body
+    is converted to HTML in this worker thread, and (summary, Markdown body, HTML) is left in job["streamed"]
+    so the main loop doesn't repeat that work. Returns the generated text or None if an error occurs.
+    A cached response is returned without streaming.
+    """
+    import requests
+
+    payload = build_gemini_payload(prompt_text)
+    def request():
+        stream = markup.TextStream()
+        start = time.perf_counter()
+        last_event = None
+        try:
+            for event in get_api_client().stream_events("Gemini", GEMINI_STREAM_API_URL, payload):
+                last_event = event
+                for candidate in event.get("candidates") or []:
+                    for part in (candidate.get("content") or {}).get("parts") or []:
+                        if part.get("text") and stream.feed(part["text"]):
+                            run_metrics.observe("gemini.time_to_summary", time.perf_counter() - start)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Error streaming from Gemini API: {e}")
+            return None
+        count_gemini_tokens(last_event) # Usage is cumulative, so the last event has the totals
+        text = stream.text()
+        if not text:
+            print(f"Gemini API stream ended without content: {last_event}")
+            return None
+        if stream.summary is not None:
+            content = stream.content()
+            with run_metrics.timer("stage.markdown"):
+                job["streamed"] = (stream.summary, content, markup.to_html(content, get_markdown_cache()))
+        return text
+
+    return cached_api_call(GEMINI_MODEL, payload, request)
+
+def call_imagen_api(prompt_text):
+    """
+    Calls the Google Imagen API (imagen-3.0-generate-002) to generate an image.
+    Returns the base64 encoded image data or None if an error occurs.
+    """
+    import requests
+
+    payload = {
+        "instances": {"prompt": prompt_text},
+        "parameters": {"sampleCount": 1}
+    }
+    def request():
+        try:
+            result = get_api_client().post_json("Imagen", payload)
+            if result.get("predictions") and result["predictions"][0].get("bytesBase64Encoded"):
+                return result["predictions"][0]["bytesBase64Encoded"]
+            else:
+                print(f"Imagen API response missing image data: {result}")
+                return None
+        except requests.exceptions.RequestException as e:
+            print(f"Error calling Imagen API: {e}")
+            return None
+
+    return cached_api_call(IMAGEN_MODEL, payload, request)
+
+def generate_text_batch(jobs, state):
+    """
+    Fills in job["text"] for every job still missing it with one Gemini batch job instead of one call per row.
+    Cached responses are used first. The submitted batch's name is kept in the state store until its results
+    are collected, so an interrupted run polls the same batch again rather than paying for a new one.
+    Returns the jobs that can go ahead this run: those whose batch is still running are held back for the
+    next run, and those the batch failed on fall back to interactive calls.
+    """
+    import requests
+
+    cache = get_response_cache()
+    missing = []
+    for job in jobs:
+        if job["text"] is not None:
+            continue
+        payload = build_gemini_payload(job["text_prompt"])
+        cached = cache.get(cache_key(GEMINI_MODEL, payload)) if cache is not None else None
+        if cached is not None:
+            job["text"] = cached
+            state.advance(job["row_hash"], "text", data={"text": cached})
+        else:
+            missing.append((job, payload))
+
+    batch_name = state.get_meta(BATCH_META_KEY)
+    if not missing and not batch_name:
+        return jobs
+
+    client = GeminiBatchClient(get_api_client(), GOOGLE_API_BASE, GEMINI_MODEL)
+    try:
+        if batch_name:
+            print(f"Collecting results of previously submitted batch {batch_name}...")
+        else:
+            batch_path = os.path.join(BATCH_DIR, f"gemini-{datetime.now().strftime('%Y%m%d%H%M%S')}.jsonl")
+            count = write_batch_file(batch_path, ((job["row_hash"], payload) for job, payload in missing))
+            batch_name = client.submit(batch_path, f"codestrym-blog-{len(missing)}-posts")
+            state.set_meta(BATCH_META_KEY, batch_name)
+            state.commit()
+            print(f"Submitted {count} Gemini prompt(s) as batch {batch_name} ({batch_path}).")
+
+        start = time.perf_counter()
+        results = client.results(client.wait(batch_name, BATCH_POLL_SECONDS, BATCH_TIMEOUT_HOURS * 3600))
+        elapsed = round(time.perf_counter() - start, 3)
+        run_metrics.observe("stage.batch_wait", elapsed)
+    except BatchPending as e:
+        held_back = {job["row_hash"] for job, _ in missing}
+        print(f"Gemini {e}; holding back {len(held_back)} post(s) until a later run collects it.")
+        return [job for job in jobs if job["row_hash"] not in held_back]
+    except (BatchError, requests.exceptions.RequestException, ValueError, KeyError) as e:
+        print(f"Gemini batch failed ({e}); generating the remaining text with interactive calls.")
+        if isinstance(e, BatchError): # The batch itself is dead; a network error leaves it to be collected later
+            state.delete_meta(BATCH_META_KEY)
+        return jobs
+
+    state.delete_meta(BATCH_META_KEY)
+    collected = 0
+    jobs_by_hash = {job["row_hash"]: job for job in jobs}
+    for row_hash, response in results.items():
+        job = jobs_by_hash.get(row_hash)
+        text = extract_gemini_text(response) if response is not None else None
+        if job is None or job["text"] is not None or text is None:
+            continue
+        job["text"] = text
+        if cache is not None:
+            cache.put(cache_key(GEMINI_MODEL, build_gemini_payload(job["text_prompt"])), text, model=GEMINI_MODEL)
+        state.advance(row_hash, "text", data={"text": text}, timings={"text": elapsed})
+        collected += 1
+    state.commit()
+    print(f"Collected text for {collected} post(s) from batch {batch_name}.")
+    return jobs
+
+def build_text_prompt(keyword_for_ai, post_text):
+    """Builds the Gemini prompt for a blog post about the given keyword."""
+    # Refined prompt to avoid "Summary:" prefix and encourage Markdown for structure
+    return f"Write a comprehensive and engaging blog post about '{keyword_for_ai}' based on the idea: '{post_text}'. The post should include an introduction, 2-3 main sections with clear Markdown headings (e.g., '## Section Title'), and a conclusion. Ensure the content flows naturally with paragraphs. The tone should be informative and slightly enthusiastic. Provide a concise summary (1-2 sentences) at the very beginning of the response, *without* explicitly labeling it 'Summary:'. Do not use emojis or excessive special characters like asterisks or hashtags within the main body of the text, only for Markdown formatting."
+
+def build_image_prompt(keyword_for_ai):
+    """Builds the Imagen prompt for the given keyword."""
+    return f"A vibrant and engaging image representing '{keyword_for_ai}'. Focus on concepts related to {keyword_for_ai}."
+
+def split_summary(generated_text_with_summary):
+    """
+    Splits the generated text into (summary, full_content) at the first blank line
+    and removes emojis from both parts.
+    """
+    summary_end_index = generated_text_with_summary.find('\n\n')
+    if summary_end_index != -1:
+        summary = generated_text_with_summary[:summary_end_index].strip()
+        full_content = generated_text_with_summary[summary_end_index:].strip()
+    else:
+        summary = generated_text_with_summary[:150].strip() + "..."
+        full_content = generated_text_with_summary.strip()
+
+    # Post-process: Remove emojis from full content
+    return remove_emojis(summary), remove_emojis(full_content)
+
+def unique_file_stem(file_stem):
+    """
+    Returns a file stem not yet used under posts/.
+    Rows with the same keyword can now finish within the same second, so a counter is appended on collision.
+    """
+    candidate = file_stem
+    counter = 2
+    while os.path.exists(f"posts/{candidate}.html"):
+        candidate = f"{file_stem}-{counter}"
+        counter += 1
+    return candidate
+
+def timed_call(job, stage, call, prompt):
+    """Runs an API call (cache lookups included), recording its wall time in job["timings"][stage] and the run metrics."""
+    start = time.perf_counter()
+    try:
+        return call(prompt)
+    finally:
+        elapsed = time.perf_counter() - start
+        job["timings"][stage] = round(elapsed, 3)
+        run_metrics.observe(f"stage.{stage}", elapsed)
+
+def generate_concurrently(jobs, max_workers, stream=False):
+    """
+    Runs the Gemini and Imagen calls for every job on a bounded thread pool.
+    Both calls for a row are submitted together so they run in parallel, and up to
+    `max_workers` rows are kept in flight (so the pool has 2 * `max_workers` threads). Yields (job, generated_text, image_base64)
+    in the same order as `jobs`, so callers can write output deterministically.
+    Calls for stages a job already completed in an earlier run are skipped: the stored
+    text is yielded instead, and the image is yielded as None.
+    With `stream`, the text is streamed (see stream_gemini_api).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def result(future, default):
+        return default if future is None else future.result()
+
+    with ThreadPoolExecutor(max_workers=2 * max_workers) as executor:
+        in_flight = deque()
+        for job in jobs:
+            job["submitted"] = time.perf_counter()
+            in_flight.append((
+                job,
+                None if job["text"] is not None else executor.submit(
+                    timed_call, job, "text", functools.partial(stream_gemini_api, job=job) if stream else call_gemini_api, job["text_prompt"]
+                ),
+                None if job["saved_image"] is not None else executor.submit(timed_call, job, "image", call_imagen_api, job["image_prompt"]),
+            ))
+            # Only keep a window of rows in flight so finished images don't pile up in memory
+            if len(in_flight) >= max_workers:
+                job, text_future, image_future = in_flight.popleft()
+                yield job, result(text_future, job["text"]), result(image_future, None)
+        while in_flight:
+            job, text_future, image_future = in_flight.popleft()
+            yield job, result(text_future, job["text"]), result(image_future, None)
+
+def get_base_public_path():
+    """Returns the public URL of the site (GitHub Pages project site)."""
+    # Corrected base_public_path for GitHub Pages project sites
+    return f"https://{GITHUB_REPO_OWNER}.github.io/{GITHUB_REPO_NAME}"
+
+def render_template(template_name, **context):
+    """
+    Renders one of the codestrym_blog templates with the context every page shares.
+    Templates are compiled once and cached; all values are HTML-escaped unless marked safe.
+    """
+    from codestrym_blog import rendering
+
+    with run_metrics.timer("stage.render"):
+        return rendering.render(
+            template_name,
+            bytecode_cache_dir=TEMPLATE_CACHE_DIR,
+            base_url=get_base_public_path(),
+            stylesheet=f"{STYLESHEET_DIR}/{stylesheet.build()[0]}",
+            year=datetime.now().year,
+            **context,
+        )
+
+def generate_blog_post_html(title, content, image_url, affiliate_link, author="Codestrym Staff", date=None, image=None, html_content=None, related=None):
+    """
+    Generates the complete HTML content for a single blog post page,
+    including a prominent affiliate link button.
+    `content` is Markdown; pass `html_content` instead for posts whose Markdown source wasn't kept.
+    `related` lists the {"title", "url"} of the posts linked under it.
+    """
+    if date is None:
+        date = datetime.now().strftime("%B %d, %Y")
+
+    base_public_path = get_base_public_path()
+
+    # Convert Markdown content to HTML
+    if html_content is None:
+        with run_metrics.timer("stage.markdown"):
+            html_content = markup.to_html(content, get_markdown_cache())
+
+    return render_template(
+        "post.html",
+        title=title,
+        html_content=html_content,
+        image_url=image_url,
+        image=image,
+        affiliate_link=affiliate_link,
+        author=author,
+        date=date,
+        related=related or [],
+        nav_links=[
+            {"href": f"{base_public_path}/index.html", "label": "Home"},
+            {"href": f"{base_public_path}/blog.html", "label": "Blog", "active": True},
+            {"href": f"{base_public_path}/{SEARCH_PAGE_FILE}", "label": "Search"},
+            {"href": "#", "label": "About"},
+            {"href": "#", "label": "Contact"},
+        ],
+    )
+
+def generate_post_page_html(post):
+    """Generates a post page from its manifest record."""
+    return generate_blog_post_html(
+        title=post["title"],
+        content=post.get("markdown", ""),
+        image_url=post["image_url"],
+        affiliate_link=post["affiliate_link"],
+        author=post["author"],
+        date=post["date"],
+        image=post.get("image"),
+        html_content=post.get("html_content"),
+        related=post.get("related"),
+    )
+
+def generate_blog_index_html(posts, page_number, total_pages):
+    """
+    Generates one page of the blog index. Page 1 is blog.html at the site root;
+    later pages live under BLOG_PAGES_DIR, so their relative links climb back up to the root.
+    """
+    root = "" if page_number == 1 else "../" * (BLOG_PAGES_DIR.strip("/").count("/") + 1)
+    return render_template(
+        "blog_index.html",
+        posts=posts,
+        page_number=page_number,
+        total_pages=total_pages,
+        root=root,
+        index_file=BLOG_INDEX_FILE,
+        pages_dir=BLOG_PAGES_DIR,
+        nav_links=[
+            {"href": f"{root}index.html", "label": "Back to main page"},
+            {"href": f"{root}{BLOG_INDEX_FILE}", "label": "Blog", "active": True},
+            {"href": f"{root}{SEARCH_PAGE_FILE}", "label": "Search"},
+        ],
+    )
+
+def generate_search_page_html():
+    """Generates the search page, which queries the static index under SEARCH_DIR in the browser."""
+    return render_template(
+        "search.html",
+        search_dir=SEARCH_DIR,
+        stopwords=sorted(search_index.STOPWORDS),
+        min_term_chars=search_index.MIN_TERM_CHARS,
+        max_term_chars=search_index.MAX_TERM_CHARS,
+        max_results=SEARCH_MAX_RESULTS,
+        nav_links=[
+            {"href": "index.html", "label": "Back to main page"},
+            {"href": BLOG_INDEX_FILE, "label": "Blog"},
+            {"href": SEARCH_PAGE_FILE, "label": "Search", "active": True},
+        ],
+    )
+
+def update_blog_index(new_posts_info, assets=None, keep_assets=(), rebuild_search=False):
+    """
+    Adds the new posts to the post manifest and re-renders the paginated blog index
+    (blog.html, blog/page-2.html, ...) plus the posts.json feed from the manifest.
+    The new posts are added to the search index; with `rebuild_search`, it is rebuilt from every post.
+    Only pages whose contents changed are written (plus compressed copies that are missing or stale),
+    so nothing is touched when there is nothing new.
+    With an AssetStore, the image reference counts are updated and image files no post refers to
+    (other than the digests in `keep_assets`) are deleted.
+    Every file written or deleted is recorded in run_changes, for the commit step to push.
+    """
+    posts = load_manifest(POST_MANIFEST_FILE, BLOG_INDEX_FILE)
+    posts.extend(new_posts_info)
+    manifest_changed = bool(new_posts_info)
+    if assets is not None:
+        adopted = assets.adopt(posts, get_base_public_path())
+        if adopted:
+            print(f"Added the images of {adopted} post(s) to the asset table.")
+        assets.update_refs(posts)
+        removed = assets.collect_garbage(keep_assets)
+        if removed:
+            print(f"Removed {len(removed)} unreferenced image file(s): {', '.join(removed)}")
+            run_changes.deleted(removed)
+        manifest_changed = manifest_changed or bool(adopted or removed)
+    if manifest_changed:
+        save_manifest(POST_MANIFEST_FILE, posts, None if assets is None else assets.assets)
+        run_changes.written([POST_MANIFEST_FILE])
+
+    page_chunks = [posts[i:i + BLOG_PAGE_SIZE] for i in range(0, len(posts), BLOG_PAGE_SIZE)] or [[]]
+    pages = [
+        output_stage.minify_html(generate_blog_index_html(chunk, page_number, len(page_chunks)))
+        for page_number, chunk in enumerate(page_chunks, start=1)
+    ]
+    changed_pages = build_blog_pages(BLOG_INDEX_FILE, BLOG_PAGES_DIR, pages)
+
+    if save_feed(POSTS_FEED_FILE, posts, BLOG_PAGE_SIZE):
+        changed_pages.append(POSTS_FEED_FILE)
+    if write_if_changed(SEARCH_PAGE_FILE, output_stage.minify_html(generate_search_page_html())):
+        changed_pages.append(SEARCH_PAGE_FILE)
+    written_stylesheet = stylesheet.write(STYLESHEET_DIR)
+    if written_stylesheet:
+        changed_pages.append(written_stylesheet)
+
+    with run_metrics.timer("stage.search_index"):
+        search_written, search_removed = search_index.SearchIndex(SEARCH_DIR).update(posts, rebuild_search)
+    if search_written or search_removed:
+        print(f"Search index updated: {len(search_written)} file(s) written, {len(search_removed)} removed.")
+
+    # Unchanged files still get the compressed copies they are missing, e.g. once brotli is installed
+    published = [page_path(page_number, BLOG_INDEX_FILE, BLOG_PAGES_DIR) for page_number in range(1, len(pages) + 1)]
+    published += [POSTS_FEED_FILE, SEARCH_PAGE_FILE, f"{STYLESHEET_DIR}/{stylesheet.build()[0]}"]
+    for path in published:
+        if path not in changed_pages:
+            run_changes.written(output_stage.refresh_compressed(path))
+
+    # Published files get compressed copies; files that were removed (pages beyond the new page count,
+    # search shards a rebuild no longer needs) lose theirs too
+    for path in changed_pages + search_written + search_removed:
+        if os.path.exists(path):
+            run_changes.written([path] + output_stage.write_compressed(path))
+        else:
+            run_changes.deleted([path] + output_stage.delete(path))
+
+    if changed_pages:
+        print(f"Successfully updated {len(changed_pages)} blog index file(s) locally: {', '.join(changed_pages)}")
+    else:
+        print(f"{BLOG_INDEX_FILE} and its pages are already up to date.")
+
+def open_related_posts(posts):
+    """
+    Returns the term vectors of `posts` (the manifest, in order) for finding related posts,
+    or None if related links are turned off or NumPy isn't installed.
+    """
+    from codestrym_blog import related_posts
+
+    if not RELATED_POSTS:
+        return None
+    if not related_posts.is_available():
+        print("NumPy is not installed; publishing posts without related links.")
+        return None
+    with run_metrics.timer("stage.related"):
+        return related_posts.RelatedPosts(RELATED_CACHE_FILE, posts)
+
+def rebuild_post(post):
+    """Re-renders one post page from its manifest record. Returns the paths written (none if it was unchanged)."""
+    return output_stage.write_page(post["post_path"], generate_post_page_html(post))
+
+def rebuild_site(workers=None):
+    """
+    Re-renders every post page and index page from the post manifest, without any API calls.
+    Post pages are rendered in parallel across CPU cores, each worker process reusing one Markdown
+    converter and the shared cache of rendered Markdown; only files whose contents changed are written.
+    Every post's related links are recomputed first, so earlier posts also link to the ones published after them.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    posts = load_manifest(POST_MANIFEST_FILE, BLOG_INDEX_FILE)
+    imported = import_post_sources(posts, "posts")
+    if imported:
+        print(f"Recovered the source of {imported} older post(s) from their published HTML.")
+
+    relinked = 0
+    related = open_related_posts(posts)
+    if related is not None:
+        with run_metrics.timer("stage.related"):
+            for post, links in zip(posts, related.nearest_all(RELATED_POSTS)):
+                if post.get("related") != links:
+                    post["related"] = links
+                    relinked += 1
+        related.save()
+        if relinked:
+            print(f"Updated the related posts of {relinked} post(s).")
+
+    if imported or relinked:
+        save_manifest(POST_MANIFEST_FILE, posts)
+        run_changes.written([POST_MANIFEST_FILE])
+
+    rebuildable = [post for post in posts if post.get("post_path") and (post.get("markdown") is not None or post.get("html_content") is not None)]
+    for post in posts:
+        if post not in rebuildable:
+            print(f"Warning: no stored source for post '{post['title']}'; leaving its page as is.")
+
+    workers = workers or os.cpu_count() or 1
+    print(f"Rebuilding {len(rebuildable)} post page(s) with {workers} worker process(es)...")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(rebuildable) // (workers * 4))
+        results = list(executor.map(rebuild_post, rebuildable, chunksize=chunksize))
+    changed_posts = [written for written in results if written]
+    for written in changed_posts:
+        run_changes.written(written)
+    print(f"{len(changed_posts)} post page(s) changed, {len(results) - len(changed_posts)} already up to date.")
+    if get_markdown_cache() is not None:
+        get_markdown_cache().evict()
+
+    update_blog_index([], rebuild_search=True)
+    # Every page now links to the current stylesheet, so earlier builds of it can go
+    removed = stylesheet.remove_stale(STYLESHEET_DIR)
+    if removed:
+        print(f"Removed {len(removed)} outdated stylesheet(s): {', '.join(removed)}")
+        for path in removed:
+            run_changes.deleted([path] + output_stage.delete(path))
+    save_deploy_manifest()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate Codestrym blog posts from blog.csv.")
+    parser.add_argument("--rebuild", action="store_true", help="Re-render every post and index page from the post manifest without calling the APIs.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for --rebuild (default: number of CPU cores).")
+    parser.add_argument("--source", action="append", metavar="TYPE:PATH", help="Input source (csv:, jsonl: or dir:); repeat for several. Overrides POST_SOURCES.")
+    parser.add_argument("--batch", action="store_true", help="Generate the text of all pending posts as one Gemini batch job instead of interactive calls.")
+    parser.add_argument("--stream", action="store_true", help="Stream Gemini responses, preparing each post's summary and HTML as its text arrives.")
+    parser.add_argument("--watch", type=float, default=None, metavar="SECONDS", help="Keep running, checking the sources for new posts every SECONDS.")
+    parser.add_argument("--check", action="store_true", help="Only check the sources: exit with status 1 if there is anything to generate or publish, 0 if not.")
+    return parser.parse_args(argv)
+
+def check_near_duplicate(duplicates, request, state):
+    """
+    Looks a new request up in the near-duplicate index before anything is generated for it.
+    Returns "pending" if it should be generated, "linked" if it was recorded as a duplicate of a published post
+    (and is done), or "deferred" if it resembles a request from this run and waits until that one is published.
+    A match that was itself linked as a duplicate stands for the post it points at, so `duplicate_of` is always
+    a row that was actually published.
+    """
+    found, match = duplicates.find(request)
+    where = f"{request.source.name} row {request.index}"
+    if match is not None and NEAR_DUPLICATES == "flag":
+        print(f"Warning: {where} is a near-duplicate (similarity {match.similarity:.2f}) of an earlier request; generating it anyway.")
+        match = None
+    if match is None:
+        if found is not None:
+            duplicates.add(request.row_hash, found)
+        return "pending"
+
+    run_metrics.count("requests.near_duplicates")
+    if not match.published:
+        print(f"Deferring {where}: it is a near-duplicate (similarity {match.similarity:.2f}) of a request earlier in this run; it is checked again once that one is published.")
+        return "deferred"
+    original_hash = match.row_hash
+    original = state.get(original_hash)["data"]
+    while original.get("duplicate_of"):
+        # The match was itself linked to an earlier post rather than published; point at the post that was
+        original_hash = original["duplicate_of"]
+        original = state.get(original_hash)["data"]
+    post_url = original.get("post", {}).get("post_url") or original.get("post_url")
+    state.advance(request.row_hash, "indexed", data={"duplicate_of": original_hash, "post_url": post_url, "similarity": round(match.similarity, 3)})
+    duplicates.add(request.row_hash, found, published=True)
+    print(f"Skipping {where}: near-duplicate (similarity {match.similarity:.2f}{', same product link' if match.same_link else ''}) of {post_url or 'an earlier post'}; linked to it instead of generating a new post.")
+    return "linked"
+
+def scan_sources(post_sources, state):
+    """
+    Reads every source in chunks and checks each chunk against the state store in one lookup.
+    Returns (pending, resumed, deferred): requests that still need generating, paired with their stored state
+    (or None), (request, post) pairs whose post page exists but was never indexed, and new requests held back
+    as near-duplicates of one being generated in this run.
+    A request seen earlier in the same run, e.g. in both blog.csv and the queue, is only taken once; a new request
+    that is a near-duplicate of a published post is linked to it instead (see check_near_duplicate).
+    """
+    pending = []
+    resumed = []
+    deferred = []
+    seen = set()
+    duplicates = None if NEAR_DUPLICATES == "off" else NearDuplicateIndex(state)
+    for source in post_sources:
+        if not source.exists():
+            if source.required:
+                print(f"Error: input file '{source.name}' not found. Please ensure it's in the repository root.")
+            continue
+
+        scan_start = time.perf_counter()
+        scanned_rows = 0
+        skipped_rows = 0
+        try:
+            for chunk in source.iter_chunks(state, CSV_CHUNK_ROWS):
+                scanned_rows += len(chunk)
+                stages = state.get_stages(request.row_hash for request in chunk)
+                if duplicates is not None:
+                    # Posts published before the near-duplicate check existed are fingerprinted the first time they are read
+                    duplicates.add_published([request for request in chunk if stages.get(request.row_hash) == "indexed"])
+                for request in chunk:
+                    stage = stages.get(request.row_hash)
+                    if stage == "indexed" or request.row_hash in seen:
+                        skipped_rows += 1
+                        continue
+                    seen.add(request.row_hash)
+                    row_state = state.get(request.row_hash) if stage else None
+                    if duplicates is not None and stage:
+                        # Partly generated in an earlier run, so it is finished as it is; later requests are checked against it
+                        duplicates.remember(request)
+                    if reached(row_state, "html"):
+                        resumed.append((request, row_state["data"]["post"]))
+                        continue
+                    verdict = "pending" if duplicates is None or stage else check_near_duplicate(duplicates, request, state)
+                    if verdict == "pending":
+                        pending.append((request, row_state))
+                    elif verdict == "deferred":
+                        deferred.append(request)
+                    else:
+                        skipped_rows += 1
+        except (OSError, csv.Error, UnicodeDecodeError) as e:
+            print(f"Error reading {source.name}: {e}")
+            continue
+
+        scan_seconds = time.perf_counter() - scan_start
+        run_metrics.observe("stage.scan", scan_seconds)
+        run_metrics.count("requests.scanned", scanned_rows)
+        run_metrics.count("requests.already_processed", skipped_rows)
+        print(
+            f"Scanned {scanned_rows} request(s) from {source.name} in {scan_seconds:.3f}s "
+            f"({scanned_rows / scan_seconds if scan_seconds else 0:,.0f} rows/sec); {skipped_rows} already processed."
+        )
+    return pending, resumed, deferred
+
+def generate_posts(pending, resumed, state, batch=False, stream=False):
+    """
+    Generates a post for every pending request and publishes it, together with any resumed posts, to the index.
+    Each request is resumed from its first incomplete stage (text, image, html, indexed) in `state`,
+    so one that failed part-way in an earlier run doesn't pay for the completed API calls again.
+    With `batch`, the text of every pending post is generated as one Gemini batch job first; with `stream`,
+    the remaining texts are streamed and their summary and HTML prepared as they arrive.
+    Returns the row hashes that need no further work: published, or impossible to generate.
+    """
+    from codestrym_blog import image_pipeline, related_posts
+
+    new_posts_info = []
+    new_posts_hashes = [] # Kept in source order so the index is deterministic
+    done_hashes = set()
+    # Images already stored, keyed by content digest, so an identical image is reused instead of written again
+    assets = AssetStore(IMAGES_DIR, load_assets(POST_MANIFEST_FILE))
+    related = None
+
+    for request, post in resumed:
+        # The post page was written but never made it into the index
+        print(f"Resuming {request.source.name} row {request.index}: post already generated, adding it to the index.")
+        if not os.path.exists(post["post_path"]):
+            run_changes.written(output_stage.write_page(post["post_path"], generate_post_page_html(post)))
+        new_posts_info.append(post)
+        new_posts_hashes.append(request.row_hash)
+
+    posts_to_process_in_this_run = pending
+    if not posts_to_process_in_this_run and not new_posts_info:
+        print("No new posts found or all posts already processed.")
+        return done_hashes
+
+    print(f"Found {len(posts_to_process_in_this_run)} new post(s) to process.")
+
+    # Build the prompts up front so the API calls can be fanned out across rows
+    jobs = []
+    for request, row_state in posts_to_process_in_this_run:
+        index = f"{request.source.name}:{request.index}"
+        row_hash = request.row_hash
+        post_text = request.text
+        image_category = request.images.strip('/')
+        affiliate_link = request.hyperlink or '#' # Get the affiliate link
+
+        if not post_text:
+            print(f"Skipping row {index} due to missing 'Text' content.")
+            done_hashes.add(row_hash)
+            continue
+
+        keyword_for_ai = image_category if image_category else post_text.split('.')[0].strip()
+
+        # Reuse whatever an earlier, interrupted run already produced for this row
+        stored = row_state["data"] if row_state else {}
+        saved_image = stored.get("image")
+        if saved_image and not os.path.exists(saved_image["path"]):
+            saved_image = None
+        if stored.get("text") is not None or saved_image is not None:
+            print(f"Resuming row {index}: reusing stored {' and '.join(name for name, value in (('text', stored.get('text')), ('image', saved_image)) if value is not None)}.")
+
+        print(f"Queued new row {index}: Social Text='{post_text}', AI Keyword='{keyword_for_ai}'")
+        jobs.append({
+            "index": index,
+            "row_hash": row_hash,
+            "keyword": keyword_for_ai,
+            "affiliate_link": affiliate_link,
+            "text_prompt": build_text_prompt(keyword_for_ai, post_text),
+            "image_prompt": build_image_prompt(keyword_for_ai),
+            "text": stored.get("text"),
+            "saved_image": saved_image,
+            "timings": {},
+        })
+
+    if batch and jobs:
+        jobs = generate_text_batch(jobs, state)
+
+    # Every post published before this one (including earlier ones in this run) can be linked from it
+    if jobs:
+        related = open_related_posts(load_manifest(POST_MANIFEST_FILE, BLOG_INDEX_FILE) + new_posts_info)
+
+    print(f"Generating {len(jobs)} post(s), up to {BLOG_CONCURRENCY} at a time.")
+
+    # Results come back in CSV order, so the file writes, state updates and
+    # blog.html update below stay serialized and deterministic.
+    for job, generated_text_with_summary, generated_image_base64 in generate_concurrently(jobs, BLOG_CONCURRENCY, stream):
+        index = job["index"]
+        row_hash = job["row_hash"]
+        keyword_for_ai = job["keyword"]
+        affiliate_link = job["affiliate_link"]
+
+        print(f"\nProcessing new row {index}: AI Keyword='{keyword_for_ai}'")
+
+        # 1. Generated Blog Post Text, recorded as soon as it arrives so a later failure doesn't lose it
+        if generated_text_with_summary and job["text"] is None:
+            state.advance(row_hash, "text", data={"text": generated_text_with_summary}, timings={"text": job["timings"].get("text")})
+
+        # 2. Generated Image, saved (or reused from an earlier run) before the text is checked for the same reason
+        saved_image = job["saved_image"]
+        if saved_image is None:
+            if not generated_image_base64:
+                print(f"Failed to generate image for row {index}. Skipping.")
+                run_metrics.count("posts.failed")
+                continue
+
+            # 3. Prepare file names and paths. Images are stored under the digest of their content,
+            # so an image identical to one already published (e.g. a cached response) is kept only once.
+            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            sanitized_title = sanitize_filename(keyword_for_ai)
+            file_stem = unique_file_stem(f"{timestamp}-{sanitized_title}")
+            image_start = time.perf_counter()
+            try:
+                digest = base64_digest(generated_image_base64)
+            except ValueError as e:
+                print(f"Error decoding image for row {index}: {e}")
+                run_metrics.count("posts.failed")
+                continue
+
+            asset = assets.get(digest)
+            if asset is not None:
+                run_metrics.count("images.reused")
+                print(f"Image is identical to stored asset {digest}; reusing {asset['path']}.")
+            else:
+                image_filename_relative = assets.png_path(digest)
+                os.makedirs(os.path.dirname(image_filename_relative), exist_ok=True)
+
+                # 4. Save the generated image locally, decoding straight to disk and renaming into place
+                try:
+                    with run_metrics.timer("stage.image_decode"):
+                        image_size = write_base64_atomic(image_filename_relative, generated_image_base64)
+                    run_metrics.count("bytes.image_png", image_size)
+                    print(f"Image saved locally: {image_filename_relative} ({image_size} bytes)")
+                except Exception as e:
+                    print(f"Error saving image locally {image_filename_relative}: {e}")
+                    run_metrics.count("posts.failed")
+                    continue
+
+                # 4b. Resize and recompress into responsive WebP/AVIF variants, dropping the full-size PNG
+                image_variants = None
+                image_path = image_filename_relative
+                if image_pipeline.is_available():
+                    try:
+                        with run_metrics.timer("stage.image_variants"):
+                            image_variants = image_pipeline.process_image(image_filename_relative, IMAGES_DIR, digest, IMAGE_WIDTHS)
+                    except Exception as e:
+                        print(f"Error processing image {image_filename_relative}, keeping the original PNG: {e}")
+                    if image_variants:
+                        run_metrics.count("bytes.image_variants", sum(os.path.getsize(path) for variants in image_variants['sources'].values() for path, _ in variants))
+                        os.remove(image_filename_relative)
+                        image_path = image_variants['fallback']
+                        print(f"Image variants saved locally: {', '.join(path for variants in image_variants['sources'].values() for path, _ in variants)}")
+                else:
+                    print("Pillow is not installed; publishing the original PNG without responsive variants.")
+                asset = assets.add(digest, image_path, image_variants)
+                run_changes.written(asset["files"])
+
+            saved_image = {
+                "slug": file_stem,
+                "asset": digest,
+                "path": asset["path"],
+                "url": f"{get_base_public_path()}/{asset['path']}",
+                "variants": asset["image"],
+            }
+            state.advance(
+                row_hash, "image",
+                data={"image": saved_image},
+                paths={"image": saved_image["path"]},
+                timings={"image": job["timings"].get("image"), "image_write": round(time.perf_counter() - image_start, 3)},
+            )
+
+        if not generated_text_with_summary:
+            print(f"Failed to generate blog post text for row {index}. Skipping.")
+            run_metrics.count("posts.failed")
+            continue
+
+        if job.get("streamed"):
+            summary, full_content, html_content = job["streamed"]
+        else:
+            summary, full_content = split_summary(generated_text_with_summary)
+            html_content = None
+
+        file_stem = saved_image["slug"]
+        post_filename_relative = f"posts/{file_stem}.html"
+        os.makedirs(os.path.dirname(post_filename_relative), exist_ok=True)
+        post_public_url = f"{get_base_public_path()}/{post_filename_relative}"
+        title = keyword_for_ai.replace('-', ' ').title()
+
+        # 5. Find the related posts to link to, then create the new blog post HTML file content
+        related_links = []
+        if related is not None:
+            with run_metrics.timer("stage.related"):
+                vector = related_posts.vectorize({"title": title, "summary": summary, "markdown": full_content})
+                related_links = related.nearest(vector, RELATED_POSTS)
+        html_start = time.perf_counter()
+        blog_post_html_content = generate_blog_post_html(
+            title=title,
+            content=full_content, # This content will now be Markdown and converted to HTML
+            image_url=saved_image["url"],
+            affiliate_link=affiliate_link, # Pass the affiliate link to the full post HTML
+            author="Codestrym Staff", # Explicitly set author for full post
+            date=datetime.now().strftime("%B %d, %Y"),
+            image=saved_image["variants"],
+            html_content=html_content,
+            related=related_links,
+        )
+
+        # 6. Save the new blog post HTML file locally
+        try:
+            with run_metrics.timer("stage.html_write"):
+                run_changes.written(output_stage.write_page(post_filename_relative, blog_post_html_content))
+            run_metrics.count("bytes.post_html", os.path.getsize(post_filename_relative))
+            print(f"Blog post HTML saved locally: {post_filename_relative}")
+        except Exception as e:
+            print(f"Error saving blog post HTML locally {post_filename_relative}: {e}")
+            run_metrics.count("posts.failed")
+            continue
+
+        # 7. Queue the post for the manifest and blog.html index, which are written once after the loop.
+        # The source fields let --rebuild re-render the post later without calling the APIs.
+        post = {
+            "slug": file_stem,
+            "post_path": post_filename_relative,
+            "keyword": keyword_for_ai,
+            "markdown": full_content,
+            "title": title,
+            "summary": summary,
+            "image_url": saved_image["url"],
+            "image": saved_image["variants"], # Responsive variants for srcset, or None if the PNG was kept
+            "image_asset": saved_image.get("asset"), # Digest of the shared image in the manifest's asset table
+            "post_url": post_public_url,
+            "affiliate_link": affiliate_link, # Pass the affiliate link to the index update
+            "author": "Codestrym Staff", # Explicitly set author for snippet
+            "date": datetime.now().strftime("%B %d, %Y"),
+            "related": related_links,
+        }
+        state.advance(row_hash, "html", data={"post": post}, paths={"post": post_filename_relative}, timings={"html": round(time.perf_counter() - html_start, 3)})
+        new_posts_info.append(post)
+        new_posts_hashes.append(row_hash)
+        if related is not None:
+            related.append(post, vector)
+        # End-to-end latency of one post, from submitting its API calls to its page being written
+        run_metrics.observe("post.latency", time.perf_counter() - job["submitted"])
+
+    # Rows written so far survive a failure in the index update below
+    state.commit()
+
+    # 8. Update blog.html index locally with every post from this run in one write
+    if not new_posts_info:
+        print("\nNo new posts were processed in this run.")
+        return done_hashes
+
+    # Images of rows that aren't published yet are kept for their next attempt even though no post refers to them
+    keep_assets = {row["data"]["image"].get("asset") for row in state.unfinished() if row["data"].get("image")}
+    index_start = time.perf_counter()
+    with run_metrics.timer("stage.index"):
+        update_blog_index(new_posts_info, assets, keep_assets)
+
+    if related is not None:
+        related.save()
+
+    print(f"\nMarking {len(new_posts_hashes)} post(s) as published in {STATE_DB_FILE}...")
+    state.mark_indexed(new_posts_hashes, round(time.perf_counter() - index_start, 3))
+    run_metrics.count("posts.published", len(new_posts_hashes))
+    done_hashes.update(new_posts_hashes)
+    return done_hashes
+
+def save_deploy_manifest():
+    """Writes the files this run changed to the deploy manifest and starts a new change set."""
+    if DEPLOY_MANIFEST_FILE:
+        try:
+            run_changes.save(DEPLOY_MANIFEST_FILE)
+            print(f"\nDeploy manifest written to {DEPLOY_MANIFEST_FILE}: {len(run_changes)} changed file(s).")
+        except OSError as e:
+            print(f"Warning: could not write deploy manifest {DEPLOY_MANIFEST_FILE}: {e}")
+    run_changes.clear()
+
+def report_run():
+    """Trims the response and Markdown caches, then writes the run report and prints its summary table."""
+    if get_markdown_cache() is not None:
+        get_markdown_cache().evict()
+    cache = get_response_cache()
+    extra = {}
+    if cache is not None:
+        cache.evict()
+        print(f"\n{cache.report()}")
+        extra["response_cache"] = cache.stats()
+    extra["peak_rss_bytes"] = peak_rss_bytes()
+
+    report = run_metrics.report(extra)
+    if RUN_REPORT_FILE:
+        try:
+            run_metrics.write_report(RUN_REPORT_FILE, extra)
+            print(f"\nRun report written to {RUN_REPORT_FILE}.")
+        except OSError as e:
+            print(f"Warning: could not write run report {RUN_REPORT_FILE}: {e}")
+    print(f"\n{summary_table(report)}")
+
+def has_new_work(post_sources):
+    """
+    Returns True if any source has changed since it was last fully published, or a Gemini batch is
+    waiting to be collected. Only reads file metadata, the CSV's bytes and the state store, so it is
+    cheap enough to run before anything else; a run it returns False for would publish nothing.
+    The state store is opened read-only and left exactly as it was; if it (or one of its tables)
+    doesn't exist yet, there is work to do.
+    """
+    try:
+        state = StateStore(STATE_DB_FILE, read_only=True)
+    except sqlite3.OperationalError:
+        return True
+    try:
+        if state.get_meta(BATCH_META_KEY):
+            return True
+        return any(source.has_new(state) for source in post_sources)
+    except sqlite3.OperationalError:
+        return True
+    finally:
+        state.close()
+
+def run_once(post_sources, batch=False, stream=False):
+    """Runs one ingest-generate-publish pass over `post_sources`. The run report covers this pass only."""
+    run_metrics.reset() # With --watch, the previous pass was already reported
+    if get_response_cache() is not None:
+        get_response_cache().reset_stats()
+    state = open_state_store()
+    try:
+        pending, resumed, deferred = scan_sources(post_sources, state)
+        done_hashes = generate_posts(pending, resumed, state, batch, stream)
+        # Let each source record what it no longer needs to read (queue offsets, processed batch files)
+        unfinished = [request for request, _ in pending + resumed if request.row_hash not in done_hashes] + deferred
+        for source in post_sources:
+            if source.exists():
+                moved = source.finish(state, [request.location for request in unfinished if request.source is source])
+                for old_path, new_path in moved:
+                    run_changes.deleted([old_path])
+                    run_changes.written([new_path])
+    finally:
+        state.close()
+    run_changes.written([STATE_DB_FILE])
+
+# --- Main Script Logic ---
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.rebuild:
+        if not GITHUB_REPO_OWNER or not GITHUB_REPO_NAME:
+            print("Error: GitHub repository details not fully configured in environment variables.")
+            return
+        rebuild_site(args.workers)
+        return
+
+    try:
+        post_sources = [sources.parse_source(spec.strip()) for spec in (args.source or POST_SOURCES.split(",")) if spec.strip()]
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    if args.check:
+        pending = has_new_work(post_sources)
+        print("New posts to generate." if pending else "Nothing new to generate.")
+        sys.exit(1 if pending else 0)
+
+    if not GOOGLE_API_KEY:
+        print("Error: GOOGLE_API_KEY environment variable not set. Please add it as a GitHub Secret.")
+        return
+
+    if not GITHUB_REPO_OWNER or not GITHUB_REPO_NAME or not GITHUB_BRANCH:
+        print("Error: GitHub repository details not fully configured in environment variables.")
+        return
+
+    while True:
+        # Unchanged sources are detected before any heavy module is loaded or a source is parsed
+        if has_new_work(post_sources):
+            run_once(post_sources, args.batch, args.stream)
+            save_deploy_manifest()
+            report_run()
+        elif not args.watch:
+            print("No new posts: every source is unchanged since it was last published.")
+            return
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+
+    print("\nBlog post generation and local updates complete. The GitHub Actions 'Commit and push changes' step will now push these files to your repository.")
+
+if __name__ == "__main__":
+    main()
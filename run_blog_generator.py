@@ -1,2 +0,0 @@
-import generate_blog_posts
-generate_blog_posts.main()
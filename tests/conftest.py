@@ -0,0 +1,56 @@
+"""Shared fixtures: a stub API server and a scratch site directory for the generator."""
+import pytest
+
+from codestrym_blog import output_stage
+from codestrym_blog.metrics import Metrics
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    """The generate_blog_posts module, with fresh run metrics and change set and no caches on disk."""
+    pytest.importorskip("requests")
+    import generate_blog_posts
+
+    monkeypatch.setattr(generate_blog_posts, "run_metrics", Metrics())
+    monkeypatch.setattr(generate_blog_posts, "run_changes", output_stage.ChangeSet())
+    monkeypatch.setattr(generate_blog_posts, "API_CACHE_DIR", "")
+    monkeypatch.setattr(generate_blog_posts, "MARKDOWN_CACHE_DIR", "")
+    monkeypatch.setattr(generate_blog_posts, "TEMPLATE_CACHE_DIR", "")
+    monkeypatch.setattr(generate_blog_posts, "_api_client", None)
+    return generate_blog_posts
+
+
+@pytest.fixture
+def stub(generator, tmp_path, monkeypatch):
+    """Returns a function that starts a stub API server with the given settings and points the generator at it."""
+    from codestrym_blog.stub_server import start_stub_server
+
+    servers = []
+
+    def start(**options):
+        server, base_url = start_stub_server(**options)
+        servers.append(server)
+        monkeypatch.setattr(generator, "GOOGLE_API_BASE", base_url)
+        monkeypatch.setattr(generator, "GEMINI_API_URL", f"{base_url}/v1beta/models/{generator.GEMINI_MODEL}:generateContent")
+        monkeypatch.setattr(generator, "IMAGEN_API_URL", f"{base_url}/v1beta/models/{generator.IMAGEN_MODEL}:predict")
+        monkeypatch.setattr(generator, "_api_client", None)
+        return server.stub
+
+    monkeypatch.setattr(generator, "GOOGLE_API_KEY", "stub")
+    monkeypatch.setattr(generator, "IMAGEN_REQUESTS_PER_MINUTE", 6000) # Don't pace the stub like the real quota
+    monkeypatch.setattr(generator, "BATCH_DIR", str(tmp_path / "batches"))
+    monkeypatch.setattr(generator, "BATCH_POLL_SECONDS", 0.02)
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def site(generator, tmp_path, monkeypatch):
+    """Runs the generator in an empty site directory. Returns the directory."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(generator, "GITHUB_REPO_OWNER", "owner")
+    monkeypatch.setattr(generator, "GITHUB_REPO_NAME", "site")
+    monkeypatch.setattr(generator, "GITHUB_BRANCH", "main")
+    return tmp_path
@@ -0,0 +1,75 @@
+"""Tests for --batch text generation, run against the local stub API."""
+from codestrym_blog.state_store import StateStore
+
+KEYWORDS = ("smartwatch", "headphones", "espresso machine")
+
+
+def make_jobs(generator):
+    return [
+        {
+            "row_hash": f"row-{position}",
+            "keyword": keyword,
+            "text_prompt": generator.build_text_prompt(keyword, f"A post about the {keyword}."),
+            "image_prompt": generator.build_image_prompt(keyword),
+            "text": None,
+            "saved_image": None,
+            "timings": {},
+        }
+        for position, keyword in enumerate(KEYWORDS)
+    ]
+
+
+def test_batch_results_are_mapped_back_by_key(generator, stub, tmp_path):
+    server = stub(batch_delay=0.05)
+    jobs = make_jobs(generator)
+    with StateStore(str(tmp_path / "state.sqlite3")) as state:
+        ready = generator.generate_text_batch(jobs, state)
+        assert ready == jobs
+        for job in jobs:
+            assert f"## Why {job['keyword']}?" in job["text"]
+            stored = state.get(job["row_hash"])
+            assert stored["stage"] == "text" and stored["data"]["text"] == job["text"]
+        assert state.get_meta(generator.BATCH_META_KEY) is None
+    assert len(server.batches) == 1
+    assert server.calls["generateContent"] == 0
+
+
+def test_failed_batch_falls_back_to_interactive_calls(generator, stub, tmp_path):
+    server = stub(fail_batches=True)
+    jobs = make_jobs(generator)
+    with StateStore(str(tmp_path / "state.sqlite3")) as state:
+        ready = generator.generate_text_batch(jobs, state)
+        assert ready == jobs
+        assert all(job["text"] is None for job in ready)
+        assert state.get_meta(generator.BATCH_META_KEY) is None
+
+        generated = list(generator.generate_concurrently(ready, max_workers=2))
+    assert [job for job, _, _ in generated] == jobs
+    for job, text, image in generated:
+        assert f"## Why {job['keyword']}?" in text
+        assert image
+    assert server.calls["generateContent"] == len(jobs)
+
+
+def test_pending_batch_is_collected_by_a_later_run(generator, stub, tmp_path, monkeypatch):
+    server = stub(batch_delay=0.3)
+    state_path = str(tmp_path / "state.sqlite3")
+    monkeypatch.setattr(generator, "BATCH_TIMEOUT_HOURS", 0)
+    with StateStore(state_path) as state:
+        jobs = make_jobs(generator)
+        jobs[0]["text"] = "Already generated."
+        assert generator.generate_text_batch(jobs, state) == [jobs[0]]
+        batch_name = state.get_meta(generator.BATCH_META_KEY)
+        assert batch_name in server.batches
+
+    # The next run finds the batch name in the state store and polls it instead of submitting again
+    monkeypatch.setattr(generator, "BATCH_TIMEOUT_HOURS", 1)
+    with StateStore(state_path) as state:
+        jobs = make_jobs(generator)
+        jobs[0]["text"] = "Already generated."
+        assert generator.generate_text_batch(jobs, state) == jobs
+        assert jobs[0]["text"] == "Already generated."
+        assert all(f"## Why {job['keyword']}?" in job["text"] for job in jobs[1:])
+        assert state.get_meta(generator.BATCH_META_KEY) is None
+    assert list(server.batches) == [batch_name]
+    assert len(server.files) == 2 # The one input file and its results
@@ -0,0 +1,33 @@
+"""Tests for the --check pre-check, which must leave the state store untouched."""
+from codestrym_blog import sources
+from codestrym_blog.state_store import StateStore
+
+
+def test_missing_state_store_means_new_work_and_is_not_created(generator, site):
+    (site / "blog.csv").write_text("Text,Hyperlink,images\nPost,https://example.com/a,a\n")
+    assert generator.has_new_work([sources.CsvSource("blog.csv")])
+    assert not (site / generator.STATE_DB_FILE).exists()
+
+
+def test_check_reads_the_state_store_without_writing_it(generator, site):
+    (site / "blog.csv").write_text("Text,Hyperlink,images\nPost,https://example.com/a,a\n")
+    (site / "queue.jsonl").write_text('{"text": "Queued", "hyperlink": "https://example.com/b"}\n{"text": "Partial')
+    csv_source = sources.CsvSource("blog.csv")
+    queue = sources.JsonlSource("queue.jsonl")
+    with StateStore(generator.STATE_DB_FILE) as state:
+        csv_source.iter_chunks(state)
+        csv_source.finish(state, [])
+        list(queue.iter_chunks(state))
+        queue.finish(state, [])
+
+    assert not generator.has_new_work([csv_source, queue])
+    with StateStore(generator.STATE_DB_FILE) as state:
+        state.set_meta(generator.BATCH_META_KEY, "batches/1")
+    assert generator.has_new_work([csv_source, queue])
+    with StateStore(generator.STATE_DB_FILE) as state:
+        state.delete_meta(generator.BATCH_META_KEY)
+    contents = (site / generator.STATE_DB_FILE).read_bytes()
+
+    assert not generator.has_new_work([csv_source, queue])
+    assert (site / generator.STATE_DB_FILE).read_bytes() == contents
+    assert sorted(path.name for path in site.iterdir()) == ["blog.csv", generator.STATE_DB_FILE, "queue.jsonl"]
@@ -0,0 +1,34 @@
+"""Tests for the bounded pool that runs each post's API calls."""
+import threading
+import time
+
+
+def test_rows_in_flight_run_both_calls_at_once(generator, monkeypatch):
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def call(prompt):
+        with lock:
+            running.append(prompt)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(prompt)
+        return f"result for {prompt}"
+
+    monkeypatch.setattr(generator, "call_gemini_api", call)
+    monkeypatch.setattr(generator, "call_imagen_api", call)
+    jobs = [
+        {"text_prompt": f"text {number}", "image_prompt": f"image {number}", "text": None, "saved_image": None, "timings": {}}
+        for number in range(6)
+    ]
+    jobs[5]["text"] = "Stored text" # Completed in an earlier run, so only its image is generated
+
+    results = list(generator.generate_concurrently(jobs, max_workers=2))
+
+    assert results == [
+        (job, job["text"] or f"result for {job['text_prompt']}", f"result for {job['image_prompt']}") for job in jobs
+    ]
+    # Two rows in flight, each with its text and image call running side by side
+    assert max(peak) == 4
@@ -0,0 +1,105 @@
+"""Tests for near-duplicate detection: link normalization, MinHash thresholds and linking duplicates."""
+import itertools
+
+from codestrym_blog import near_duplicates
+from codestrym_blog.benchmark import write_synthetic_csv
+from codestrym_blog.near_duplicates import NearDuplicateIndex, fingerprint, is_near_duplicate, normalize_link, similarity
+from codestrym_blog.sources import CsvSource, JsonlSource, normalize
+from codestrym_blog.state_store import StateStore
+
+SOURCE = JsonlSource("queue.jsonl")
+
+
+def request(text, link="", keyword="", index=0):
+    return normalize({"text": text, "hyperlink": link, "images": keyword}, SOURCE, index)
+
+
+def test_normalize_link_keeps_only_what_identifies_the_page():
+    assert normalize_link("https://www.amazon.com/Some-Watch/dp/b0abcd1234/ref=sr_1_3?tag=shop-20&psc=1") == "amazon.com/dp/B0ABCD1234"
+    assert normalize_link("amazon.com/gp/product/B0ABCD1234") == "amazon.com/dp/B0ABCD1234"
+    assert normalize_link("https://example.com/s/?utm_source=x&k=tea&tag=shop-20") == "example.com/s?k=tea"
+    assert normalize_link("#") == normalize_link("") == ""
+
+
+def test_thresholds_depend_on_the_links():
+    same, other = "example.com/a", "example.com/b"
+    assert is_near_duplicate(near_duplicates.SAME_LINK_THRESHOLD, same, same)
+    assert not is_near_duplicate(near_duplicates.SAME_LINK_THRESHOLD - 0.01, same, same)
+    assert is_near_duplicate(near_duplicates.TEXT_THRESHOLD, same, "")
+    assert not is_near_duplicate(near_duplicates.TEXT_THRESHOLD - 0.01, "", "")
+    assert is_near_duplicate(near_duplicates.DIFFERENT_LINK_THRESHOLD, same, other)
+    assert not is_near_duplicate(near_duplicates.DIFFERENT_LINK_THRESHOLD - 0.01, same, other)
+    # Two different Amazon products are never duplicates, however alike their text
+    assert not is_near_duplicate(1.0, "amazon.com/dp/B0AAAAAAAA", "amazon.com/dp/B0BBBBBBBB")
+
+
+def test_similarity_estimates_word_overlap():
+    text = "This smartwatch tracks sleep, heart rate and workouts. Get your deal using our link!"
+    first = fingerprint(request(text, keyword="smartwatch"))
+    assert similarity(first.signature, fingerprint(request(text, keyword="smartwatch")).signature) == 1.0
+    reworded = fingerprint(request(text.replace("Get your deal", "Grab the deal"), keyword="smartwatch"))
+    assert 0.5 <= similarity(first.signature, reworded.signature) < 1.0
+    unrelated = fingerprint(request("Noise cancelling headphones for long flights.", keyword="headphones"))
+    assert similarity(first.signature, unrelated.signature) < 0.2
+    assert fingerprint(request("", keyword="")) is None
+
+
+def test_numbered_products_are_not_duplicates(tmp_path):
+    path = str(tmp_path / "blog.csv")
+    write_synthetic_csv(path, 50)
+    fingerprints = [fingerprint(row) for chunk in CsvSource(path).iter_chunks(None) for row in chunk]
+    for first, second in itertools.combinations(fingerprints, 2):
+        assert not is_near_duplicate(similarity(first.signature, second.signature), first.link, second.link)
+
+    iphone = request("The iPhone 15 is here with a better camera. Get your deal!", "https://amazon.com/dp/B0CHX1W1XY", "iphone-15")
+    newer = request("The iPhone 16 is here with a better camera. Get your deal!", "https://amazon.com/dp/B0DHJH2XZM", "iphone-16")
+    with StateStore(str(tmp_path / "state.sqlite3")) as state:
+        duplicates = NearDuplicateIndex(state)
+        duplicates.add(iphone.row_hash, fingerprint(iphone))
+        assert duplicates.find(newer)[1] is None
+
+
+def publish(state, duplicates, published_request, post_url):
+    state.advance(published_request.row_hash, "html", data={"post": {"post_url": post_url}})
+    state.mark_indexed([published_request.row_hash])
+    assert duplicates.add_published([published_request]) == 1
+
+
+def test_duplicate_of_a_duplicate_links_to_the_published_post(generator, tmp_path, monkeypatch):
+    monkeypatch.setattr(generator, "NEAR_DUPLICATES", "link")
+    link = "https://www.amazon.com/dp/B0ABCD1234?tag=shop-20"
+    text = "This smartwatch tracks sleep, heart rate and workouts for a whole week on one charge. Get your deal"
+    original = request(f"{text}!", link, "smartwatch")
+    reworded = request(f"{text} today!", link + "&ref_=x", "smartwatch", 1)
+    again = request(f"{text} today, quick!", link + "&psc=1", "smartwatch", 2)
+    with StateStore(str(tmp_path / "state.sqlite3")) as state:
+        duplicates = NearDuplicateIndex(state)
+        publish(state, duplicates, original, "https://example.com/posts/watch.html")
+
+        assert generator.check_near_duplicate(duplicates, reworded, state) == "linked"
+        assert state.get(reworded.row_hash)["data"]["duplicate_of"] == original.row_hash
+        # `again` is closest to the linked duplicate, which was never published itself
+        assert duplicates.find(again)[1].row_hash == reworded.row_hash
+        assert generator.check_near_duplicate(duplicates, again, state) == "linked"
+        row = state.get(again.row_hash)
+        assert row["stage"] == "indexed"
+        assert row["data"]["duplicate_of"] == original.row_hash
+        assert row["data"]["post_url"] == "https://example.com/posts/watch.html"
+
+
+def test_near_duplicate_in_the_same_scan_is_deferred(generator, tmp_path, monkeypatch):
+    monkeypatch.setattr(generator, "NEAR_DUPLICATES", "link")
+    first = request("This smartwatch tracks sleep and workouts. Get your deal!", "https://example.com/watch", "smartwatch")
+    second = request("This smartwatch tracks sleep and workouts. Get the deal!", "https://example.com/watch?utm_source=x", "smartwatch", 1)
+    with StateStore(str(tmp_path / "state.sqlite3")) as state:
+        duplicates = NearDuplicateIndex(state)
+        assert generator.check_near_duplicate(duplicates, first, state) == "pending"
+        assert generator.check_near_duplicate(duplicates, second, state) == "deferred"
+        assert state.get(second.row_hash) is None
+        assert generator.run_metrics.counters["requests.near_duplicates"] == 1
+
+        # Once the first is published, the next scan links the second to it
+        state.advance(first.row_hash, "html", data={"post": {"post_url": "https://example.com/posts/watch.html"}})
+        state.mark_indexed([first.row_hash])
+        assert generator.check_near_duplicate(NearDuplicateIndex(state), second, state) == "linked"
+        assert state.get(second.row_hash)["data"]["duplicate_of"] == first.row_hash
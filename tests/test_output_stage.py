@@ -0,0 +1,43 @@
+"""Tests for the compressed copies the output stage keeps next to published files."""
+import gzip
+import os
+
+from codestrym_blog import output_stage
+
+
+def page(tmp_path, size=4096):
+    path = str(tmp_path / "page.html")
+    with open(path, "w") as f:
+        f.write("<p>" + "x" * size + "</p>\n")
+    return path
+
+
+def test_write_page_backfills_missing_copy_of_unchanged_page(tmp_path):
+    path = str(tmp_path / "page.html")
+    html = "<p>" + "word " * 500 + "</p>"
+    assert path + ".gz" in output_stage.write_page(path, html)
+    os.remove(path + ".gz")
+    assert output_stage.write_page(path, html) == [path + ".gz"] + [
+        copy for copy in [path + ".br"] if output_stage._brotli() is not None
+    ]
+    with gzip.open(path + ".gz", "rt") as f, open(path) as page_file:
+        assert f.read() == page_file.read()
+    assert output_stage.write_page(path, html) == []
+
+
+def test_refresh_rewrites_copies_older_than_their_file(tmp_path):
+    path = page(tmp_path)
+    output_stage.write_compressed(path)
+    stale = os.path.getmtime(path) - 60
+    os.utime(path + ".gz", (stale, stale))
+    assert path + ".gz" in output_stage.refresh_compressed(path)
+    assert os.path.getmtime(path + ".gz") >= os.path.getmtime(path)
+    assert output_stage.refresh_compressed(path) == []
+
+
+def test_refresh_deletes_copies_of_small_files(tmp_path):
+    path = page(tmp_path, size=10)
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(b"left from a larger version"))
+    assert output_stage.refresh_compressed(path) == [path + ".gz"]
+    assert not os.path.exists(path + ".gz")
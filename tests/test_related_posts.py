@@ -0,0 +1,85 @@
+"""Tests for the related-posts vectors, updated incrementally and recomputed in full."""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from codestrym_blog.related_posts import RelatedPosts, vectorize
+
+TOPICS = [
+    "espresso machine with milk frother and grinder",
+    "wireless noise cancelling headphones for travel",
+    "hiking backpack with rain cover and hip belt",
+    "portable bluetooth speakers for the beach",
+]
+
+
+def make_posts(count, start=0):
+    return [
+        {
+            "title": f"Post {number}",
+            "summary": TOPICS[number % len(TOPICS)],
+            "markdown": f"{TOPICS[number % len(TOPICS)]} review {number}",
+            "post_url": f"https://example.com/posts/{number}.html",
+        }
+        for number in range(start, start + count)
+    ]
+
+
+def urls(links):
+    return [link["url"] for link in links]
+
+
+def test_document_frequency_and_weights_follow_appends(tmp_path):
+    related = RelatedPosts(str(tmp_path / "related.npz"), make_posts(10))
+    before = related.weighted().copy()
+    for post in make_posts(30, start=10): # Grows the matrix past its initial capacity
+        related.append(post, vectorize(post))
+    rows = related.matrix[:related.count]
+    assert related.count == 40
+    assert np.array_equal(related.document_frequency, np.count_nonzero(rows, axis=0))
+
+    # Rows weighted earlier are kept; only the appended rows are weighted, with the idf as it is now
+    weighted = related.weighted()
+    assert np.array_equal(weighted[:10], before)
+    assert np.allclose(weighted[10:], related._normalize(rows[10:], related._idf()))
+
+
+def test_nearest_all_matches_a_fresh_build_after_appends(tmp_path):
+    posts = make_posts(24)
+    related = RelatedPosts(str(tmp_path / "related.npz"), posts[:8])
+    related.nearest(vectorize(posts[8]))
+    for post in posts[8:]:
+        related.append(post, vectorize(post))
+    fresh = RelatedPosts(str(tmp_path / "fresh.npz"), posts)
+    assert related.nearest_all(3) == fresh.nearest_all(3)
+
+    for number, links in enumerate(fresh.nearest_all(3)):
+        assert posts[number]["post_url"] not in urls(links)
+        # Posts on the same topic share most of their terms, so they come first
+        assert all(int(url.rsplit("/", 1)[1].split(".")[0]) % len(TOPICS) == number % len(TOPICS) for url in urls(links))
+
+
+def test_nearest_skips_unrelated_posts(tmp_path):
+    related = RelatedPosts(str(tmp_path / "related.npz"), make_posts(8))
+    query = {"title": "Tablet", "summary": "A tablet", "markdown": "Screen and stylus"}
+    assert related.nearest(vectorize(query)) == []
+    espresso = {"title": "Espresso", "summary": TOPICS[0], "markdown": TOPICS[0]}
+    assert urls(related.nearest(vectorize(espresso), 2)) == ["https://example.com/posts/0.html", "https://example.com/posts/4.html"]
+
+
+def test_cache_reuses_matching_rows(tmp_path):
+    cache_path = str(tmp_path / "related.npz")
+    posts = make_posts(12)
+    related = RelatedPosts(cache_path, posts[:10])
+    related.save()
+    assert not related.changed
+
+    reopened = RelatedPosts(cache_path, posts)
+    assert np.allclose(reopened.matrix[:10], related.matrix[:10], atol=1e-2)
+    assert reopened.changed # The two new posts were vectorized and appended
+    assert np.array_equal(reopened.document_frequency, np.count_nonzero(reopened.matrix[:12], axis=0))
+
+    # Posts in another order don't match the cached rows, so every row is vectorized again
+    reordered = RelatedPosts(cache_path, posts[::-1])
+    assert reordered.keys == [post["post_url"] for post in posts[::-1]]
+    assert np.array_equal(reordered.matrix[0], vectorize(posts[-1]))
@@ -0,0 +1,33 @@
+"""Tests for the on-disk response cache's age and size bounds."""
+import os
+import time
+
+from codestrym_blog.response_cache import ResponseCache
+
+
+def age_entries(cache, days):
+    old = time.time() - days * 24 * 3600
+    for path, _, _, _ in cache.entries():
+        os.utime(path, (old, old))
+
+
+def test_entries_expire_after_max_age(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_age_seconds=30 * 24 * 3600)
+    cache.put("aa11", "value")
+    cache.put("bb22", "value")
+    age_entries(cache, 31)
+    assert cache.get("aa11") is None
+    assert cache.evict() == 1
+    assert cache.entries() == []
+
+
+def test_entries_without_max_age_only_leave_when_over_size(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=10 ** 6, max_age_seconds=None)
+    cache.put("aa11", "<p>rendered</p>")
+    age_entries(cache, 365)
+    assert cache.get("aa11") == "<p>rendered</p>"
+    assert cache.evict() == 0
+
+    cache.max_bytes = 0
+    assert cache.evict() == 1
+    assert cache.get("aa11") is None
@@ -0,0 +1,49 @@
+"""Tests for the run report, which covers one pass of the generator."""
+import json
+
+import pytest
+
+from codestrym_blog import sources
+from codestrym_blog.metrics import Metrics
+
+
+def test_reset_drops_earlier_samples():
+    metrics = Metrics()
+    metrics.count("posts.published", 3)
+    metrics.observe("stage.text", 1.0)
+    started = metrics.started
+    metrics.reset()
+    metrics.count("posts.published")
+    report = metrics.report()
+    assert report["counters"] == {"posts.published": 1}
+    assert report["timers"] == {}
+    assert metrics.started >= started
+
+
+def test_each_watch_pass_reports_only_its_own_work(generator, stub, site, monkeypatch):
+    pytest.importorskip("jinja2")
+    pytest.importorskip("markdown")
+    stub()
+    monkeypatch.setattr(generator, "RELATED_POSTS", 0)
+    monkeypatch.setattr(generator, "API_CACHE_DIR", str(site / ".cache" / "api"))
+    monkeypatch.setattr(generator, "_response_cache", None)
+    monkeypatch.setattr(generator, "RUN_REPORT_FILE", str(site / "run_report.json"))
+    csv_path = site / "blog.csv"
+    csv_path.write_text("Text,Hyperlink,images\nA smartwatch for runners,https://example.com/watch,smartwatch\n")
+    post_sources = [sources.CsvSource("blog.csv")]
+
+    def run_pass():
+        generator.run_once(post_sources)
+        generator.report_run()
+        return json.loads((site / "run_report.json").read_text())
+
+    reports = [run_pass()]
+    with open(csv_path, "a") as f:
+        f.write("Noise cancelling headphones,https://example.com/headphones,headphones\n")
+    reports.append(run_pass())
+
+    assert reports[0]["counters"]["posts.published"] == 1
+    assert reports[1]["counters"]["posts.published"] == 1
+    assert reports[1]["counters"]["requests.scanned"] == 2
+    assert reports[1]["counters"]["requests.already_processed"] == 1
+    assert reports[1]["response_cache"]["misses"] == 2 # One text and one image call, not the first pass's too
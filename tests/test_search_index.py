@@ -0,0 +1,94 @@
+"""Tests for the static search index, built incrementally or in full."""
+import json
+import os
+
+from codestrym_blog import search_index
+from codestrym_blog.search_index import SearchIndex, tokenize
+
+TOPICS = ["espresso grinder", "wireless headphones", "espresso machine", "hiking backpack", "wireless speakers"]
+
+
+def make_posts(count):
+    return [
+        {
+            "title": f"{TOPICS[number % len(TOPICS)].title()} {number}",
+            "summary": f"Why the {TOPICS[number % len(TOPICS)]} is worth it.",
+            "markdown": f"## Review\n\nPost number{number} about the {TOPICS[number % len(TOPICS)]}.",
+            "post_url": f"https://example.com/posts/{number}.html",
+            "date": "July 23, 2025",
+        }
+        for number in range(count)
+    ]
+
+
+def read_tree(directory):
+    files = {}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, encoding="utf-8") as f:
+                files[os.path.relpath(path, directory)] = json.load(f)
+    return files
+
+
+def postings(directory, term):
+    """Decodes a term's postings as {doc id: weight}, the way search.html does."""
+    with open(os.path.join(directory, "terms", f"{term[:search_index.PREFIX_CHARS]}.json"), encoding="utf-8") as f:
+        flat = json.load(f)["terms"].get(term, [])
+    decoded = {}
+    doc_id = 0
+    for delta, weight in zip(flat[0::2], flat[1::2]):
+        doc_id += delta
+        decoded[doc_id] = weight
+    return decoded
+
+
+def test_tokenize_folds_accents_and_drops_stopwords():
+    assert tokenize("The Café and the Crème BRÛLÉE, a 4K TV!") == ["cafe", "creme", "brulee", "4k", "tv"]
+
+
+def test_incremental_updates_match_a_full_build(tmp_path, monkeypatch):
+    monkeypatch.setattr(search_index, "CHUNK_SIZE", 3)
+    posts = make_posts(8)
+    incremental = SearchIndex(str(tmp_path / "incremental"))
+    for count in (2, 3, 4, 7, 8):
+        incremental.update(posts[:count])
+    full = SearchIndex(str(tmp_path / "full"))
+    full.update(posts)
+    assert read_tree(incremental.directory) == read_tree(full.directory)
+
+    # Title (5) + summary (2) + body (1)
+    assert postings(full.directory, "espresso") == {0: 8, 2: 8, 5: 8, 7: 8}
+    assert set(postings(full.directory, "number7")) == {7}
+    with open(full.chunk_path(2), encoding="utf-8") as f:
+        assert [record[1] for record in json.load(f)] == [post["post_url"] for post in posts[6:8]]
+
+
+def test_incremental_update_only_writes_touched_files(tmp_path):
+    index = SearchIndex(str(tmp_path / "search"))
+    posts = make_posts(6)
+    index.update(posts[:5])
+    written, removed = index.update(posts)
+    assert removed == []
+    touched = {index.shard_path(search_index.shard_key(term)) for term in search_index.document_terms(posts[5])}
+    assert set(written) == touched | {index.chunk_path(0), index.meta_path}
+    assert index.update(posts) == ([], [])
+
+
+def test_rebuild_when_index_is_incomplete_or_posts_were_removed(tmp_path):
+    index = SearchIndex(str(tmp_path / "search"))
+    posts = make_posts(5)
+    index.update(posts)
+    expected = read_tree(index.directory)
+
+    os.remove(index.shard_path("es"))
+    written, _ = index.update(posts)
+    assert index.shard_path("es") in written
+    assert read_tree(index.directory) == expected
+
+    # Dropping a post shifts the doc ids, so the whole index is rebuilt and stale shards go
+    written, removed = index.update(posts[:1])
+    assert index.shard_path("hi") in removed
+    fresh = SearchIndex(str(tmp_path / "fresh"))
+    fresh.update(posts[:1])
+    assert read_tree(index.directory) == read_tree(fresh.directory)
@@ -0,0 +1,102 @@
+"""Tests for the input sources: JSONL offsets, has_new and drop-folder batches."""
+import json
+import os
+
+from codestrym_blog.sources import DropFolderSource, JsonlSource, request_hash
+from codestrym_blog.state_store import StateStore
+
+
+def record(text, link="https://example.com/item"):
+    return json.dumps({"text": text, "hyperlink": link}) + "\n"
+
+
+def read_all(source, state):
+    return [request for chunk in source.iter_chunks(state) for request in chunk]
+
+
+def test_jsonl_reads_only_appended_lines(tmp_path):
+    queue = tmp_path / "queue.jsonl"
+    queue.write_text(record("first") + record("second"))
+    with StateStore(str(tmp_path / "state.sqlite3")) as state:
+        source = JsonlSource(str(queue))
+        assert source.has_new(state)
+        assert [request.text for request in read_all(source, state)] == ["first", "second"]
+        source.finish(state, [])
+        assert not source.has_new(state)
+
+        with open(queue, "a") as f:
+            f.write(record("third"))
+        assert source.has_new(state)
+        source = JsonlSource(str(queue))
+        assert [request.text for request in read_all(source, state)] == ["third"]
+
+
+def test_jsonl_offset_stops_at_first_unfinished_request(tmp_path):
+    queue = tmp_path / "queue.jsonl"
+    queue.write_text(record("first") + record("second") + record("third"))
+    with StateStore(str(tmp_path / "state.sqlite3")) as state:
+        source = JsonlSource(str(queue))
+        requests = read_all(source, state)
+        source.finish(state, [requests[1].location])
+        assert state.get_meta(source.cursor_key) == str(requests[1].location)
+        assert [request.text for request in read_all(JsonlSource(str(queue)), state)] == ["second", "third"]
+
+
+def test_jsonl_leaves_partial_last_line_for_next_run(tmp_path):
+    queue = tmp_path / "queue.jsonl"
+    partial = record("second").rstrip("\n")
+    queue.write_text(record("first") + partial)
+    with StateStore(str(tmp_path / "state.sqlite3")) as state:
+        source = JsonlSource(str(queue))
+        assert [request.text for request in read_all(source, state)] == ["first"]
+        source.finish(state, [])
+        # The unterminated line isn't new work until its newline is written
+        assert not source.has_new(state)
+
+        with open(queue, "a") as f:
+            f.write("\n")
+        assert source.has_new(state)
+        assert [request.text for request in read_all(JsonlSource(str(queue)), state)] == ["second"]
+
+
+def test_jsonl_truncated_queue_is_read_from_start(tmp_path):
+    queue = tmp_path / "queue.jsonl"
+    queue.write_text(record("first") + record("second"))
+    with StateStore(str(tmp_path / "state.sqlite3")) as state:
+        source = JsonlSource(str(queue))
+        read_all(source, state)
+        source.finish(state, [])
+        queue.write_text(record("new"))
+        assert source.has_new(state)
+        assert [request.text for request in read_all(JsonlSource(str(queue)), state)] == ["new"]
+
+
+def test_drop_folder_reads_last_line_without_newline(tmp_path):
+    incoming = tmp_path / "incoming"
+    incoming.mkdir()
+    batch = incoming / "batch.jsonl"
+    batch.write_text(record("first") + record("last").rstrip("\n"))
+    with StateStore(str(tmp_path / "state.sqlite3")) as state:
+        source = DropFolderSource(str(incoming))
+        assert source.has_new(state)
+        requests = read_all(source, state)
+        assert [request.text for request in requests] == ["first", "last"]
+        assert requests[1].row_hash == request_hash("", "last", "https://example.com/item")
+
+        moved = source.finish(state, [])
+        assert moved == [(str(batch), os.path.join(str(incoming), "processed", "batch.jsonl"))]
+        assert not source.has_new(state)
+
+
+def test_drop_folder_keeps_files_with_unfinished_requests(tmp_path):
+    incoming = tmp_path / "incoming"
+    incoming.mkdir()
+    (incoming / "a.csv").write_text("Text,Hyperlink,images\nfirst,https://example.com/a,keyword\n")
+    (incoming / "b.jsonl").write_text(record("second"))
+    with StateStore(str(tmp_path / "state.sqlite3")) as state:
+        source = DropFolderSource(str(incoming))
+        requests = read_all(source, state)
+        assert [request.text for request in requests] == ["first", "second"]
+        source.finish(state, [requests[1].location])
+        assert sorted(os.listdir(incoming)) == ["b.jsonl", "processed"]
+        assert source.has_new(state)
@@ -0,0 +1,93 @@
+"""Tests for the per-row state store and resuming rows from the stage they reached."""
+import pytest
+
+from codestrym_blog import sources
+from codestrym_blog.state_store import StateStore, reached
+
+CSV_HEADER = "Text,Hyperlink,images\n"
+
+
+def test_advance_merges_data_and_never_moves_back(tmp_path):
+    with StateStore(str(tmp_path / "state.sqlite3")) as state:
+        state.advance("row", "text", data={"text": "Body"}, timings={"text": 1.5})
+        state.advance("row", "html", data={"post": {"title": "Post"}}, paths={"post": "posts/post.html"})
+        state.advance("row", "image", data={"image": {"path": "images/a.png"}})
+        row = state.get("row")
+        assert row["stage"] == "html"
+        assert row["data"] == {"text": "Body", "post": {"title": "Post"}, "image": {"path": "images/a.png"}}
+        assert row["paths"] == {"post": "posts/post.html"}
+        assert row["timings"] == {"text": 1.5}
+        assert reached(row, "image") and not reached(row, "indexed")
+        assert not reached(None, "text")
+
+
+def test_state_survives_reopening(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    legacy = tmp_path / "processed_posts.txt"
+    legacy.write_text("old-1\\nold-2\n")
+    with StateStore(path, commit_every=100, legacy_processed_file=str(legacy)) as state:
+        state.advance("text-row", "text", data={"text": "Body"})
+        state.advance("image-row", "image")
+        state.mark_indexed(["done-row"])
+        state.set_meta("jsonl-offset:queue.jsonl", "42")
+
+    with StateStore(path, legacy_processed_file=str(legacy)) as state:
+        assert state.get_stages(["old-1", "old-2", "text-row", "image-row", "done-row", "new"]) == {
+            "old-1": "indexed", "old-2": "indexed", "text-row": "text", "image-row": "image", "done-row": "indexed",
+        }
+        assert sorted(row["row_hash"] for row in state.unfinished()) == ["image-row", "text-row"]
+        assert state.get_meta("jsonl-offset:queue.jsonl") == "42"
+        assert state.stage_counts() == {"indexed": 3, "text": 1, "image": 1}
+
+
+def test_read_only_store_leaves_the_file_alone(tmp_path):
+    path = tmp_path / "state.sqlite3"
+    with StateStore(str(path)) as state:
+        state.set_meta("key", "value")
+    contents = path.read_bytes()
+    with StateStore(str(path), read_only=True) as state:
+        assert state.get_meta("key") == "value"
+    assert path.read_bytes() == contents
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["state.sqlite3"]
+
+
+def test_scan_resumes_each_row_from_its_stage(generator, site, monkeypatch):
+    monkeypatch.setattr(generator, "NEAR_DUPLICATES", "off")
+    (site / "blog.csv").write_text(
+        CSV_HEADER + "".join(f"Post about {name},https://example.com/{name},{name}\n" for name in ("new", "text", "html", "indexed"))
+    )
+    source = sources.CsvSource("blog.csv")
+    hashes = {request.images: request.row_hash for chunk in source.iter_chunks(None) for request in chunk}
+    with StateStore("state.sqlite3") as state:
+        state.advance(hashes["text"], "text", data={"text": "Stored text"})
+        state.advance(hashes["html"], "html", data={"post": {"title": "Stored post"}})
+        state.mark_indexed([hashes["indexed"]])
+
+        pending, resumed, deferred = generator.scan_sources([sources.CsvSource("blog.csv")], state)
+    assert [(request.images, row_state and row_state["data"]) for request, row_state in pending] == [
+        ("new", None), ("text", {"text": "Stored text"}),
+    ]
+    assert [(request.images, post) for request, post in resumed] == [("html", {"title": "Stored post"})]
+    assert deferred == []
+
+
+def test_run_reuses_stored_text_instead_of_calling_gemini(generator, stub, site, monkeypatch):
+    pytest.importorskip("jinja2")
+    pytest.importorskip("markdown")
+    server = stub()
+    monkeypatch.setattr(generator, "NEAR_DUPLICATES", "off")
+    monkeypatch.setattr(generator, "RELATED_POSTS", 0)
+    (site / "blog.csv").write_text(CSV_HEADER + "Post about tea,https://example.com/tea,tea\nPost about coffee,https://example.com/coffee,coffee\n")
+    tea, coffee = [request for chunk in sources.CsvSource("blog.csv").iter_chunks(None) for request in chunk]
+    with StateStore(generator.STATE_DB_FILE) as state:
+        state.advance(tea.row_hash, "text", data={"text": "Tea is worth it.\n\n## Why tea?\n\nStored body."})
+
+    generator.run_once([sources.CsvSource("blog.csv")])
+
+    assert server.calls["generateContent"] == 1 # Only coffee; tea's text came from the store
+    assert server.calls["predict"] == 2
+    with StateStore(generator.STATE_DB_FILE) as state:
+        assert state.get_stages([tea.row_hash, coffee.row_hash]) == {tea.row_hash: "indexed", coffee.row_hash: "indexed"}
+        tea_post = state.get(tea.row_hash)["data"]["post"]
+    assert tea_post["markdown"] == "## Why tea?\n\nStored body."
+    assert "Stored body." in (site / tea_post["post_path"]).read_text()